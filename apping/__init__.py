@@ -1,6 +1,8 @@
 import configparser
 import datetime
 import json
+import threading
+import time
 from dataclasses import dataclass
 from http import HTTPStatus
 
@@ -8,7 +10,8 @@ from flask import Flask
 from flask_cors import CORS
 import urllib3
 from dateutil.relativedelta import relativedelta
-from elasticsearch import Elasticsearch, RequestsHttpConnection
+
+from utils.es_client import create_client
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 mysql_user = None
@@ -19,15 +22,7 @@ config.read("config.ini", encoding="utf-8")
 
 
 
-es = Elasticsearch(
-    hosts=str(config["url"]["elasticsearch_connection"]),
-    verify_certs=False,
-    connection_class=RequestsHttpConnection,
-    use_ssl=True,
-    timeout=150,
-    max_retries=10,
-    retry_on_timeout=True
-)
+es = create_client(config, "es", config["url"]["elasticsearch_connection"])
     
 api_url = str(config["url"]["wazuh_api"])
 
@@ -35,7 +30,7 @@ zone_diff = str(datetime.datetime.now() - datetime.datetime.utcnow()).split(":")
 
 
 main = Flask(__name__)
-main.debug = True
+main.debug = config.getboolean("server", "debug", fallback=False)
 main.config["SECRET_KEY"] = "super-secret"
 cors = CORS(main, resources={r"/*": {"origins": "*"}})
 main.config["CORS_HEADERS"] = "Content-Type"
@@ -447,3 +442,117 @@ def convert_local_to_utc(local_date):
 from apping.custom_dashboard import custom_dashboard
 
 main.register_blueprint(custom_dashboard, url_prefix="/custom_dashboard")
+
+
+def create_app():
+    """
+    WSGI entry point used by the production server (see wsgi.py).
+    The ES clients are module level, so each worker process builds them once.
+    """
+    install_index_templates()
+    return main
+
+
+# Index templates are installed on every start (`create_app`, main.py); if
+# that fails, requests retry it at most this often until it succeeds
+INDEX_TEMPLATES_RETRY_INTERVAL = 60  # seconds
+_index_templates = {"installed": False, "attempted_at": None}
+_index_templates_lock = threading.Lock()
+
+
+def install_index_templates():
+    """
+    Install missing or outdated index templates, so the app's indices get
+    their mappings whenever a first write creates them, and warn about
+    indices that predate the current mappings. Returns whether the
+    templates are installed.
+    """
+    from apping.custom_dashboard import index_templates
+    from utils.util import logger
+
+    if not _index_templates_lock.acquire(blocking=False):
+        # another thread is installing them
+        return False
+    try:
+        _index_templates["attempted_at"] = time.monotonic()
+        index_templates.ensure(es)
+        _index_templates["installed"] = True
+        outdated = index_templates.outdated_indices(es)
+        if outdated:
+            logger.warning(
+                f"Indices {outdated} predate the current mappings, "
+                f"run `flask reindex-system-indices`"
+            )
+    except Exception as e:
+        logger.warning(f"Failed to install index templates: {e}")
+    finally:
+        _index_templates_lock.release()
+    return _index_templates["installed"]
+
+
+@main.before_request
+def retry_index_templates():
+    attempted_at = _index_templates["attempted_at"]
+    if _index_templates["installed"] or attempted_at is None:
+        return
+    if time.monotonic() - attempted_at >= INDEX_TEMPLATES_RETRY_INTERVAL:
+        install_index_templates()
+
+
+def warm_up():
+    """
+    Open connections to every cluster and prime the field sources and
+    saved search caches so the first requests on a fresh worker don't pay
+    for them.
+    """
+    from apping.custom_dashboard.controllers import dashboardController
+    from apping.custom_dashboard.controllers.esController import clients
+    from utils.util import logger
+
+    for name, client in clients.items():
+        if not client.ping():
+            logger.warning(f"Warm-up: cluster '{name}' is not reachable")
+    try:
+        dashboardController.refresh_field_sources()
+    except Exception as e:
+        logger.warning(f"Warm-up: failed to load field sources: {e}")
+    try:
+        dashboardController.saved_search_catalog.refresh()
+    except Exception as e:
+        logger.warning(f"Warm-up: failed to load saved searches: {e}")
+
+
+def close_clients():
+    """Release pooled ES connections on worker shutdown."""
+    from apping.custom_dashboard.controllers import asyncController
+    from apping.custom_dashboard.controllers.esController import clients
+
+    asyncController.shutdown()
+    for client in clients.values():
+        client.transport.close()
+
+
+@main.cli.command("migrate-dashboard-ids")
+def migrate_dashboard_ids_command():
+    """Re-key .custom_dashboards so every document's _id is its dashboard_id."""
+    from apping.custom_dashboard.controllers import dashboardController
+
+    moved = dashboardController.migrate_dashboard_ids()
+    print(f"Re-keyed {moved} dashboards")
+
+
+@main.cli.command("install-index-templates")
+def install_index_templates_command():
+    """Install missing or outdated index templates of the app's own indices."""
+    from apping.custom_dashboard import index_templates
+
+    index_templates.ensure(es)
+
+
+@main.cli.command("reindex-system-indices")
+def reindex_system_indices_command():
+    """Move the app's own indices to the current index template mappings."""
+    from apping.custom_dashboard import index_templates
+
+    for index in index_templates.reindex_outdated(es):
+        print(f"Reindexed into {index}")
@@ -0,0 +1,340 @@
+"""
+asyncio variant of dashboard rendering.
+
+The panels of a dashboard are rendered concurrently with `asyncio.gather`
+on the shared runtime loop (see utils.async_runtime), using pooled
+AsyncOpenSearch clients and one semaphore per cluster, so a dashboard
+needs one worker thread no matter how many panels it has. Query building,
+routing and response formatting are shared with the sync controllers, and
+the circuit breakers of the sync clients guard these calls as well.
+"""
+
+import asyncio
+import concurrent.futures
+import configparser
+import json
+import time
+import uuid
+from typing import Optional
+
+from opensearchpy.exceptions import (
+    ConnectionError as AsyncConnectionError,
+    ConnectionTimeout as AsyncConnectionTimeout,
+    TransportError as AsyncTransportError,
+)
+
+from apping.custom_dashboard.model import (
+    DashboardRequest,
+    TableData,
+    Visualization,
+    VisualizationType,
+    VizData,
+)
+from apping.custom_dashboard.controllers.dashboardController import (
+    build_table_query,
+    dashboard_view,
+    enriched_visualizer,
+    format_table_data,
+    found_documents,
+    get_render_plan as get_render_plan_sync,
+    panel_status,
+    rebuild_render_plan,
+    render_plan_is_current,
+    render_plan_lookup,
+    saved_search_catalog,
+)
+from apping.custom_dashboard.controllers.esController import (
+    ES_LATENCY,
+    ES_REQUESTS,
+    FANOUT_OVER_FETCH,
+    clients,
+    cluster_hosts,
+    index_label,
+    router,
+    slow_query_log,
+)
+from apping.custom_dashboard.controllers.visualizationController import (
+    bar_chart_response,
+    build_bar_chart_query,
+)
+from utils import deadline, federation, slow_queries, timing
+from utils.async_runtime import EventLoopThread
+from utils.circuit_breaker import ClusterUnavailable
+from utils.es_client import FAILURE_STATUSES, create_async_client
+from utils.util import logger
+
+config = configparser.ConfigParser()
+config.read("config.ini", encoding="utf-8")
+
+MAX_CONCURRENCY = config.getint("async", "max_concurrency_per_cluster", fallback=10)
+
+runtime = EventLoopThread("es-async")
+
+# created lazily on the runtime loop, which is the only place they are used
+_clients = {}
+_semaphores = {}
+
+
+def _client(cluster):
+    client = _clients.get(cluster)
+    if client is None:
+        client = _clients[cluster] = create_async_client(
+            config, cluster, cluster_hosts[cluster]
+        )
+        _semaphores[cluster] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return client
+
+
+def _record_breaker(cluster, error=None):
+    breaker = getattr(clients[cluster].transport, "breaker", None)
+    if breaker is None:
+        return
+    if error is not None and (
+        isinstance(error, AsyncConnectionError) or error.status_code in FAILURE_STATUSES
+    ):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+# ---------- SEARCH ----------
+async def search_cluster(cluster: str, index: str, body: dict, name: str = "query"):
+    """Async counterpart of `run_search` against one named cluster."""
+    budget = deadline.current()
+    if budget is None:
+        return await _search_cluster(cluster, index, body, name, None)
+    try:
+        return await asyncio.wait_for(
+            _search_cluster(cluster, index, body, name, budget), budget.check()
+        )
+    except asyncio.TimeoutError:
+        ES_REQUESTS.inc(cluster=cluster, index=index_label(index), outcome="deadline")
+        raise deadline.DeadlineExceeded(f"request deadline of {budget.seconds}s exceeded")
+
+
+async def _search_cluster(cluster, index, body, name, budget):
+    client = _client(cluster)
+    timings = timing.current()
+    label = index_label(index)
+    async with _semaphores[cluster]:
+        params = {}
+        if budget is not None:
+            remaining = budget.check()
+            params = {"timeout": f"{int(remaining * 1000)}ms", "request_timeout": remaining}
+        breaker = getattr(clients[cluster].transport, "breaker", None)
+        start = time.perf_counter()
+        try:
+            if breaker is not None:
+                breaker.allow()
+            response = await client.search(index=index, body=body, params=params)
+        except ClusterUnavailable as e:
+            ES_REQUESTS.inc(cluster=cluster, index=label, outcome=e.reason)
+            raise
+        except AsyncTransportError as e:
+            _record_breaker(cluster, e)
+            ES_REQUESTS.inc(cluster=cluster, index=label, outcome="error")
+            raise
+        except BaseException:
+            # cancelled (deadline, client gone) before ES answered: no outcome
+            # to record, but a half-open trial must not stay taken
+            if breaker is not None:
+                breaker.release()
+            raise
+        elapsed = time.perf_counter() - start
+
+    _record_breaker(cluster)
+    ES_REQUESTS.inc(cluster=cluster, index=label, outcome="ok")
+    ES_LATENCY.observe(elapsed, cluster=cluster, index=label)
+    slow_query_log.record(
+        body, elapsed * 1000, cluster=cluster, index=index, took_ms=response.get("took")
+    )
+    if timings is not None:
+        timings.record_search(name, index, response, elapsed * 1000)
+    return response
+
+
+async def search(index: str, body: dict, name: str = "query"):
+    """Async counterpart of `search_routed`; cross-cluster targets are federated."""
+    groups = router.group(index)
+    if len(groups) <= 1:
+        return await search_cluster(router.resolve(index), index, body, name)
+
+    fetch_body = federation.over_fetch(body, factor=FANOUT_OVER_FETCH)
+    responses = await asyncio.gather(
+        *(search_cluster(cluster, patterns, fetch_body, name) for cluster, patterns in groups.items())
+    )
+    with timing.phase("merge"):
+        return federation.merge_responses(responses, body)
+
+
+# ---------- LOOKUPS ----------
+async def get_render_plan(dashboard_id: str) -> Optional[dict]:
+    """Async counterpart of `dashboardController.get_render_plan`."""
+    if saved_search_catalog.due:
+        await asyncio.to_thread(saved_search_catalog.poll)
+    client = _client("es")
+    with timing.phase("dashboard_lookup"):
+        async with _semaphores["es"]:
+            response = await client.mget(body=render_plan_lookup(dashboard_id))
+    stored, dashboard = found_documents(response)
+    if dashboard is None:
+        return None
+    if stored is not None and render_plan_is_current(stored["_source"], dashboard):
+        return stored["_source"]
+    # rebuilding takes a few lookups, done with the sync client off the loop
+    return await asyncio.to_thread(rebuild_render_plan, dashboard_id, stored)
+
+
+# ---------- PANELS ----------
+async def get_table_data(table: TableData, saved_search: dict) -> dict:
+    index, query = build_table_query(table, saved_search)
+    data = await search(index, query)
+    with timing.phase("format"):
+        return format_table_data(data)
+
+
+async def create_bar_chart(vizData: VizData) -> dict:
+    ez_query, is_breakdown = build_bar_chart_query(vizData)
+    response = await search(vizData.index, ez_query)
+    return bar_chart_response(vizData, response, is_breakdown)
+
+
+async def render_visualizer(panel: dict, lte: str, gte: str) -> Optional[dict]:
+    budget = deadline.current()
+    if budget is not None:
+        budget.check()
+    if panel["visualization"] is None:
+        return None
+    visualization = Visualization.model_validate(panel["visualization"])
+    if visualization.type == VisualizationType.TABLE:
+        table = TableData.model_validate(visualization.table_data)
+        table.lte = lte
+        table.gte = gte
+        data = {}
+        if panel["saved_search"] is not None:
+            data = await get_table_data(table, panel["saved_search"])
+        return enriched_visualizer(visualization, table, data)
+    if visualization.type == VisualizationType.BAR:
+        bar_chart = VizData.model_validate(visualization.viz_data)
+        bar_chart.lte = lte
+        bar_chart.gte = gte
+        bar_data = await create_bar_chart(bar_chart)
+        return enriched_visualizer(visualization, bar_chart, bar_data["data"])
+    return None
+
+
+async def render_panel(
+    dashboard_id,
+    visualizer_info: Visualization,
+    panel: dict,
+    lte: str,
+    gte: str,
+    include_timings: bool,
+) -> Optional[dict]:
+    viz_id = str(visualizer_info.viz_id)
+    # each panel runs in its own task, so the scope and origin stay per panel
+    with timing.scope(viz_id) as viz_timings, slow_queries.origin(
+        dashboard_id=str(dashboard_id), viz_id=viz_id
+    ):
+        try:
+            enriched = await render_visualizer(panel, lte, gte)
+        except (deadline.DeadlineExceeded, AsyncConnectionTimeout) as e:
+            logger.warning(f"Visualization {viz_id} timed out: {e}")
+            enriched = panel_status(visualizer_info, "timeout")
+        except ClusterUnavailable as e:
+            logger.warning(f"Visualization {viz_id} skipped: {e}")
+            enriched = panel_status(visualizer_info, "unavailable", str(e))
+        except AsyncTransportError as e:
+            logger.error(f"Visualization {viz_id} failed: {e}")
+            enriched = panel_status(visualizer_info, "error", str(e))
+    if enriched is not None and include_timings:
+        enriched["_timings"] = viz_timings.as_dict()
+    return enriched
+
+
+# ------------------------------
+#  View Dashboard with Data
+# ------------------------------
+async def view_dashboard(
+    dashboard_id: uuid.UUID, lte: str, gte: str, include_timings: bool = False
+):
+    plan = await get_render_plan(str(dashboard_id))
+    if not plan:
+        return {"error": "Dashboard not found"}, 404
+    dashboard = DashboardRequest.model_validate(plan["dashboard"])
+
+    panels = await asyncio.gather(
+        *(
+            render_panel(dashboard_id, visualizer_info, panel, lte, gte, include_timings)
+            for visualizer_info, panel in zip(dashboard.visualizers or [], plan["panels"])
+        )
+    )
+    return dashboard_view(dashboard, [panel for panel in panels if panel is not None])
+
+
+# ------------------------------
+#  Stream Dashboard Panels (SSE)
+# ------------------------------
+def stream_dashboard(
+    dashboard_id: uuid.UUID, lte: str, gte: str, include_timings: bool = False
+):
+    """
+    Server-Sent Events variant of `view_dashboard`. Yields a `dashboard`
+    event with every visualizer marked pending, then one `panel` event per
+    visualizer (same payload as in `view_dashboard`, SSE id = position) as
+    soon as it is rendered, then `done`. Returns None if there is no such
+    dashboard.
+    """
+    with timing.phase("dashboard_lookup"):
+        plan = get_render_plan_sync(str(dashboard_id))
+    if not plan:
+        return None
+    dashboard = DashboardRequest.model_validate(plan["dashboard"])
+
+    visualizers = dashboard.visualizers or []
+    # start every panel now, while the request context is still current
+    futures = {
+        runtime.submit(
+            render_panel(dashboard_id, visualizer_info, panel, lte, gte, include_timings)
+        ): position
+        for position, (visualizer_info, panel) in enumerate(zip(visualizers, plan["panels"]))
+    }
+    return _panel_events(dashboard, visualizers, futures)
+
+
+def _panel_events(dashboard, visualizers, futures):
+    try:
+        skeleton = dashboard_view(dashboard, [panel_status(v, "pending") for v in visualizers])
+        yield _sse("dashboard", skeleton)
+        for future in concurrent.futures.as_completed(futures):
+            panel = future.result()
+            if panel is not None:
+                yield _sse("panel", panel, event_id=futures[future])
+        yield _sse("done", {"panels": len(visualizers)})
+    finally:
+        # the client went away: stop whatever is still running
+        for future in futures:
+            future.cancel()
+
+
+def _sse(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def close_clients():
+    for client in _clients.values():
+        await client.close()
+    _clients.clear()
+    _semaphores.clear()
+
+
+def shutdown():
+    """Close the async clients and stop the runtime loop (worker exit)."""
+    if not runtime.started:
+        return
+    runtime.run(close_clients(), timeout=10)
+    runtime.stop()
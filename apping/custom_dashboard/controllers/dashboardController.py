@@ -1,10 +1,13 @@
+import base64
 import copy
 import datetime
+import hashlib
 import re
 import uuid
 from typing import Optional
 
-from flask import request
+from flask import has_request_context, request
+from pydantic import ValidationError
 from apping.custom_dashboard.model import (
     ChartData,
     DashboardRequest,
@@ -24,12 +27,29 @@ from apping.custom_dashboard.controllers.visualizationController import (
 from apping.custom_dashboard.controllers.filtersController import (
     CustomDashboardAdvancedFilters,
 )
+from apping.custom_dashboard import index_templates
+from apping.custom_dashboard.saved_search_catalog import SavedSearchCatalog
 
 
 from apping import ResponseDto, date_delta, es, format_dates_list, daterange
-from elasticsearch.exceptions import NotFoundError, RequestError, TransportError
+from elasticsearch import helpers
+from elasticsearch.exceptions import (
+    ConflictError,
+    ConnectionTimeout,
+    NotFoundError,
+    RequestError,
+    TransportError,
+)
 
-from apping.custom_dashboard.controllers.esController import es_con
+from apping.custom_dashboard.controllers.esController import (
+    client_for,
+    router,
+    run_search,
+    search_routed,
+)
+from utils import deadline, metrics, slow_queries, timing
+from utils.circuit_breaker import ClusterUnavailable
+from utils.ttl_cache import MISSING, TTLCache
 from utils.util import logger
 import time
 import json
@@ -39,6 +59,63 @@ CACHE_TTL = 300  # seconds
 _last_cache_time = 0
 _field_sources_cache = {}
 
+# dashboard name -> (_id, cached at); dropped on writes in this process,
+# the TTL bounds how long a rename or delete in another worker is missed
+DASHBOARD_ID_CACHE_TTL = 60  # seconds
+_dashboard_ids_cache = {}
+
+# (title, index) -> columns/filter/index_name of a saved search, or None
+# if there is none; preloaded by every load of the saved search catalog.
+# Saved searches are written outside this app: the TTL bounds how long an
+# edit goes unseen unless invalidate_saved_searches is called
+SAVED_SEARCH_CACHE_TTL = 300  # seconds
+SAVED_SEARCH_CACHE_SIZE = 2048
+_saved_searches_cache = TTLCache(SAVED_SEARCH_CACHE_SIZE, SAVED_SEARCH_CACHE_TTL)
+
+# Bumped when the layout of a render plan changes; older plans are rebuilt
+RENDER_PLAN_VERSION = 2
+
+# A name reservation is made before its dashboard is written (visualizations
+# are saved in between); until it is this old, a missing dashboard may still
+# be on its way and the reservation is not taken over as stale
+NAME_RESERVATION_GRACE = 60  # seconds
+
+# Attempts of a visualizer write that conflicts with a concurrent edit
+VISUALIZER_WRITE_RETRIES = 3
+
+# Painless scripts editing one visualizer in place, so a visualization
+# edit is a single conditional write without shipping the whole array
+APPEND_VISUALIZER_SCRIPT = """
+if (ctx._source.visualizers == null) { ctx._source.visualizers = new ArrayList(); }
+ctx._source.visualizers.add(params.visualization);
+ctx._source.updated_at = params.updated_at;
+"""
+
+MERGE_VISUALIZER_SCRIPT = """
+boolean found = false;
+if (ctx._source.visualizers != null) {
+  for (def viz : ctx._source.visualizers) {
+    if (viz.viz_id == params.visualization.viz_id) { viz.putAll(params.visualization); found = true; break; }
+  }
+}
+if (found) { ctx._source.updated_at = params.updated_at; } else { ctx.op = 'noop'; }
+"""
+
+REMOVE_VISUALIZER_SCRIPT = """
+def title = params.title;
+if (ctx._source.visualizers != null && ctx._source.visualizers.removeIf(viz -> viz.title == title)) {
+  ctx._source.updated_at = params.updated_at;
+} else {
+  ctx.op = 'noop';
+}
+"""
+
+CACHE_REQUESTS = metrics.counter(
+    "custom_dashboard_cache_requests_total",
+    "In-process cache lookups by cache and result (hit/miss).",
+    ("cache", "result"),
+)
+
 
 def convert_local_to_utc(local_date):
     # Try parsing with microseconds, fallback to without
@@ -193,17 +270,30 @@ def build_es_query(
     return query_body
 
 
-def get_table_data(table: TableData):
-    """
-    Extracts table data from the visualizers in a dashboard.
-    Returns a dictionary with the table data.
-    """
+def saved_search_field(field: str) -> str:
+    """`field` of the saved searches as it can be queried (see index_templates.lookup_field)."""
+    return index_templates.lookup_field(es, "saved_searches", field)
+
+
+def saved_search_query(table: TableData) -> dict:
+    """Query for the saved search a table is built from."""
+    return {
+        "query": {
+            "bool": {
+                "must": [
+                    {"term": {saved_search_field("title"): table.title}},
+                    {"term": {saved_search_field("index_name"): table.index}},
+                ]
+            }
+        },
+    }
 
-    print(f"Received table request: {table}")
 
-    # for table in table_request:
-    index = table.index
-    title = table.title
+def build_table_query(table: TableData, saved_search: dict):
+    """
+    Build the data query for a table from its saved search.
+    Returns (index, query).
+    """
     custom_filters = table.custom_filter
 
     lte = None
@@ -215,91 +305,76 @@ def get_table_data(table: TableData):
     if page > 1:
         page = (page - 1) * size
 
-    sort_field = table.sort_field
-    sort_order = table.sort_order
-
     if (
         table.lte is not None
         and table.gte is not None
-        and index != "wazuh-states-vulnerabilities-*"
+        and table.index != "wazuh-states-vulnerabilities-*"
     ):
         lte = table.lte
         gte = table.gte
 
-    table_query = {
-        "query": {
-            "bool": {
-                "must": [
-                    {"term": {"title.keyword": title}},
-                    {"term": {"index_name.keyword": index}},
-                ]
-            }
-        },
+    cols = saved_search["columns"]
+    # copied: the saved search may be shared (render plans)
+    filters = list(saved_search["filter"] or [])
+    index = saved_search["index_name"]
+
+    if custom_filters is not None and len(custom_filters) > 0:
+        filters.extend(custom_filters)
+
+    query = build_es_query(
+        gte=gte,
+        lte=lte,
+        search=None,
+        filter_response=filters,
+        selected_fields=cols,
+        size=size,
+        from_=page,
+        sort_field=table.sort_field,
+        sort_order=table.sort_order,
+        search_after=None,  # Assuming no pagination with search_after for now
+    )
+    return index, query
+
+
+def format_table_data(data: dict) -> dict:
+    """Flatten the hits of a table query into rows."""
+    details_list = []
+    for event in data["hits"]["hits"]:
+        document_id = event["_id"]
+        source_data = event["_source"]
+        source_data = convert_list_to_strings(source_data)
+        flattened_doc = source_data
+        flattened_doc["_id"] = document_id
+        details_list.append(flattened_doc)
+
+    return {
+        "details": details_list,
+        "total_records": data["hits"]["total"]["value"],
     }
 
-    print(f"Table query: {json.dumps(table_query, indent=2)}")
 
-    table_data = {}
+def get_table_data(table: TableData):
+    """
+    Extracts table data from the visualizers in a dashboard.
+    Returns a dictionary with the table data.
+    """
 
-    res = es.search(index="saved_searches", body=table_query)
-    print(f"Search result: {res}")
-    for hit in res["hits"]["hits"]:
-        print("??!!!")
-        cols = hit["_source"]["columns"]
-        filters = hit["_source"]["filter"]
-        index = hit["_source"]["index_name"]
+    print(f"Received table request: {table}")
 
-        if custom_filters is not None and len(custom_filters) > 0:
-            filters.extend(custom_filters)
+    table_data = {}
 
-        query = build_es_query(
-            gte=gte,
-            lte=lte,
-            search=None,
-            filter_response=filters,
-            selected_fields=cols,
-            size=size,
-            from_=page,
-            sort_field=sort_field,
-            sort_order=sort_order,
-            search_after=None,  # Assuming no pagination with search_after for now
-        )
+    saved_search = load_saved_searches([table]).get((table.title, table.index))
+    if saved_search is not None:
+        index, query = build_table_query(table, saved_search)
 
         print(f"Executing query for index {index}: {json.dumps(query, indent=2)}")
 
-        es_client = None
-        if index == "logstash-*":
-            es_client = es_con
-        else:
-            es_client = es
-
-        data = es_client.search(
-            index=index,
-            body=query,
-        )
+        data = run_search(client_for(index), index, query)
 
         print(f"Query result: {data}")
 
-        details_list = []
-        for event in data["hits"]["hits"]:
-            document_id = event["_id"]
-            source_data = event["_source"]
-            source_data = convert_list_to_strings(source_data)
-            flattened_doc = source_data
-            flattened_doc["_id"] = document_id
-            details_list.append(flattened_doc)
-
-        # table_data.append(
-        #     {
-        #         "details": details_list,
-        #         "total_records": data["hits"]["total"]["value"],
-        #     }
-        # )
-
-        table_data = {
-            "details": details_list,
-            "total_records": data["hits"]["total"]["value"],
-        }
+        with timing.phase("format"):
+            table_data = format_table_data(data)
 
     return {
         "data": table_data,
@@ -349,6 +424,112 @@ def resolve_field_name(es, index_pattern: str, field: str) -> Optional[str]:
 
 
 # ---------- CREATE DASHBOARD VISUALIZATIONS FUNCTION----------
+def write_refresh_policy() -> str:
+    """
+    Refresh policy for dashboard writes. Writes don't wait for a refresh
+    unless the caller asks for read-your-writes with `?refresh=wait_for`.
+    """
+    if has_request_context() and request.args.get("refresh") == "wait_for":
+        return "wait_for"
+    return "false"
+
+
+def dashboard_name_key(name: str) -> str:
+    """Document _id of the reservation of a dashboard name."""
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()
+
+
+def reserve_dashboard_name(name: str, dashboard_id) -> Optional[dict]:
+    """
+    Reserve `name` for `dashboard_id` in `.custom_dashboard_names` with a
+    create-only write keyed by the name, so the cluster rejects a second
+    dashboard with the same name even when both are created concurrently.
+
+    Reservations are dropped when their dashboard is deleted, but not on
+    rename, and a drop can fail: one whose dashboard no longer has that
+    name, or is gone and was reserved more than NAME_RESERVATION_GRACE ago
+    (so it is not still being created), is stale and is taken over here
+    with a compare-and-set on its seq_no/primary_term.
+
+    Returns the write response, or None if the name is taken.
+    """
+    key = dashboard_name_key(name)
+    reservation = {
+        "name": name,
+        "dashboard_id": str(dashboard_id),
+        "reserved_at": int(time.time() * 1000),
+    }
+    try:
+        return es.create(index=".custom_dashboard_names", id=key, body=reservation)
+    except ConflictError:
+        pass
+
+    try:
+        current = es.get(index=".custom_dashboard_names", id=key)
+    except NotFoundError:
+        # released in the meantime
+        return reserve_dashboard_name(name, dashboard_id)
+    owner = current["_source"].get("dashboard_id")
+    if owner == str(dashboard_id):
+        return current
+    owner_doc = get_dashboard_document(owner)
+    if owner_doc is not None and owner_doc["_source"].get("name") == name:
+        return None
+    if owner_doc is None:
+        # reservations made before `reserved_at` existed count as old
+        reserved_at = current["_source"].get("reserved_at") or 0
+        if reservation["reserved_at"] - reserved_at < NAME_RESERVATION_GRACE * 1000:
+            return None
+
+    try:
+        return es.index(
+            index=".custom_dashboard_names",
+            id=key,
+            body=reservation,
+            if_seq_no=current["_seq_no"],
+            if_primary_term=current["_primary_term"],
+        )
+    except ConflictError:
+        return None
+
+
+def release_dashboard_name(name: str, reservation: dict):
+    """Drop a reservation made by `reserve_dashboard_name` (failed create)."""
+    try:
+        es.delete(
+            index=".custom_dashboard_names",
+            id=dashboard_name_key(name),
+            if_seq_no=reservation["_seq_no"],
+            if_primary_term=reservation["_primary_term"],
+        )
+    except (ConflictError, NotFoundError):
+        pass
+    except TransportError as e:
+        logger.warning(f"Failed to release dashboard name '{name}': {e}")
+
+
+def release_dashboard_names(dashboard_id):
+    """Drop the name reservations of a deleted dashboard, so its name is free at once."""
+    try:
+        es.delete_by_query(
+            index=".custom_dashboard_names",
+            body={
+                "query": {
+                    "term": {
+                        index_templates.lookup_field(
+                            es, ".custom_dashboard_names", "dashboard_id"
+                        ): str(dashboard_id)
+                    }
+                }
+            },
+            conflicts="proceed",
+            ignore_unavailable=True,
+        )
+    except TransportError as e:
+        # the name is taken over once its reservation is past the grace period
+        logger.warning(f"Failed to release the names of dashboard {dashboard_id}: {e}")
+
+
 def create_dashboard(body: DashboardRequest):
     """
     Create a dashboard resource
@@ -356,35 +537,20 @@ def create_dashboard(body: DashboardRequest):
     logger.info(msg=f"{body}")
 
     try:
-        # Extract dashboard_id from the request body
-        dashboard_id = body.dashboard_id
         dashboard_name = body.name
 
-        # Check if document exists in custom_dashboard index
         try:
-            if dashboard_id:
-                # Search for existing dashboard with the same dashboard_id
-                search_query = {
-                    "query": {"term": {"dashboard_id.keyword": str(dashboard_id)}}
-                }
-
-                response = es.search(
-                    index=".custom_dashboards", body=search_query, size=1
-                )
-
-                # Check if any documents were found
-                if response["hits"]["total"]["value"] > 0:
-                    return {
-                        "message": "Dashboard with this ID already exists!",
-                    }, 400
+            # generating uuid; a dashboard_id sent by the client is not used,
+            # so there is nothing to check before the create-only write
+            body.dashboard_id = uuid.uuid4()
 
-            # Check if dashboard with same NAME exists
+            # Reserve the NAME; fails if a dashboard with same NAME exists
+            reservation = None
             if dashboard_name:
-                name_query = {"query": {"term": {"name.keyword": str(dashboard_name)}}}
-                name_response = es.search(
-                    index=".custom_dashboards", body=name_query, size=1
+                reservation = reserve_dashboard_name(
+                    str(dashboard_name), body.dashboard_id
                 )
-                if name_response["hits"]["total"]["value"] > 0:
+                if reservation is None:
                     return {
                         "message": f"Dashboard name already exists!",
                     }, 400
@@ -392,12 +558,14 @@ def create_dashboard(body: DashboardRequest):
             visualizers = body.visualizers
 
             inserted_visualizations, err = save_visualizations(
-                ".saved_visualizations", visualizers
+                ".saved_visualizations", visualizers, refresh=write_refresh_policy()
             )
 
             print(f"Inserted visualizations: {inserted_visualizations}")
 
             if inserted_visualizations is None:
+                if reservation is not None:
+                    release_dashboard_name(str(dashboard_name), reservation)
                 return {
                     "message": "Error saving visualizations",
                     "error": err,
@@ -408,9 +576,6 @@ def create_dashboard(body: DashboardRequest):
 
             print(f"Inserted visualizations: {inserted_visualizations}")
 
-            # generating uuid
-            body.dashboard_id = uuid.uuid4()
-
             # If no existing dashboard found, proceed with creation
             # Add timestamps
 
@@ -425,8 +590,21 @@ def create_dashboard(body: DashboardRequest):
 
             print(f"Dashboard data to index: {dashboard_data}")
 
-            # Index the new dashboard document
-            index_response = es.index(index=".custom_dashboards", body=dashboard_data)
+            # Index the new dashboard document (create-only)
+            try:
+                index_response = es.create(
+                    index=".custom_dashboards",
+                    id=str(body.dashboard_id),
+                    body=dashboard_data,
+                    refresh=write_refresh_policy(),
+                )
+            except TransportError:
+                if reservation is not None:
+                    release_dashboard_name(str(dashboard_name), reservation)
+                raise
+
+            # views read the render plan; built here from the specs just saved
+            refresh_render_plan(body.dashboard_id, dashboard_data, index_response, visualizers)
 
             return {
                 "message": "Dashboard created successfully",
@@ -470,21 +648,10 @@ def update_dashboard(body: DashboardRequest):
             if not dashboard_id:
                 return {"message": "Dashboard ID is required"}, 400
 
-            # Search for existing dashboard with the same dashboard_id
-            search_query = {
-                "query": {"term": {"dashboard_id.keyword": str(dashboard_id)}}
-            }
-
-            response = es.search(index=".custom_dashboards", body=search_query, size=1)
-
-            # Check if dashboard exists
-            if response["hits"]["total"]["value"] == 0:
-                return {
-                    "message": "Dashboard not found!",
-                }, 404
-
-            dashboard_es_id = response["hits"]["hits"][0]["_id"]
-            current_dashboard = response["hits"]["hits"][0]["_source"]
+            # Check if dashboard exists (realtime, by _id) before its
+            # visualizations are written
+            if not es.exists(index=".custom_dashboards", id=str(dashboard_id)):
+                return {"message": "Dashboard not found"}, 404
 
             # Check if dashboard with same NAME exists (only if name is being changed)
             # if dashboard_name and dashboard_name != current_dashboard.get("name"):
@@ -502,7 +669,7 @@ def update_dashboard(body: DashboardRequest):
             print(f"Visualizers to update: {visualizers}")
 
             inserted_visualizations, err = save_visualizations(
-                ".saved_visualizations", visualizers
+                ".saved_visualizations", visualizers, refresh=write_refresh_policy()
             )
 
             # print(f"Updated visualizations: {inserted_visualizations}")
@@ -528,12 +695,21 @@ def update_dashboard(body: DashboardRequest):
             # Remove fields that shouldn't be updated
             dashboard_data.pop("created_at", None)
 
-            # Update the existing dashboard document
-            update_response = es.update(
-                index=".custom_dashboards",
-                id=dashboard_es_id,
-                body={"doc": dashboard_data},
-            )
+            # Update the existing dashboard document (realtime, by _id); it
+            # may still have been deleted since the check
+            try:
+                update_response = es.update(
+                    index=".custom_dashboards",
+                    id=str(dashboard_id),
+                    body={"doc": dashboard_data},
+                    refresh=write_refresh_policy(),
+                )
+            except NotFoundError as e:
+                if e.error == "index_not_found_exception":
+                    raise
+                return {"message": "Dashboard not found"}, 404
+            invalidate_dashboard_name(dashboard_id)
+            refresh_render_plan(dashboard_id, dashboard_data, update_response, visualizers)
 
             return {
                 "message": "Dashboard updated successfully",
@@ -576,27 +752,21 @@ def update_dashboard_info(body: UpdateDashboard):
         if not dashboard_id:
             return {"message": "dashboard_id is required"}, 400
 
-        # Search for dashboard by dashboard_id
-        search_query = {"query": {"term": {"dashboard_id.keyword": str(dashboard_id)}}}
-        search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+        # Get dashboard by dashboard_id
+        dashboard_doc = get_dashboard_document(dashboard_id)
 
-        if search_result["hits"]["total"]["value"] == 0:
+        if dashboard_doc is None:
             return {"message": "Dashboard not found"}, 404
 
-        # Check if dashboard with same NAME exists
-        if new_name:
-            name_query = {"query": {"term": {"name.keyword": str(new_name)}}}
-            name_response = es.search(
-                index=".custom_dashboards", body=name_query, size=1
-            )
-            if name_response["hits"]["total"]["value"] > 0:
+        old_data = dashboard_doc["_source"]
+
+        # Reserve the new NAME; fails if a dashboard with same NAME exists
+        if new_name and new_name != old_data.get("name"):
+            if reserve_dashboard_name(str(new_name), dashboard_id) is None:
                 return {
                     "message": f"Dashboard name already exists!",
                 }, 400
 
-        dashboard_es_id = search_result["hits"]["hits"][0]["_id"]
-        old_data = search_result["hits"]["hits"][0]["_source"]
-
         update_data = {}
         if new_name is not None:
             update_data["name"] = new_name
@@ -610,8 +780,12 @@ def update_dashboard_info(body: UpdateDashboard):
         )
 
         es.update(
-            index=".custom_dashboards", id=dashboard_es_id, body={"doc": update_data}
+            index=".custom_dashboards",
+            id=str(dashboard_id),
+            body={"doc": update_data},
+            refresh=write_refresh_policy(),
         )
+        invalidate_dashboard_name(dashboard_id)
 
         # Log after changes
         new_data = {**old_data, **update_data}
@@ -633,39 +807,37 @@ def update_dashboard_info(body: UpdateDashboard):
 # ---------- DELETE DASHBOARD FUNCTION----------
 def delete_dashboard(body: DeleteDashboard):
     """
-    Delete a dashboard by NAME (query param) with logging
+    Delete a dashboard by dashboard_id (realtime, by _id) with logging
     """
 
-    logger.info(f"Received update request: {body}")
+    logger.info(f"Received delete request: {body}")
 
     try:
-        dashboard_name = body.dashboard_id
-        if not dashboard_name:
-            return {"message": "Query parameter 'name' is required"}, 400
-
-        # Search existing dashboard
-        search_query = {
-            "query": {"term": {"dashboard_id.keyword": str(dashboard_name)}}
-        }
-        search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+        dashboard_id = body.dashboard_id
+        if not dashboard_id:
+            return {"message": "Dashboard ID is required"}, 400
 
-        if search_result["hits"]["total"]["value"] == 0:
+        # Perform delete (realtime, by _id)
+        try:
+            delete_response = es.delete(
+                index=".custom_dashboards",
+                id=str(dashboard_id),
+                refresh=write_refresh_policy(),
+            )
+        except NotFoundError:
             return {"message": "Dashboard not found"}, 404
+        finally:
+            invalidate_dashboard_name(dashboard_id)
+            delete_render_plan(dashboard_id)
+        release_dashboard_names(dashboard_id)
 
-        dashboard_id = search_result["hits"]["hits"][0]["_id"]
-        old_data = search_result["hits"]["hits"][0]["_source"]
-
-        # Log before deletion
         logger.info(
-            f"[DELETE] Dashboard '{dashboard_name}' (ID: {dashboard_id}) - DATA: {old_data}"
+            f"[DELETE] Dashboard (ID: {dashboard_id}) - VERSION: {delete_response.get('_version')}"
         )
 
-        # Perform delete
-        es.delete(index=".custom_dashboards", id=dashboard_id)
-
         return {
             "message": "Dashboard deleted successfully",
-            "dashboard_id": dashboard_name,
+            "dashboard_id": dashboard_id,
             "responseDto": ResponseDto().ok(),
         }
 
@@ -675,10 +847,48 @@ def delete_dashboard(body: DeleteDashboard):
 
 
 # ---------- LIST ALL DASHBOARDS FUNCTION----------
+def encode_cursor(sort_values: list, total: int) -> str:
+    """Opaque `cursor` for the page after the hit with `sort_values`."""
+    state = json.dumps({"after": sort_values, "total": total}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(state.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> dict:
+    state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    if not isinstance(state, dict) or not isinstance(state.get("after"), list):
+        raise ValueError("cursor without sort values")
+    return state
+
+
+# asked for by list searches whose response makes the list's ETag
+LAST_UPDATED_AGG = {"last_updated": {"max": {"field": "updated_at"}}}
+
+
+def dashboard_list_stamp(response: dict) -> tuple:
+    """(total, latest updated_at) from a list search with LAST_UPDATED_AGG and total hits."""
+    last_updated = response["aggregations"]["last_updated"]
+    return (
+        response["hits"]["total"]["value"],
+        last_updated.get("value_as_string", last_updated.get("value")),
+    )
+
+
+def dashboard_list_etag(total: int, last_updated) -> str:
+    stamp = json.dumps([total, last_updated, sorted(request.args.items())], default=str)
+    return hashlib.sha1(stamp.encode("utf-8")).hexdigest()
+
+
 def list_dashboards():
     """
     List all dashboards with name, description, updated_at
     Sorted by latest updated first
+
+    Query params: page/size, field/order (sort), name_prefix, and cursor
+    (the `next_cursor` of the previous page, for search_after paging).
+    Responses without a cursor carry an ETag derived from the total and the
+    latest updated_at, both computed by the page search itself. Requests
+    with If-None-Match first get just those two, and a 304 without the
+    page if they match. Cursor pages reuse the total of the first page.
     """
     try:
         # Get pagination params from request (default: page=1, size=20)
@@ -686,25 +896,73 @@ def list_dashboards():
         size = int(request.args.get("size", 20))
         sort_field = request.args.get("field", "updated_at")
         sort_order = request.args.get("order", "desc")
+        name_prefix = request.args.get("name_prefix")
+        cursor = request.args.get("cursor")
+
+        if cursor:
+            try:
+                cursor_state = decode_cursor(cursor)
+            except ValueError:
+                return {"message": "Invalid cursor"}, 400
+
+        # name, description and dashboard_id are keyword fields (or their
+        # .keyword sub-fields on indices not reindexed yet, see index_templates)
+        # dashboard_id (the _id) breaks ties, so search_after never skips a dashboard
+        field = lambda name: index_templates.lookup_field(es, ".custom_dashboards", name)
+        sort = [{field(sort_field): {"order": sort_order}}]
+        if sort_field != "dashboard_id":
+            sort.append({field("dashboard_id"): {"order": sort_order}})
+
+        if name_prefix:
+            query = {
+                "prefix": {
+                    field("name"): {"value": name_prefix, "case_insensitive": True}
+                }
+            }
+        else:
+            query = {"match_all": {}}
 
-        # Use .keyword for sortable text fields
-        sortable_fields = {"name", "description", "dashboard_id"}
-        es_sort_field = sort_field
-        if sort_field in sortable_fields:
-            es_sort_field = f"{sort_field}.keyword"
-
-        # Calculate from_ for ES pagination
-        from_ = (page - 1) * size
+        if not cursor and request.if_none_match:
+            # revalidation: only the stamp, the page is fetched if it changed
+            stamp_response = es.search(
+                index=".custom_dashboards",
+                body={
+                    "query": query,
+                    "size": 0,
+                    "track_total_hits": True,
+                    "aggs": LAST_UPDATED_AGG,
+                },
+            )
+            etag = dashboard_list_etag(*dashboard_list_stamp(stamp_response))
+            if request.if_none_match.contains_weak(etag):
+                return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
 
-        query = {
+        body = {
             "_source": ["dashboard_id", "name", "description", "updated_at"],
-            "query": {"match_all": {}},
-            "sort": [{es_sort_field: {"order": sort_order}}],
+            "query": query,
+            "sort": sort,
+            "track_total_hits": not cursor,
         }
-        response = es.search(
-            index=".custom_dashboards", body=query, size=size, from_=from_
-        )
+        if cursor:
+            body["search_after"] = cursor_state["after"]
+            response = es.search(index=".custom_dashboards", body=body, size=size)
+        else:
+            body["aggs"] = LAST_UPDATED_AGG
+            # Calculate from_ for ES pagination
+            from_ = (page - 1) * size
+            response = es.search(
+                index=".custom_dashboards", body=body, size=size, from_=from_
+            )
+
+        headers = {}
+        if cursor:
+            total = cursor_state.get("total")
+        else:
+            total, last_updated = dashboard_list_stamp(response)
+            etag = dashboard_list_etag(total, last_updated)
+            headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
 
+        hits = response["hits"]["hits"]
         dashboards = [
             {
                 "dashboard_id": hit["_source"].get("dashboard_id"),
@@ -712,17 +970,21 @@ def list_dashboards():
                 "description": hit["_source"].get("description"),
                 "updated_at": hit["_source"].get("updated_at"),
             }
-            for hit in response["hits"]["hits"]
+            for hit in hits
         ]
 
-        total = response["hits"]["total"]["value"]
+        next_cursor = None
+        if len(hits) == size and hits[-1].get("sort"):
+            next_cursor = encode_cursor(hits[-1]["sort"], total)
+
         return {
             "dashboards": dashboards,
             "total": total,
             "page": page,
             "size": size,
+            "next_cursor": next_cursor,
             "responseDto": ResponseDto().ok(),
-        }
+        }, 200, headers
 
     except Exception as e:
         logger.error(f"Failed to list dashboards: {e}")
@@ -731,13 +993,15 @@ def list_dashboards():
 
 # ---------- VIEW DASHBOARD DETAILS FUCNTION----------
 def get_dashboard_details(dashboard_name: str):
-    search_query = {"query": {"match": {"name": dashboard_name}}}
-    response = es.search(index=".custom_dashboards", body=search_query, size=1)
+    dashboard_id = dashboard_id_for_name(dashboard_name)
+    dashboard_doc = get_dashboard_document(dashboard_id) if dashboard_id else None
 
-    if response["hits"]["total"]["value"] == 0:
+    if dashboard_doc is None:
+        if dashboard_id:
+            invalidate_dashboard_name(dashboard_id)
         return {"message": "Dashboard not found"}, 404
 
-    source = response["hits"]["hits"][0]["_source"]
+    source = dashboard_doc["_source"]
 
     # Only return selected fields
     filtered_data = {
@@ -872,11 +1136,8 @@ def refresh_field_sources():
     global _field_sources_cache, _last_cache_time
 
     index_patterns = {
-        "wazuh-alerts-*": get_flattened_fields(es, "wazuh-alerts-*"),
-        "wazuh-states-vulnerabilities-*": get_flattened_fields(
-            es, "wazuh-states-vulnerabilities-*"
-        ),
-        "logstash-*": get_flattened_fields(es_con, "logstash-*"),
+        pattern: get_flattened_fields(client_for(pattern), pattern)
+        for pattern in router.patterns()
     }
 
     field_sources = {}
@@ -947,7 +1208,10 @@ def get_all_fields_with_sources():
     """Return cached mapping unless TTL expired."""
     global _last_cache_time
     if not _field_sources_cache or (time.time() - _last_cache_time > CACHE_TTL):
+        CACHE_REQUESTS.inc(cache="field_sources", result="miss")
         refresh_field_sources()
+    else:
+        CACHE_REQUESTS.inc(cache="field_sources", result="hit")
     return _field_sources_cache
 
 
@@ -965,8 +1229,7 @@ def get_field_type_for_field(field_name):
     print("Field sources:", field_sources[field_name])
     for pattern in field_sources[field_name]:
         print("??")
-        es_client = es_con if pattern == "logstash-*" else es
-        field_type = get_field_type(es_client, pattern, field_name)
+        field_type = get_field_type(client_for(pattern), pattern, field_name)
         if field_type:
             return field_type, pattern
 
@@ -983,7 +1246,7 @@ def get_field_values_service(field_name):
         return []  # Not found
 
     for pattern in field_sources[field_name]:
-        es_client = es_con if pattern == "logstash-*" else es
+        es_client = client_for(pattern)
         field_type = get_field_type(es_client, pattern, field_name)
 
         # print(f"Checking {field_name} in {pattern} with type {field_type}")
@@ -1029,43 +1292,75 @@ def get_field_values_service(field_name):
 
 
 # ---------- GET SAVED SEARCHES TITLE FOR DASHBOARD AND VISUALIZATONS FUNCTION FOR TABLE DATA----------
+def preload_saved_searches(sources: list) -> None:
+    """Cache the definitions of saved searches the catalog (re)loaded."""
+    _saved_searches_cache.update(
+        ((source.get("title"), source.get("index_name")), saved_search_definition(source))
+        for source in sources
+    )
+
+
+def saved_searches_changed(sources: list) -> None:
+    """Drop the render plans built from saved searches the catalog found edited."""
+    titles = sorted({str(source["title"]) for source in sources if "title" in source})
+    if titles:
+        drop_render_plans([{"terms": {"saved_search_titles": titles}}])
+
+
+saved_search_catalog = SavedSearchCatalog(
+    es, on_load=preload_saved_searches, on_change=saved_searches_changed
+)
+
+
 def saved_searches_all_titles():
     """
-    Retrieve all titles from the 'saved_searches' index in Elasticsearch.
+    Retrieve the titles of the saved searches, sorted by title and index,
+    from the in-memory saved search catalog.
+
+    Query params: prefix (of the title, case-insensitive), index (exact
+    index name), page/size (all matches if no size is given).
 
     Returns:
         dict: A dictionary containing the response.
             If successful and titles are found, returns an 'ok' response with the list of titles.
             If no titles are found, returns a 'no_content' response.
-            If an error occurs, returns an 'error' response with the message.
+            If an error occurs, returns an error with its details and a 500 status.
     """
+    args = request.args if has_request_context() else {}
     try:
-        # Elasticsearch query to fetch all titles (no role filter)
-        query = {
-            "query": {"match_all": {}},
-            "size": 1000,
-            "_source": ["title", "index_name"],
-        }
-
-        response = es.search(index="saved_searches", body=query)
+        page = int(args.get("page", 1))
+        size = int(args["size"]) if args.get("size") else None
+    except ValueError:
+        return {"message": "page and size must be integers"}, 400
+    if page < 1 or (size is not None and size < 1):
+        return {"message": "page and size must be positive"}, 400
 
-        hits = response["hits"]["hits"]
+    try:
+        saved_searches, total = saved_search_catalog.search(
+            prefix=args.get("prefix", ""),
+            index=args.get("index") or None,
+            page=page,
+            size=size,
+        )
 
-        if hits:
+        if saved_searches:
             titles = [
-                {
-                    "title": hit["_source"].get("title"),
-                    "index": hit["_source"].get("index_name"),
-                }
-                for hit in hits
-                if "title" in hit["_source"] and "index_name" in hit["_source"]
+                {"title": saved_search.title, "index": saved_search.index_name}
+                for saved_search in saved_searches
             ]
-            return {"responseDto": ResponseDto().ok(), "saved_searches": titles}
+            return {
+                "responseDto": ResponseDto().ok(),
+                "saved_searches": titles,
+                "total": total,
+                "page": page,
+                "size": size,
+            }
         else:
             return {"responseDto": ResponseDto().no_content()}
 
     except Exception as e:
-        return {"responseDto": ResponseDto().error(str(e))}
+        logger.error(f"Error listing saved searches: {e}")
+        return {"error": "Internal server error", "details": str(e)}, 500
 
 
 # ---------- LIST ALL INDICES FOR DASHBOARD AND VISUALIZATONS FUNCTION----------
@@ -1088,10 +1383,12 @@ def resolve_indices_patterns(pattern):
     if alerts_found:
         labels["SIEM"] = "wazuh-alerts-*"
 
-    # Check for logstash-* indices in remote Elasticsearch (es_con)
-    logstash_indices = es_con.indices.get_alias(index="logstash-*").keys()
-    if logstash_indices:
-        labels["NDR"] = "logstash-*"
+    # Data sources on other clusters are listed when they have any index
+    for route in router.routes:
+        if route.cluster == router.default or route.label in labels:
+            continue
+        if client_for(route.pattern).indices.get_alias(index=route.pattern):
+            labels[route.label] = route.pattern
 
     return labels
 
@@ -1103,36 +1400,83 @@ def get_indices_field_mappings(pattern):
         pattern
     )  # Now returns labels like ["SIEM", "NDR", "Vulnerabilities"]
 
-    if "SIEM" in resolved_labels:
-        alert_indices = es.indices.get_alias(index="wazuh-alerts-*").keys()
-        for real_idx in alert_indices:
-            props = es.indices.get_mapping(index=real_idx)[real_idx]["mappings"].get(
-                "properties", {}
-            )
-            mappings.extend(flatten_fields(props))
-
-    if "NDR" in resolved_labels:
-        logstash_indices = es_con.indices.get_alias(index="logstash-*").keys()
-        for real_idx in logstash_indices:
-            props = es_con.indices.get_mapping(index=real_idx)[real_idx][
+    for label, label_pattern in resolved_labels.items():
+        es_client = client_for(label_pattern)
+        for real_idx in es_client.indices.get_alias(index=label_pattern).keys():
+            props = es_client.indices.get_mapping(index=real_idx)[real_idx][
                 "mappings"
             ].get("properties", {})
             mappings.extend(flatten_fields(props))
 
-    if "Vulnerability" in resolved_labels:
-        vuln_indices = es.indices.get_alias(
-            index="wazuh-states-vulnerabilities-devops"
-        ).keys()
-        for real_idx in vuln_indices:
-            props = es.indices.get_mapping(index=real_idx)[real_idx]["mappings"].get(
-                "properties", {}
-            )
-            mappings.extend(flatten_fields(props))
-
     return sorted(list(set(mappings)))
 
 
 # ---------- UPDATE VISUALIZATONS FUNCTION----------
+def dashboard_id_for_name(dashboard_name: str) -> Optional[str]:
+    """`_id` of the dashboard called exactly `dashboard_name`, or None."""
+    cached = _dashboard_ids_cache.get(dashboard_name)
+    if cached is not None and time.time() - cached[1] < DASHBOARD_ID_CACHE_TTL:
+        CACHE_REQUESTS.inc(cache="dashboard_ids", result="hit")
+        return cached[0]
+    CACHE_REQUESTS.inc(cache="dashboard_ids", result="miss")
+
+    search_query = {
+        "query": {
+            "term": {
+                index_templates.lookup_field(es, ".custom_dashboards", "name"): dashboard_name
+            }
+        },
+        "_source": False,
+    }
+    search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+    if search_result["hits"]["total"]["value"] == 0:
+        return None
+    dashboard_id = search_result["hits"]["hits"][0]["_id"]
+    _dashboard_ids_cache[dashboard_name] = (dashboard_id, time.time())
+    return dashboard_id
+
+
+def invalidate_dashboard_name(dashboard_id) -> None:
+    """Forget the cached name(s) of a dashboard that was renamed or deleted."""
+    dashboard_id = str(dashboard_id)
+    for name, cached in list(_dashboard_ids_cache.items()):
+        if cached[0] == dashboard_id:
+            _dashboard_ids_cache.pop(name, None)
+
+
+def update_visualizers(dashboard_id: str, script: str, params: dict) -> Optional[dict]:
+    """
+    Apply one of the *_VISUALIZER_SCRIPT edits to a dashboard. The script
+    runs on the shard, so concurrent edits of other visualizers are kept;
+    a version conflict with a concurrent write is retried by the cluster.
+    Returns the update response ("noop" if nothing matched), or None if
+    the dashboard does not exist.
+    """
+    try:
+        response = es.update(
+            index=".custom_dashboards",
+            id=dashboard_id,
+            body={
+                "script": {
+                    "source": script,
+                    "params": {
+                        **params,
+                        "updated_at": datetime.datetime.now().isoformat(),
+                    },
+                }
+            },
+            retry_on_conflict=VISUALIZER_WRITE_RETRIES,
+            refresh=write_refresh_policy(),
+        )
+    except NotFoundError as e:
+        if e.error == "index_not_found_exception":
+            raise
+        invalidate_dashboard_name(dashboard_id)
+        delete_render_plan(dashboard_id)
+        return None
+    return response
+
+
 def update_visualization(dashboard_name: str, visualization: dict):
     """
     Add or update a visualization inside a dashboard.
@@ -1142,43 +1486,26 @@ def update_visualization(dashboard_name: str, visualization: dict):
 
     try:
         # Find the dashboard
-        search_query = {"query": {"match": {"name": dashboard_name}}}
-        search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+        dashboard_id = dashboard_id_for_name(dashboard_name)
 
-        if search_result["hits"]["total"]["value"] == 0:
+        if dashboard_id is None:
             return {"message": "Dashboard not found"}, 404
 
-        dashboard_id = search_result["hits"]["hits"][0]["_id"]
-        dashboard_source = search_result["hits"]["hits"][0]["_source"]
-
-        # Ensure visualizers is a list
-        visualizers = dashboard_source.get("visualizers") or []
-
-        # If no viz_id → new visualization
+        # If no viz_id → new visualization (appended), else merged into the existing one
         if not visualization.get("viz_id"):
             visualization["viz_id"] = str(uuid.uuid4())
             visualization["created_at"] = datetime.datetime.now().isoformat()
-            visualizers.append(visualization)
+            script = APPEND_VISUALIZER_SCRIPT
         else:
-            # Update existing visualization
-            found = False
-            for i, viz in enumerate(visualizers):
-                if viz.get("viz_id") == visualization["viz_id"]:
-                    visualizers[i].update(visualization)
-                    found = True
-                    break
-            if not found:
-                return {"message": "Visualization not found in this dashboard"}, 404
-
-        # Update dashboard
-        update_data = {
-            "visualizers": visualizers,
-            "updated_at": datetime.datetime.now().isoformat(),
-        }
+            script = MERGE_VISUALIZER_SCRIPT
 
-        es.update(
-            index=".custom_dashboards", id=dashboard_id, body={"doc": update_data}
+        response = update_visualizers(
+            dashboard_id, script, {"visualization": visualization}
         )
+        if response is None:
+            return {"message": "Dashboard not found"}, 404
+        if response["result"] == "noop":
+            return {"message": "Visualization not found in this dashboard"}, 404
 
         return {
             "message": "Visualization updated successfully",
@@ -1197,31 +1524,18 @@ def delete_visualization(dashboard_name: str, viz_title: str):
     Delete a visualization from a dashboard by viz_id
     """
     try:
-        search_query = {"query": {"match": {"name": dashboard_name}}}
-        search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+        dashboard_id = dashboard_id_for_name(dashboard_name)
 
-        if search_result["hits"]["total"]["value"] == 0:
+        if dashboard_id is None:
             return {"message": "Dashboard not found"}, 404
 
-        dashboard_id = search_result["hits"]["hits"][0]["_id"]
-        dashboard_source = search_result["hits"]["hits"][0]["_source"]
-
-        visualizers = dashboard_source.get("visualizers") or []
-        new_visualizers = [viz for viz in visualizers if viz.get("title") != viz_title]
-
-        if len(new_visualizers) == len(visualizers):
-            return {"message": "Visualization not found"}, 404
-
-        es.update(
-            index=".custom_dashboards",
-            id=dashboard_id,
-            body={
-                "doc": {
-                    "visualizers": new_visualizers,
-                    "updated_at": datetime.datetime.now().isoformat(),
-                }
-            },
+        response = update_visualizers(
+            dashboard_id, REMOVE_VISUALIZER_SCRIPT, {"title": viz_title}
         )
+        if response is None:
+            return {"message": "Dashboard not found"}, 404
+        if response["result"] == "noop":
+            return {"message": "Visualization not found"}, 404
 
         return {
             "message": "Visualization deleted successfully",
@@ -1256,40 +1570,56 @@ def duplicate_visualization(dashboard_name: str, viz_title: str):
     """
     try:
         # find dashboard
-        search_query = {"query": {"match": {"name": dashboard_name}}}
-        search_result = es.search(index=".custom_dashboards", body=search_query, size=1)
+        dashboard_id = dashboard_id_for_name(dashboard_name)
 
-        if search_result["hits"]["total"]["value"] == 0:
+        if dashboard_id is None:
             return {"message": "Dashboard not found"}, 404
 
-        dashboard_id = search_result["hits"]["hits"][0]["_id"]
-        dashboard_source = search_result["hits"]["hits"][0]["_source"]
-
-        visualizers = dashboard_source.get("visualizers") or []
-        titles = {v.get("title") for v in visualizers}
-
-        # locate source viz by title
-        src_viz = next((v for v in visualizers if v.get("title") == viz_title), None)
-        if not src_viz:
-            return {"message": "Visualization not found"}, 404
-
-        # make deep copy, assign new uuid, unique title
-        new_viz = copy.deepcopy(src_viz)
-        new_viz["viz_id"] = str(uuid.uuid4())
-        new_viz["title"] = _generate_unique_copy_title(titles, viz_title)
-
-        visualizers.append(new_viz)
-
-        es.update(
-            index=".custom_dashboards",
-            id=dashboard_id,
-            body={
-                "doc": {
-                    "visualizers": visualizers,
-                    "updated_at": datetime.datetime.now().isoformat(),
-                }
-            },
-        )
+        # the copy title depends on the current titles: read-modify-write
+        # guarded by seq_no/primary_term, re-read on a concurrent edit
+        for attempt in range(VISUALIZER_WRITE_RETRIES):
+            dashboard_doc = get_dashboard_document(dashboard_id)
+            if dashboard_doc is None:
+                invalidate_dashboard_name(dashboard_id)
+                return {"message": "Dashboard not found"}, 404
+
+            visualizers = dashboard_doc["_source"].get("visualizers") or []
+            titles = {v.get("title") for v in visualizers}
+
+            # locate source viz by title
+            src_viz = next((v for v in visualizers if v.get("title") == viz_title), None)
+            if not src_viz:
+                return {"message": "Visualization not found"}, 404
+
+            # make deep copy, assign new uuid, unique title
+            new_viz = copy.deepcopy(src_viz)
+            new_viz["viz_id"] = str(uuid.uuid4())
+            new_viz["title"] = _generate_unique_copy_title(titles, viz_title)
+
+            try:
+                es.update(
+                    index=".custom_dashboards",
+                    id=dashboard_id,
+                    body={
+                        "script": {
+                            "source": APPEND_VISUALIZER_SCRIPT,
+                            "params": {
+                                "visualization": new_viz,
+                                "updated_at": datetime.datetime.now().isoformat(),
+                            },
+                        }
+                    },
+                    if_seq_no=dashboard_doc["_seq_no"],
+                    if_primary_term=dashboard_doc["_primary_term"],
+                    refresh=write_refresh_policy(),
+                )
+                break
+            except ConflictError:
+                logger.info(
+                    f"[DUP-VIZ] Dashboard='{dashboard_name}' changed concurrently, retry {attempt + 1}"
+                )
+        else:
+            return {"message": "Dashboard was modified concurrently, try again"}, 409
 
         logger.info(
             f"[DUP-VIZ] Dashboard='{dashboard_name}' FromTitle='{viz_title}' NewTitle='{new_viz['title']}'"
@@ -1305,51 +1635,442 @@ def duplicate_visualization(dashboard_name: str, viz_title: str):
         return {"error": "Internal server error", "details": str(e)}, 500
 
 
-def get_dashboard(dashboard_id: str) -> Optional[DashboardRequest]:
-    """Fetch a single dashboard by name from Elasticsearch"""
-    try:
-        result = es.search(
-            index=".custom_dashboards",
-            body={"query": {"term": {"dashboard_id.keyword": dashboard_id}}},
+# ---------- MIGRATE DASHBOARD IDS FUNCTION----------
+def migrate_dashboard_ids(batch_size: int = 500) -> int:
+    """
+    One-off migration to `_id = dashboard_id` for dashboards indexed with
+    an auto-generated `_id`: each is re-indexed under its dashboard_id and
+    the old document deleted. Dashboard names are reserved (see
+    `reserve_dashboard_name`) if they are not yet. Already migrated
+    documents are skipped, so it is safe to run again. Returns the number
+    of re-keyed dashboards.
+    """
+    actions = []
+    reservations = []
+    moved = 0
+    for hit in helpers.scan(
+        es,
+        index=".custom_dashboards",
+        query={"query": {"match_all": {}}},
+        size=batch_size,
+    ):
+        dashboard_id = hit["_source"].get("dashboard_id")
+        name = hit["_source"].get("name")
+        if dashboard_id and name:
+            reservations.append(
+                {
+                    "_op_type": "create",
+                    "_index": ".custom_dashboard_names",
+                    "_id": dashboard_name_key(str(name)),
+                    "_source": {"name": name, "dashboard_id": str(dashboard_id)},
+                }
+            )
+        if not dashboard_id or hit["_id"] == str(dashboard_id):
+            continue
+        actions.append(
+            {
+                "_op_type": "index",
+                "_index": ".custom_dashboards",
+                "_id": str(dashboard_id),
+                "_source": hit["_source"],
+            }
         )
+        actions.append(
+            {"_op_type": "delete", "_index": ".custom_dashboards", "_id": hit["_id"]}
+        )
+        moved += 1
+        logger.info(f"[MIGRATE] Dashboard {dashboard_id}: _id {hit['_id']} -> {dashboard_id}")
 
-        if result["hits"]["total"]["value"] > 0:
-            dashboard_data = result["hits"]["hits"][0]["_source"]
-            dashboard = DashboardRequest.model_validate(dashboard_data)
-            return dashboard
-        return None
-    except Exception as e:
+    if actions:
+        helpers.bulk(es, actions, chunk_size=batch_size, refresh="wait_for")
+    if reservations:
+        # names that are already reserved fail with a conflict, which is fine
+        helpers.bulk(es, reservations, chunk_size=batch_size, raise_on_error=False)
+    return moved
+
+
+def get_dashboard_document(dashboard_id: str) -> Optional[dict]:
+    """
+    Realtime GET of a dashboard document; its `_id` is the dashboard_id.
+    Returns None if there is no such dashboard.
+    """
+    try:
+        return es.get(index=".custom_dashboards", id=str(dashboard_id))
+    except NotFoundError as e:
+        if e.error == "index_not_found_exception":
+            raise
         return None
 
 
-def get_visualization(viz_id: str) -> Optional[Visualization]:
+def get_dashboard(dashboard_id: str) -> Optional[DashboardRequest]:
+    """Fetch a single dashboard by id from Elasticsearch"""
     try:
+        doc = get_dashboard_document(dashboard_id)
+        return DashboardRequest.model_validate(doc["_source"]) if doc else None
+    except Exception as e:
+        return None
 
-        print(f"Fetching visualization with ID: {viz_id}")
 
+# ---------- RENDER PLANS ----------
+def load_visualizations(viz_ids: list) -> dict:
+    """Saved visualizations by viz_id, with a single terms query."""
+    viz_ids = list(dict.fromkeys(str(viz_id) for viz_id in viz_ids))
+    if not viz_ids:
+        return {}
+    with timing.phase("viz_lookup"):
         result = es.search(
             index=".saved_visualizations",
-            body={"query": {"term": {"viz_id.keyword": viz_id}}},
+            body={
+                "query": {
+                    "terms": {
+                        index_templates.lookup_field(
+                            es, ".saved_visualizations", "viz_id"
+                        ): viz_ids
+                    }
+                },
+                "size": len(viz_ids),
+            },
         )
+    visualizations = {}
+    for hit in result["hits"]["hits"]:
+        try:
+            visualization = Visualization.model_validate(hit["_source"])
+        except ValidationError as e:
+            logger.warning(f"Visualization {hit['_id']} is invalid and not rendered: {e}")
+            continue
+        visualizations.setdefault(str(visualization.viz_id), visualization)
+    return visualizations
+
+
+def saved_search_definition(source: dict) -> dict:
+    """The parts of a saved search a table query is built from."""
+    return {
+        "columns": source.get("columns"),
+        "filter": source.get("filter"),
+        "index_name": source.get("index_name"),
+    }
 
-        print(f"Visualization search result: {result}")
 
-        if result["hits"]["total"]["value"] > 0:
-            visualization_data = result["hits"]["hits"][0]["_source"]
-            visualization = Visualization.model_validate(visualization_data)
-            return visualization
+def load_saved_searches(tables: list) -> dict:
+    """
+    Saved searches the `tables` are built from, from the cache or else
+    with a single query. Returns {(title, index): saved search or None}.
+    """
+    saved_searches = {}
+    clauses = {}
+    for table in tables:
+        key = (table.title, table.index)
+        if key in saved_searches or key in clauses:
+            continue
+        cached = _saved_searches_cache.get(key)
+        if cached is not MISSING:
+            CACHE_REQUESTS.inc(cache="saved_searches", result="hit")
+            saved_searches[key] = cached
+            continue
+        CACHE_REQUESTS.inc(cache="saved_searches", result="miss")
+        clauses[key] = saved_search_query(table)["query"]
+    if not clauses:
+        return saved_searches
+
+    query = {
+        "query": {"bool": {"should": list(clauses.values()), "minimum_should_match": 1}},
+        # room for titles that are saved more than once
+        "size": len(clauses) * 10,
+    }
+    result = run_search(es, "saved_searches", query, name="saved_search")
+    found = {}
+    for hit in result["hits"]["hits"]:
+        source = hit["_source"]
+        found.setdefault(
+            (source.get("title"), source.get("index_name")),
+            saved_search_definition(source),
+        )
+    # tables without a saved search are cached too, as None
+    loaded = [(key, found.get(key)) for key in clauses]
+    _saved_searches_cache.update(loaded)
+    saved_searches.update(loaded)
+    return saved_searches
+
+
+def invalidate_saved_searches(title: str = None, index: str = None) -> int:
+    """
+    Forget cached saved searches (all of them, or those matching `title`
+    and/or `index`) after they were edited, drop the render plans built
+    from them and refresh the catalog on its next read. The cache and
+    catalog dropped are this worker's; the plans are shared.
+    """
+    saved_search_catalog.invalidate()
+    dropped = _saved_searches_cache.discard(
+        lambda key: (title is None or key[0] == title)
+        and (index is None or key[1] == index)
+    )
+    clauses = []
+    if title is not None:
+        clauses.append({"term": {"saved_search_titles": title}})
+    if index is not None:
+        clauses.append({"term": {"saved_search_indices": index}})
+    drop_render_plans(clauses)
+    return dropped
+
+
+def drop_render_plans(clauses: list) -> None:
+    """
+    Drop the render plans matching all of `clauses` (on their saved search
+    fields; every plan if there are none). A plans index from before those
+    fields can only be emptied.
+    """
+    if index_templates.is_current(es, ".custom_dashboard_render_plans"):
+        query = {"bool": {"filter": clauses}}
+    else:
+        query = {"match_all": {}}
+    try:
+        es.delete_by_query(
+            index=".custom_dashboard_render_plans",
+            body={"query": query},
+            conflicts="proceed",
+            ignore_unavailable=True,
+        )
+    except TransportError as e:
+        logger.warning(f"Render plans not dropped: {e}")
+
+
+def build_render_plan(
+    dashboard_id, dashboard_source: dict, written: dict, visualizations: list = None
+) -> dict:
+    """
+    Denormalized render plan of a dashboard: the dashboard itself and, for
+    each of its visualizers, the validated saved visualization plus (for
+    tables) the columns, filters and index of its saved search, so a view
+    only has to run the data queries. `written` is the GET or write response
+    of the dashboard document the plan is built from; its `_seq_no` is kept
+    to tell whether the dashboard changed since. `visualizations` are specs
+    the caller just saved; the others are looked up.
+    """
+    dashboard = DashboardRequest.model_validate(dashboard_source)
+    visualizers = dashboard.visualizers or []
+    viz_ids = [str(v.viz_id) for v in visualizers if v.viz_id]
+
+    known = {
+        str(viz.viz_id): viz for viz in visualizations or [] if viz.viz_id and viz.type
+    }
+    known.update(load_visualizations([v for v in viz_ids if v not in known]))
+
+    tables = [
+        viz.table_data
+        for viz in known.values()
+        if viz.type == VisualizationType.TABLE and viz.table_data is not None
+    ]
+    saved_searches = load_saved_searches(tables)
+
+    panels = []
+    for visualizer in visualizers:
+        visualization = known.get(str(visualizer.viz_id))
+        saved_search = None
+        if visualization is not None and visualization.table_data is not None:
+            table = visualization.table_data
+            saved_search = saved_searches.get((table.title, table.index))
+        panels.append(
+            {
+                "visualization": (
+                    visualization.model_dump(mode="json") if visualization else None
+                ),
+                "saved_search": saved_search,
+            }
+        )
+
+    return {
+        "dashboard_id": str(dashboard_id),
+        "version": RENDER_PLAN_VERSION,
+        "built_at": time.time(),
+        "dashboard_seq_no": written.get("_seq_no"),
+        "dashboard_primary_term": written.get("_primary_term"),
+        "viz_ids": viz_ids,
+        # also those not found: creating them must drop the plan too
+        "saved_search_titles": sorted({t for t, _ in saved_searches if t is not None}),
+        "saved_search_indices": sorted({i for _, i in saved_searches if i is not None}),
+        "dashboard": dashboard.model_dump(mode="json"),
+        "panels": panels,
+    }
+
+
+def render_plan_is_current(plan: dict, dashboard: dict) -> bool:
+    """Whether `plan` has the current layout and was built from the last write of `dashboard`."""
+    return (
+        plan.get("version") == RENDER_PLAN_VERSION
+        and plan.get("dashboard_seq_no") == dashboard["_seq_no"]
+        and plan.get("dashboard_primary_term") == dashboard["_primary_term"]
+    )
+
+
+def store_render_plan(plan: dict, **conditions) -> None:
+    es.index(
+        index=".custom_dashboard_render_plans", id=plan["dashboard_id"], body=plan, **conditions
+    )
+
+
+def refresh_render_plan(
+    dashboard_id, dashboard_source: dict, written: dict, visualizations: list = None
+) -> Optional[dict]:
+    """
+    Rebuild and store the render plan of a dashboard that was just written;
+    `written` is the response of that write. If that fails (or a plan of an
+    earlier write lands after it) the stored plan no longer matches the
+    dashboard, and the next view rebuilds it.
+    """
+    try:
+        plan = build_render_plan(dashboard_id, dashboard_source, written, visualizations)
+        store_render_plan(plan)
+        return plan
+    except (TransportError, ValidationError) as e:
+        logger.warning(f"Render plan of dashboard {dashboard_id} not rebuilt: {e}")
         return None
-    except Exception as e:
+
+
+def delete_render_plan(dashboard_id) -> None:
+    """Drop the render plan of a dashboard that is gone."""
+    try:
+        es.delete(index=".custom_dashboard_render_plans", id=str(dashboard_id))
+    except NotFoundError:
+        pass
+    except TransportError as e:
+        logger.warning(f"Render plan of dashboard {dashboard_id} not dropped: {e}")
+
+
+def render_plan_lookup(dashboard_id: str) -> dict:
+    """
+    Body of the realtime mget `get_render_plan` reads a dashboard with: its
+    stored render plan and the version (not the source) of its document.
+    """
+    return {
+        "docs": [
+            {"_index": ".custom_dashboard_render_plans", "_id": str(dashboard_id)},
+            {"_index": ".custom_dashboards", "_id": str(dashboard_id), "_source": False},
+        ]
+    }
+
+
+def found_documents(response: dict) -> list:
+    """The documents of an mget response, None for those missing."""
+    return [doc if doc.get("found") else None for doc in response["docs"]]
+
+
+def get_render_plan(dashboard_id: str) -> Optional[dict]:
+    """
+    Render plan of a dashboard, read with the dashboard's version in one
+    realtime mget. A plan that is missing, outdated or built from an
+    earlier write of the dashboard is rebuilt. Returns None if there is no
+    such dashboard.
+    """
+    saved_search_catalog.poll()
+    response = es.mget(body=render_plan_lookup(dashboard_id))
+    stored, dashboard = found_documents(response)
+    if dashboard is None:
+        return None
+    if stored is not None and render_plan_is_current(stored["_source"], dashboard):
+        return stored["_source"]
+    return rebuild_render_plan(dashboard_id, stored)
+
+
+def rebuild_render_plan(dashboard_id: str, stored: Optional[dict]) -> Optional[dict]:
+    """
+    Build the render plan of a dashboard from its current document and
+    store it in place of `stored` (the plan document read before, None if
+    there was none) unless that was replaced or dropped since, so a
+    rebuild from a stale read neither overwrites a newer plan nor brings
+    back an invalidated one. Returns None if there is no such dashboard.
+    """
+    try:
+        doc = get_dashboard_document(dashboard_id)
+    except NotFoundError:
+        return None
+    if doc is None:
+        return None
+    with timing.phase("render_plan"):
+        plan = build_render_plan(dashboard_id, doc["_source"], doc)
+    if stored is None:
+        conditions = {"op_type": "create"}
+    else:
+        conditions = {"if_seq_no": stored["_seq_no"], "if_primary_term": stored["_primary_term"]}
+    try:
+        store_render_plan(plan, **conditions)
+    except ConflictError:
+        # written or dropped meanwhile; this plan still serves this view
+        pass
+    except TransportError as e:
+        logger.warning(f"Render plan of dashboard {dashboard_id} not stored: {e}")
+    return plan
+
+
+def render_visualizer(panel: dict, lte: str, gte: str) -> Optional[dict]:
+    """
+    Run the query of one render plan panel for the given time range.
+    Returns the enriched visualizer payload, or None if its visualization
+    is missing or of an unsupported type.
+    """
+    budget = deadline.current()
+    if budget is not None:
+        budget.check()
+    if panel["visualization"] is None:
         return None
+    visualization = Visualization.model_validate(panel["visualization"])
+    if visualization.type == VisualizationType.TABLE:
+        table = TableData.model_validate(visualization.table_data)
+        table.lte = lte
+        table.gte = gte
+        data = {}
+        if panel["saved_search"] is not None:
+            index, query = build_table_query(table, panel["saved_search"])
+            result = run_search(client_for(index), index, query)
+            with timing.phase("format"):
+                data = format_table_data(result)
+        return enriched_visualizer(visualization, table, data)
+    if visualization.type == VisualizationType.BAR:
+        bar_chart = VizData.model_validate(visualization.viz_data)
+        bar_chart.lte = lte
+        bar_chart.gte = gte
+        bar_data = create_bar_chart(bar_chart)
+        data = None
+        if bar_data:
+            data = bar_data["data"]
+        return enriched_visualizer(visualization, bar_chart, data)
+    return None
+
+
+def enriched_visualizer(visualization: Visualization, query, data) -> dict:
+    """Payload of one rendered visualizer in a dashboard view."""
+    return {
+        "viz_id": visualization.viz_id,
+        "title": visualization.title,
+        "type": visualization.type,
+        "query": query.model_dump(),
+        "options": visualization.options.model_dump(),
+        "data": data,
+    }
+
+
+def panel_status(visualizer_info: Visualization, status: str, error: str = None):
+    """Placeholder returned for a visualizer whose data could not be loaded."""
+    panel = {
+        "viz_id": visualizer_info.viz_id,
+        "title": visualizer_info.title,
+        "status": status,
+    }
+    if error:
+        panel["error"] = error
+    return panel
 
 
 # ------------------------------
 #  View Dashboard with Data
 # ------------------------------
-def view_dashboard(dashboard_id: uuid.UUID, lte: str, gte: str):
-    dashboard = get_dashboard(str(dashboard_id))
-    if not dashboard:
+def view_dashboard(
+    dashboard_id: uuid.UUID, lte: str, gte: str, include_timings: bool = False
+):
+    with timing.phase("dashboard_lookup"):
+        plan = get_render_plan(str(dashboard_id))
+    if not plan:
         return {"error": "Dashboard not found"}, 404
+    dashboard = DashboardRequest.model_validate(plan["dashboard"])
 
     enriched_visualizers = []
 
@@ -1359,53 +2080,33 @@ def view_dashboard(dashboard_id: uuid.UUID, lte: str, gte: str):
     print(f"Dashboard visualizers: {dashboard.visualizers}")
     print(f"lte : {lte}, gte: {gte}")
 
-    for visualizer_info in dashboard.visualizers:
+    for visualizer_info, panel in zip(dashboard.visualizers or [], plan["panels"]):
         viz_id = str(visualizer_info.viz_id)
-        visualization = get_visualization(viz_id)
-        print(f"Visualization: {visualization}")
-        print(f"Visualization: {visualization.type}")
-        if visualization.type == VisualizationType.TABLE:
-            print(f"Processing TABLE visualization: {visualization.title}")
-            print(f"table query: {visualization.table_data}")
-            table_query = visualization.table_data
-            table = TableData.model_validate(table_query)
-            table.lte = lte
-            table.gte = gte
-            table_data = get_table_data(table)
-            data = None
-            if table_data:
-                data = table_data[0]["data"]
-            enriched_visualizers.append(
-                {
-                    "viz_id": visualization.viz_id,
-                    "title": visualization.title,
-                    "type": visualization.type,
-                    "query": table_query.model_dump(),
-                    "options": visualization.options.model_dump(),
-                    "data": data,
-                }
-            )
-        if visualization.type == VisualizationType.BAR:
-            print(f"Processing Bar visualization: {visualization.title}")
-            print(f"bar query: {visualization.viz_data}")
-            bar_chart = VizData.model_validate(visualization.viz_data)
-            bar_chart.lte = lte
-            bar_chart.gte = gte
-            bar_data = create_bar_chart(bar_chart)
-            print(f"Bar chart data: {bar_data}")
-            data = None
-            if bar_data:
-                data = bar_data["data"]
-            enriched_visualizers.append(
-                {
-                    "viz_id": visualization.viz_id,
-                    "title": visualization.title,
-                    "type": visualization.type,
-                    "query": bar_chart.model_dump(),
-                    "options": visualization.options.model_dump(),
-                    "data": data,
-                }
-            )
+        with timing.scope(viz_id) as viz_timings, slow_queries.origin(
+            dashboard_id=str(dashboard_id), viz_id=viz_id
+        ):
+            # a slow or broken panel must not take the rest of the dashboard down
+            try:
+                enriched = render_visualizer(panel, lte, gte)
+            except (deadline.DeadlineExceeded, ConnectionTimeout) as e:
+                logger.warning(f"Visualization {viz_id} timed out: {e}")
+                enriched = panel_status(visualizer_info, "timeout")
+            except ClusterUnavailable as e:
+                logger.warning(f"Visualization {viz_id} skipped: {e}")
+                enriched = panel_status(visualizer_info, "unavailable", str(e))
+            except TransportError as e:
+                logger.error(f"Visualization {viz_id} failed: {e}")
+                enriched = panel_status(visualizer_info, "error", str(e))
+        if enriched is None:
+            continue
+        if include_timings:
+            enriched["_timings"] = viz_timings.as_dict()
+        enriched_visualizers.append(enriched)
+    return dashboard_view(dashboard, enriched_visualizers)
+
+
+def dashboard_view(dashboard: DashboardRequest, visualizers: list) -> dict:
+    """Response body of a dashboard view with its rendered visualizers."""
     return {
         "dashboard": {
             "name": dashboard.name,
@@ -1414,7 +2115,7 @@ def view_dashboard(dashboard_id: uuid.UUID, lte: str, gte: str):
             "lte": dashboard.lte if dashboard.lte else None,
             "gte": dashboard.gte if dashboard.gte else None,
             "description": dashboard.description,
-            "visualizers": enriched_visualizers,
+            "visualizers": visualizers,
         }
     }
 
@@ -1517,17 +2218,17 @@ def get_chart_data(chart: ChartData):
     print(f"Executing query for index {chart.index}: {json.dumps(query, indent=2)}")
 
     # Run query
-    es_client = es_con if index == "logstash-*" else es
-    data = es_client.search(index=index, body=query)
+    data = search_routed(index, query)
 
     # Format response
-    response = format_es_response(
-        data.get("aggregations"),
-        chart.type,
-        gte=gte,
-        lte=lte,
-        delta_obj=date_delta(gte, lte) if chart.type in ["line", "area"] else None,
-    )
+    with timing.phase("format"):
+        response = format_es_response(
+            data.get("aggregations"),
+            chart.type,
+            gte=gte,
+            lte=lte,
+            delta_obj=date_delta(gte, lte) if chart.type in ["line", "area"] else None,
+        )
 
     return response
 
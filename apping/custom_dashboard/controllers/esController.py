@@ -1,12 +1,221 @@
 import configparser
+import contextvars
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from elasticsearch import Elasticsearch, RequestsHttpConnection
+from apping import es
+from apping.custom_dashboard import index_templates
+from utils import deadline, federation, metrics, routing, timing
+from utils.circuit_breaker import ClusterUnavailable
+from utils.es_client import create_client
+from utils.single_flight import SingleFlight, canonical_key
+from utils.slow_queries import SlowQueryLog
 
 config = configparser.ConfigParser()
 config.read('config.ini', encoding='utf-8')
 
 # api_url = config['network_monitoring']['ndr_api']
-es_con = Elasticsearch(hosts=str(config['network_monitoring']['ndr_api']), verify_certs=False,
-                   connection_class=RequestsHttpConnection, use_ssl=True, timeout=150, max_retries=10,
-                   retry_on_timeout=True)
+es_con = create_client(config, "es_con", config['network_monitoring']['ndr_api'])
+
+# named client pools; further clusters come from `[cluster:<name>] hosts = ...`
+clients = {"es": es, "es_con": es_con}
+cluster_hosts = {
+    "es": config["url"]["elasticsearch_connection"],
+    "es_con": config["network_monitoring"]["ndr_api"],
+}
+for section in config.sections():
+    if section.startswith("cluster:"):
+        name = section.split(":", 1)[1].strip()
+        cluster_hosts[name] = config[section]["hosts"]
+        clients[name] = create_client(config, name, cluster_hosts[name])
+
+router = routing.from_config(config)
+
+# cross-cluster searches run their per-cluster legs here in parallel
+fanout_pool = ThreadPoolExecutor(
+    max_workers=config.getint("federation", "max_workers", fallback=8),
+    thread_name_prefix="es-fanout",
+)
+FANOUT_OVER_FETCH = config.getint("federation", "over_fetch_factor", fallback=2)
+
+ES_REQUESTS = metrics.counter(
+    "custom_dashboard_es_requests_total",
+    "Elasticsearch searches by cluster, route label (see `index_label`) and outcome.",
+    ("cluster", "index", "outcome"),
+)
+ES_LATENCY = metrics.histogram(
+    "custom_dashboard_es_request_duration_seconds",
+    "Client-side latency of Elasticsearch searches.",
+    ("cluster", "index"),
+)
+ES_COALESCED = metrics.counter(
+    "custom_dashboard_es_coalesced_total",
+    "Searches answered by an identical query already in flight.",
+    ("cluster", "index"),
+)
+
+
+slow_query_log = SlowQueryLog(
+    max_fingerprints=config.getint("slow_query_log", "max_fingerprints", fallback=500),
+    max_samples=config.getint("slow_query_log", "max_samples", fallback=1000),
+)
+
+# identical searches in flight at the same time are sent to ES only once
+search_flights = (
+    SingleFlight() if config.getboolean("single_flight", "enabled", fallback=True) else None
+)
+
+# per-request kwargs that do not change the result
+UNKEYED_SEARCH_PARAMS = ("timeout", "request_timeout")
+
+
+def cluster_name(es_client):
+    """Label used for `es_client` in metrics."""
+    for name, client in clients.items():
+        if client is es_client:
+            return name
+    return "es"
+
+
+# the app's own indices are few and fixed, so they keep their name as label
+APP_INDICES = frozenset(index_templates.INDICES.values())
+
+
+def index_label(index):
+    """
+    Label used for `index` in metrics: the label of the route serving it
+    (NDR, SIEM, ...), the app index name, or else the cluster name. Raw
+    index names and patterns would make a new series per date or pattern.
+    """
+    route = router.route_for(index)
+    if route is not None:
+        return route.label
+    if index in APP_INDICES:
+        return index
+    return router.default
+
+
+def client_for(index):
+    """Client of the cluster that serves `index` (see `[route:*]` in config.ini)."""
+    name = router.resolve(index)
+    try:
+        return clients[name]
+    except KeyError:
+        raise ValueError(f"index {index!r} is routed to unknown cluster {name!r}")
+
+
+def run_search(es_client, index, body, name="query", **kwargs):
+    """
+    Run `es_client.search` and record ES `took`, wall clock, response bytes
+    and hit/bucket counts on the current request timings (if any).
+    Every query is also fingerprinted into the slow-query log.
+
+    Under a request deadline the remaining budget is also sent as the ES
+    search `timeout`, so shards stop collecting when the client gives up.
+
+    Concurrent calls with the same cluster, index, body and parameters
+    share one ES round trip (see `search_flights`).
+    """
+    timings = timing.current()
+    bytes_before = timings.response_bytes if timings is not None else 0
+    cluster = cluster_name(es_client)
+    label = index_label(index)
+
+    budget = deadline.current()
+    if budget is not None and "timeout" not in kwargs:
+        kwargs["timeout"] = f"{int(budget.check() * 1000)}ms"
+
+    start = time.perf_counter()
+    try:
+        response, shared = search_once(es_client, cluster, index, body, kwargs)
+    except deadline.DeadlineExceeded:
+        ES_REQUESTS.inc(cluster=cluster, index=label, outcome="deadline")
+        raise
+    except ClusterUnavailable as e:
+        ES_REQUESTS.inc(cluster=cluster, index=label, outcome=e.reason)
+        raise
+    except Exception:
+        ES_REQUESTS.inc(cluster=cluster, index=label, outcome="error")
+        raise
+    elapsed = time.perf_counter() - start
+
+    if shared:
+        ES_COALESCED.inc(cluster=cluster, index=label)
+    else:
+        ES_REQUESTS.inc(cluster=cluster, index=label, outcome="ok")
+        ES_LATENCY.observe(elapsed, cluster=cluster, index=label)
+        slow_query_log.record(
+            body,
+            elapsed * 1000,
+            cluster=cluster,
+            index=index,
+            took_ms=response.get("took"),
+        )
+    if timings is not None:
+        timings.record_search(
+            name,
+            index,
+            response,
+            elapsed * 1000,
+            nbytes=timings.response_bytes - bytes_before,
+        )
+    return response
+
+
+def search_once(es_client, cluster, index, body, kwargs):
+    """Return (response, shared) for `es_client.search`, coalescing duplicates."""
+    search = lambda: es_client.search(index=index, body=body, **kwargs)
+    if search_flights is None:
+        return search(), False
+    params = {k: v for k, v in kwargs.items() if k not in UNKEYED_SEARCH_PARAMS}
+    # a response cut short by the leader's `timeout` is partial: not shared
+    return search_flights.do(
+        canonical_key(cluster, index, body, params),
+        search,
+        shareable=lambda response: not response.get("timed_out"),
+    )
+
+
+def search_routed(index, body, name="query", **kwargs):
+    """
+    Search `index` on whichever cluster(s) serve it.
+
+    A comma separated index list that spans several clusters is federated:
+    the same body (with terms over-fetched) is sent to every cluster in
+    parallel and the responses are merged, so the call costs the slowest
+    cluster rather than the sum of them.
+    """
+    groups = router.group(index)
+    if len(groups) <= 1:
+        return run_search(client_for(index), index, body, name=name, **kwargs)
+
+    fetch_body = federation.over_fetch(body, factor=FANOUT_OVER_FETCH)
+    futures = [
+        fanout_pool.submit(
+            contextvars.copy_context().run,
+            _federated_leg,
+            clients[cluster],
+            patterns,
+            fetch_body,
+            name,
+            kwargs,
+        )
+        for cluster, patterns in groups.items()
+    ]
+    with timing.phase(f"{name}_federated"):
+        legs = [future.result() for future in futures]
+
+    timings = timing.current()
+    if timings is not None:
+        for _, leg_timings in legs:
+            timings.merge(leg_timings)
+    with timing.phase("merge"):
+        return federation.merge_responses([response for response, _ in legs], body)
+
+
+def _federated_leg(es_client, index, body, name, kwargs):
+    # runs in a copy of the caller's context with its own Timings, merged
+    # back by the caller so the legs never write to a shared object
+    leg_timings = timing.start(name)
+    return run_search(es_client, index, body, name=name, **kwargs), leg_timings
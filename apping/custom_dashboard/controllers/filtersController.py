@@ -18,6 +18,10 @@ class CustomDashboardAdvancedFilters:
         # securityevents queries
         self.custom_dashboard_conditions = custom_dashboard_conditions
 
+        # `_append_filter_to_query` nests filters only when conditions are given
+        self.network_monitoring_conditions = custom_dashboard_conditions
+        self.security_conditions = custom_dashboard_conditions
+
     def evaluate_filter_expression(self, **kwargs):
         '''Evaluates the filter expression
 
@@ -1,16 +1,66 @@
 from elasticsearch import helpers
+from elasticsearch.exceptions import TransportError
 import uuid
 from apping import es, ResponseDto
+from apping.custom_dashboard import index_templates
 from apping.custom_dashboard.model import Visualization, VizData, Axis
 import datetime
-from apping.custom_dashboard.controllers.esController import es_con
+from apping.custom_dashboard.controllers.esController import search_routed
+from utils import timing
 
 from typing import Tuple
 
 
+def resolve_visualization_ids(index: str, viz_ids: list) -> dict:
+    """Map each existing viz_id to its ES _id with a single terms query."""
+    viz_ids = list(dict.fromkeys(str(viz_id) for viz_id in viz_ids))
+    if not viz_ids:
+        return {}
+    result = es.search(
+        index=index,
+        body={
+            "query": {"terms": {index_templates.lookup_field(es, index, "viz_id"): viz_ids}},
+            "_source": ["viz_id"],
+            "size": len(viz_ids),
+        },
+    )
+    es_ids = {}
+    for hit in result["hits"]["hits"]:
+        es_ids.setdefault(str(hit["_source"]["viz_id"]), hit["_id"])
+    return es_ids
+
+
+def invalidate_render_plans(viz_ids: list) -> None:
+    """
+    Drop the render plans of every dashboard showing one of `viz_ids`, so
+    a visualization edited through one dashboard is not rendered from the
+    stale plan of another; they are rebuilt on their next view.
+    """
+    viz_ids = [str(viz_id) for viz_id in viz_ids]
+    if not viz_ids:
+        return
+    index = ".custom_dashboard_render_plans"
+    # a plans index mapped dynamically has viz_ids as text with a keyword sub-field
+    field = index_templates.lookup_field(es, index, "viz_ids")
+    try:
+        es.delete_by_query(
+            index=index,
+            body={"query": {"terms": {field: viz_ids}}},
+            conflicts="proceed",
+            ignore_unavailable=True,
+        )
+    except TransportError as e:
+        print(f"Error invalidating render plans: {e}")
+
+
 def save_visualizations(
-    index: str, visualizations: list[Visualization]
+    index: str, visualizations: list[Visualization], refresh="false"
 ) -> Tuple[list[Visualization], str]:
+    """
+    Insert new visualizations and update existing ones in one bulk request.
+    `refresh` is the ES refresh policy of the bulk write: pass "wait_for"
+    only when the caller must read the visualizations back right away.
+    """
 
     print(f"Saving visualizations to index '{index}'")
 
@@ -18,23 +68,20 @@ def save_visualizations(
         return [], "No visualizations to save"
 
     try:
+        # Look up the ES _id of every visualization being updated at once
+        es_ids = resolve_visualization_ids(
+            index, [viz.viz_id for viz in visualizations if viz.viz_id]
+        )
+        print(f"Existing visualizations: {es_ids}")
+
         # Prepare bulk actions for both inserts and updates
         actions = []
         for viz in visualizations:
             if viz.viz_id:
-                # print("????")
                 print(f"Updating visualization with ID: {viz.viz_id}")
-                # Search for existing visualization
-                existing_viz = es.search(
-                    index=index,
-                    body={"query": {"term": {"viz_id.keyword": str(viz.viz_id)}}},
-                )
-
-                print(f"Existing visualization search result: {existing_viz}")
-
-                if existing_viz["hits"]["total"]["value"] > 0:
+                es_id = es_ids.get(str(viz.viz_id))
+                if es_id is not None:
                     # Update existing visualization using its ES _id
-                    es_id = existing_viz["hits"]["hits"][0]["_id"]
                     actions.append(
                         {
                             "_op_type": "update",
@@ -55,7 +102,12 @@ def save_visualizations(
                 )
 
         # Perform bulk operation
-        helpers.bulk(es, actions)
+        if actions:
+            helpers.bulk(es, actions, refresh=refresh)
+        # plans of other dashboards showing an updated visualization
+        invalidate_render_plans(
+            [viz.viz_id for viz in visualizations if str(viz.viz_id) in es_ids]
+        )
         print(f"Processed {len(actions)} visualizations in index '{index}'")
         return [
             Visualization(viz_id=viz.viz_id, title=viz.title) for viz in visualizations
@@ -209,6 +261,21 @@ def create_bar_chart(vizData: VizData) -> Visualization:
 
     print("??")
 
+    ez_query, is_breakdown = build_bar_chart_query(vizData)
+
+    index = vizData.index
+    print(f"Executing query on index '{index}': {ez_query}")
+
+    response = search_routed(index, ez_query)
+
+    print(f"Elasticsearch response: {response}")
+
+    return bar_chart_response(vizData, response, is_breakdown)
+
+
+def build_bar_chart_query(vizData: VizData):
+    """Build the aggregation query for a bar chart; returns (query, is_breakdown)."""
+
     ez_query = {
         "size": 0,
         "aggs": {},
@@ -342,18 +409,14 @@ def create_bar_chart(vizData: VizData) -> Visualization:
     else:
         pass
 
-    index = vizData.index
-    print(f"Executing query on index '{index}': {ez_query}")
-
-    es_client = es_con if index == "logstash-*" else es
-
-    response = es_client.search(index=index, body=ez_query)
+    return ez_query, is_breakdown
 
-    print(f"Elasticsearch response: {response}")
 
+def bar_chart_response(vizData: VizData, response: dict, is_breakdown: bool) -> dict:
     if is_breakdown:
         print("Processing breakdown chart data")
-        data = es_breakdowns_chart(response)
+        with timing.phase("format"):
+            data = es_breakdowns_chart(response)
         return {
             "message": "Bar chart created successfully",
             "responseDto": ResponseDto().ok(),
@@ -361,7 +424,8 @@ def create_bar_chart(vizData: VizData) -> Visualization:
             "data": data,
         }
     else:
-        bar_chart = es_barchat(response)
+        with timing.phase("format"):
+            bar_chart = es_barchat(response)
         bar_chart["y_axis_label"] = vizData.yAxis.label if vizData.yAxis else "Count"
         bar_chart["x_axis_label"] = vizData.xAxis.label if vizData.xAxis else "Count"
         return {
@@ -0,0 +1,270 @@
+"""
+Index templates and mapping management for the indices the app keeps its
+own documents in.
+
+Dashboards (and their render plans), visualizations and saved searches
+are only ever looked up by a few fields (names, titles, ids, timestamps);
+everything else is a payload the app stores and reads back whole. The
+templates map the lookup fields as keywords and keep everything else out
+of the index (`dynamic: false` on the documents, `enabled: false` on the
+payload objects), so the mappings don't grow with every nested key and
+lookups need no `.keyword` sub-fields.
+
+Templates carry `TEMPLATE_VERSION`, which is also stored in the `_meta` of
+the mappings they create. `ensure` installs templates that are missing or
+older (on worker start-up); templates only apply when an index is created,
+so indices created under an older version are moved to the current
+mapping by `reindex` (`flask reindex-system-indices`). Until they are,
+queries go through `lookup_field`, which names the `.keyword` sub-field
+the older mappings have instead of the keyword field itself.
+"""
+
+from elasticsearch.exceptions import NotFoundError
+
+from utils.ttl_cache import MISSING, TTLCache
+from utils.util import logger
+
+TEMPLATE_VERSION = 4
+
+# first version mapping the lookup fields as keywords; older (and dynamic)
+# mappings have them as text with a `.keyword` sub-field
+KEYWORD_FIELDS_VERSION = 2
+
+# index -> mapping version; rechecked after the TTL, so queries follow a
+# reindex made by another process
+MAPPING_VERSION_CACHE_TTL = 60  # seconds
+_mapping_versions = TTLCache(max_size=64, ttl=MAPPING_VERSION_CACHE_TTL)
+
+KEYWORD = {"type": "keyword", "ignore_above": 1024}
+
+PAYLOAD = {"type": "object", "enabled": False}
+
+SETTINGS = {
+    "number_of_shards": 1,
+    "auto_expand_replicas": "0-1",
+    # an explicit interval keeps idle shards refreshing, so a write is
+    # searchable within a second even if nothing searched the index lately
+    "refresh_interval": "1s",
+}
+
+
+def _template(index, properties):
+    # `index-v<N>` are the versioned indices `reindex` creates behind an alias
+    return {
+        "index_patterns": [index, f"{index}-v*"],
+        "priority": 100,
+        "version": TEMPLATE_VERSION,
+        "template": {
+            "settings": SETTINGS,
+            "mappings": {
+                "_meta": {"version": TEMPLATE_VERSION},
+                "dynamic": False,
+                "properties": properties,
+            },
+        },
+    }
+
+
+TEMPLATES = {
+    "custom_dashboards": _template(
+        ".custom_dashboards",
+        {
+            "dashboard_id": KEYWORD,
+            "name": KEYWORD,
+            "description": KEYWORD,
+            "created_at": {"type": "date"},
+            "updated_at": {"type": "date"},
+            "lte": KEYWORD,
+            "gte": KEYWORD,
+            "visualizers": PAYLOAD,
+            "filters": PAYLOAD,
+        },
+    ),
+    "custom_dashboard_names": _template(
+        ".custom_dashboard_names",
+        {"name": KEYWORD, "dashboard_id": KEYWORD},
+    ),
+    "custom_dashboard_render_plans": _template(
+        ".custom_dashboard_render_plans",
+        {
+            "dashboard_id": KEYWORD,
+            "viz_ids": KEYWORD,
+            # of the saved searches its tables are built from
+            "saved_search_titles": KEYWORD,
+            "saved_search_indices": KEYWORD,
+            "version": {"type": "integer"},
+            "dashboard": PAYLOAD,
+            "panels": PAYLOAD,
+        },
+    ),
+    "saved_visualizations": _template(
+        ".saved_visualizations",
+        {
+            "viz_id": KEYWORD,
+            "title": KEYWORD,
+            "type": KEYWORD,
+            "chart_data": PAYLOAD,
+            "table_data": PAYLOAD,
+            "viz_data": PAYLOAD,
+            "options": PAYLOAD,
+        },
+    ),
+    "saved_searches": _template(
+        "saved_searches",
+        {
+            "title": KEYWORD,
+            "index_name": KEYWORD,
+            "columns": KEYWORD,
+            "filter": PAYLOAD,
+            # the saved search catalog refreshes incrementally on it
+            "updated_at": {"type": "date"},
+        },
+    ),
+}
+
+# template name -> the index (or alias) the app reads and writes
+INDICES = {name: template["index_patterns"][0] for name, template in TEMPLATES.items()}
+
+# render plans are rebuilt from the dashboards and keyed by their `_seq_no`,
+# which a reindex of the dashboards restarts: dropped rather than copied
+RENDER_PLANS = INDICES["custom_dashboard_render_plans"]
+
+
+def installed_version(client, name):
+    """Version of the installed template `name`, or None if there is none."""
+    try:
+        response = client.indices.get_index_template(name=name)
+    except NotFoundError:
+        return None
+    for template in response.get("index_templates", []):
+        return template["index_template"].get("version")
+    return None
+
+
+def ensure(client):
+    """Install every template that is missing or older than `TEMPLATE_VERSION`."""
+    for name, template in TEMPLATES.items():
+        version = installed_version(client, name)
+        if version is not None and version >= TEMPLATE_VERSION:
+            continue
+        client.indices.put_index_template(name=name, body=template)
+        logger.info(f"Installed index template '{name}' v{TEMPLATE_VERSION} (was {version})")
+
+
+def mapping_version(client, index):
+    """Template version the mapping of `index` was created with (0 if none)."""
+    response = client.indices.get_mapping(index=index)
+    versions = [
+        (mapping.get("mappings") or {}).get("_meta", {}).get("version", 0)
+        for mapping in response.values()
+    ]
+    return min(versions, default=0)
+
+
+def cached_mapping_version(client, index):
+    """`mapping_version` of `index`, cached; a missing index counts as current."""
+    version = _mapping_versions.get(index)
+    if version is MISSING:
+        try:
+            version = mapping_version(client, index)
+        except NotFoundError:
+            # created from the current template by its first write
+            version = TEMPLATE_VERSION
+        _mapping_versions.set(index, version)
+    return version
+
+
+def is_current(client, index):
+    """Whether every field of the current template is mapped on `index`."""
+    return cached_mapping_version(client, index) >= TEMPLATE_VERSION
+
+
+def lookup_field(client, index, field):
+    """
+    Name to query or sort the lookup `field` of the app index `index` by:
+    the field itself, or its `.keyword` sub-field while `index` still has
+    a mapping older than KEYWORD_FIELDS_VERSION. Other fields are returned
+    unchanged.
+    """
+    template = next(
+        (t for t in TEMPLATES.values() if t["index_patterns"][0] == index), None
+    )
+    if template is None or template["template"]["mappings"]["properties"].get(field) != KEYWORD:
+        return field
+    if cached_mapping_version(client, index) >= KEYWORD_FIELDS_VERSION:
+        return field
+    return f"{field}.keyword"
+
+
+def outdated_indices(client):
+    """Existing app indices whose mapping is older than `TEMPLATE_VERSION`."""
+    outdated = []
+    for index in INDICES.values():
+        if not client.indices.exists(index=index):
+            continue
+        if mapping_version(client, index) < TEMPLATE_VERSION:
+            outdated.append(index)
+    return outdated
+
+
+def reindex(client, index):
+    """
+    Move `index` to the current mapping: copy it into `index-v<N>` (created
+    from the template), then atomically point the alias `index` at the copy
+    and drop the old index. `index` is write-blocked while the copy runs,
+    so writes made meanwhile fail instead of being lost; they are unblocked
+    again if the reindex fails. Returns the new index name.
+    """
+    target = f"{index}-v{TEMPLATE_VERSION}"
+    sources = list(client.indices.get(index=index))
+    if target in sources:
+        return target
+
+    if client.indices.exists(index=target):
+        # left over from an interrupted run
+        client.indices.delete(index=target)
+    client.indices.create(index=target)
+    client.indices.put_settings(index=index, body={"index.blocks.write": True})
+    try:
+        result = client.reindex(
+            body={"source": {"index": index}, "dest": {"index": target, "op_type": "create"}},
+            refresh=True,
+            wait_for_completion=True,
+        )
+        if result.get("failures"):
+            raise RuntimeError(f"Reindex of '{index}' failed: {result['failures'][:3]}")
+        client.indices.update_aliases(
+            body={
+                "actions": [{"remove_index": {"index": source}} for source in sources]
+                + [{"add": {"index": target, "alias": index}}]
+            }
+        )
+    except Exception:
+        client.indices.put_settings(index=index, body={"index.blocks.write": None})
+        raise
+    _mapping_versions.discard(lambda key: key == index)
+    logger.info(f"Reindexed '{index}' ({result.get('total', 0)} docs) into '{target}'")
+    return target
+
+
+def drop(client, index):
+    """Delete `index`, or every index behind it if it is an alias."""
+    client.indices.delete(index=",".join(client.indices.get(index=index)))
+    _mapping_versions.discard(lambda key: key == index)
+    logger.info(f"Dropped '{index}'")
+
+
+def reindex_outdated(client):
+    """
+    Install the templates and reindex every outdated app index. The render
+    plans are dropped instead when they or the dashboards are outdated;
+    views rebuild them.
+    """
+    ensure(client)
+    outdated = outdated_indices(client)
+    reindexed = [reindex(client, index) for index in outdated if index != RENDER_PLANS]
+    # after the dashboards moved: plans built meanwhile have the old seq_nos
+    if RENDER_PLANS in outdated or INDICES["custom_dashboards"] in outdated:
+        if client.indices.exists(index=RENDER_PLANS):
+            drop(client, RENDER_PLANS)
+    return reindexed
@@ -0,0 +1,294 @@
+"""
+In-memory catalog of the saved searches.
+
+The whole `saved_searches` index is read once with a point in time and
+`search_after` (a scroll on clusters that can't search a point in time) and
+kept sorted by title and index name, so the saved search picker is
+served from memory with prefix search and paging instead of a capped
+`match_all` on every call.
+
+The catalog refreshes itself when it is read and older than
+`REFRESH_INTERVAL`: documents whose `updated_at` is at or after the
+newest one already loaded are fetched and merged into it. A full rescan
+is done instead when that can't be trusted: the index has no timestamps,
+too many documents changed, the document count no longer adds up (a
+delete), or the last full scan is older than `FULL_RESCAN_INTERVAL`.
+Documents an incremental refresh finds edited since the previous one are
+reported to `on_change`, so whatever was derived from them can be dropped.
+"""
+
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from elasticsearch import helpers
+from elasticsearch.exceptions import TransportError
+
+from utils.util import logger
+
+MODIFIED_FIELD = "updated_at"
+SOURCE_FIELDS = ["title", "index_name", "columns", "filter", MODIFIED_FIELD]
+
+PAGE_SIZE = 1000
+KEEP_ALIVE = "1m"
+REFRESH_INTERVAL = 60  # seconds
+FULL_RESCAN_INTERVAL = 3600  # seconds
+
+# sorts after every title starting with a given prefix
+_PREFIX_END = "\U0010ffff"
+
+
+@dataclass(frozen=True)
+class SavedSearch:
+    id: str
+    title: str
+    index_name: str
+
+    @property
+    def sort_key(self):
+        return (self.title.casefold(), self.index_name, self.id)
+
+
+def _entry(hit) -> Optional[SavedSearch]:
+    source = hit["_source"]
+    if "title" not in source or "index_name" not in source:
+        return None
+    return SavedSearch(
+        id=hit["_id"], title=str(source["title"]), index_name=str(source["index_name"])
+    )
+
+
+class SavedSearchCatalog:
+    def __init__(
+        self, client, index="saved_searches", on_load=None, on_change=None, clock=time.monotonic
+    ):
+        """
+        `on_load(sources)` is called with the `_source` of every document
+        a refresh loaded (all of them after a full scan), `on_change(sources)`
+        with those an incremental refresh found modified after the newest
+        one loaded before.
+        """
+        self.client = client
+        self.index = index
+        self.on_load = on_load
+        self.on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (id -> SavedSearch or None for documents without a title/index,
+        #  entries sorted by title, their sort keys); swapped as a whole
+        self._snapshot = None
+        self._watermark = None
+        self._refreshed_at = None
+        self._scanned_at = None
+        self._pit_supported = True
+
+    def search(self, prefix="", index=None, page=1, size=None):
+        """
+        Saved searches whose title starts with `prefix` (case-insensitive),
+        optionally only those of `index`, sorted by title and index name.
+        Returns (one page of them, or all if `size` is None; total).
+        """
+        self._maybe_refresh()
+        _, entries, keys = self._snapshot
+        prefix = (prefix or "").casefold()
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + _PREFIX_END,))
+        matches = entries[start:end]
+        if index is not None:
+            matches = [entry for entry in matches if entry.index_name == index]
+        total = len(matches)
+        if size is not None:
+            matches = matches[(page - 1) * size : page * size]
+        return matches, total
+
+    def __len__(self):
+        return len(self._snapshot[1]) if self._snapshot is not None else 0
+
+    def invalidate(self):
+        """Make the next read refresh the catalog."""
+        self._refreshed_at = None
+
+    def poll(self):
+        """Refresh a loaded catalog if it is due, unless another request already is."""
+        if self._snapshot is not None:
+            self._maybe_refresh()
+
+    @property
+    def due(self):
+        """Whether the catalog is loaded and `poll` would refresh it."""
+        refreshed_at = self._refreshed_at
+        return self._snapshot is not None and (
+            refreshed_at is None or self._clock() - refreshed_at >= REFRESH_INTERVAL
+        )
+
+    def refresh(self, full=False):
+        with self._lock:
+            self._refresh(full)
+
+    def _maybe_refresh(self):
+        refreshed_at = self._refreshed_at
+        if refreshed_at is not None and self._clock() - refreshed_at < REFRESH_INTERVAL:
+            return
+        if self._snapshot is None:
+            # nothing to serve yet: wait for whoever is loading it
+            self._lock.acquire()
+        elif not self._lock.acquire(blocking=False):
+            # another request is refreshing; serve the current catalog
+            return
+        try:
+            if self._refreshed_at == refreshed_at:
+                self._refresh()
+        except TransportError as e:
+            if self._snapshot is None:
+                raise
+            logger.warning(f"Saved search catalog not refreshed, serving the loaded one: {e}")
+            self._refreshed_at = self._clock()
+        finally:
+            self._lock.release()
+
+    def _refresh(self, full=False):
+        full = (
+            full
+            or self._snapshot is None
+            or self._watermark is None
+            or self._clock() - self._scanned_at >= FULL_RESCAN_INTERVAL
+        )
+        if full or not self._refresh_changed():
+            self._full_scan()
+        self._refreshed_at = self._clock()
+
+    def _full_scan(self):
+        # taken before the scan: whatever changes during it is at or after
+        watermark = self._max_modified()
+        documents, sources = {}, []
+        for hit in self._scan():
+            documents[hit["_id"]] = _entry(hit)
+            sources.append(hit["_source"])
+        self._swap(documents, watermark)
+        self._scanned_at = self._clock()
+        logger.info(f"Loaded {len(self)} saved searches from '{self.index}'")
+        if self.on_load is not None:
+            self.on_load(sources)
+
+    def _refresh_changed(self) -> bool:
+        """Merge the documents changed since the watermark; False if a full scan is needed."""
+        response = self.client.search(
+            index=self.index,
+            body={
+                "query": {
+                    "range": {MODIFIED_FIELD: {"gte": self._watermark, "format": "epoch_millis"}}
+                },
+                "size": PAGE_SIZE,
+                "sort": [{MODIFIED_FIELD: "asc"}],
+                "track_total_hits": True,
+                "_source": SOURCE_FIELDS,
+                "aggs": {
+                    "modified": {"max": {"field": MODIFIED_FIELD}},
+                    # the global bucket counts every document, not just the changed ones
+                    "all": {"global": {}},
+                },
+            },
+        )
+        hits = response["hits"]["hits"]
+        if response["hits"]["total"]["value"] > len(hits):
+            return False
+
+        documents = dict(self._snapshot[0])
+        for hit in hits:
+            documents[hit["_id"]] = _entry(hit)
+        aggregations = response.get("aggregations") or {}
+        if aggregations.get("all", {}).get("doc_count") != len(documents):
+            return False
+
+        watermark = self._watermark
+        modified = aggregations.get("modified", {}).get("value")
+        self._swap(documents, max(int(modified or 0), watermark))
+        if hits and self.on_load is not None:
+            self.on_load([hit["_source"] for hit in hits])
+        # the range includes the watermark itself, those were seen before
+        changed = [hit["_source"] for hit in hits if hit["sort"][0] > watermark]
+        if changed and self.on_change is not None:
+            self.on_change(changed)
+        return True
+
+    def _max_modified(self):
+        response = self.client.search(
+            index=self.index,
+            body={"size": 0, "aggs": {"modified": {"max": {"field": MODIFIED_FIELD}}}},
+        )
+        modified = (response.get("aggregations") or {}).get("modified", {}).get("value")
+        # epoch millis; None if no document has a timestamp
+        return int(modified) if modified is not None else None
+
+    def _swap(self, documents, watermark):
+        entries = sorted(
+            (entry for entry in documents.values() if entry is not None),
+            key=lambda entry: entry.sort_key,
+        )
+        self._snapshot = (documents, entries, [entry.sort_key for entry in entries])
+        self._watermark = watermark
+
+    def _scan(self):
+        if self._pit_supported:
+            pit_id = self._open_point_in_time()
+            if pit_id is not None:
+                scanned = 0
+                try:
+                    for hit in self._scan_pit(pit_id):
+                        scanned += 1
+                        yield hit
+                    return
+                except TransportError as e:
+                    # e.g. the `_shard_doc` sort, which 7.10 and 7.11 reject
+                    if scanned or e.status_code != 400:
+                        raise
+                    logger.info(
+                        f"Point in time search failed, scanning '{self.index}' with a scroll: {e}"
+                    )
+                    self._pit_supported = False
+        yield from helpers.scan(
+            self.client,
+            index=self.index,
+            query={"query": {"match_all": {}}, "_source": SOURCE_FIELDS},
+            size=PAGE_SIZE,
+        )
+
+    def _open_point_in_time(self):
+        """Id of a point in time on the index, None if the cluster has no support for it."""
+        try:
+            pit = self.client.open_point_in_time(index=self.index, keep_alive=KEEP_ALIVE)
+        except TransportError as e:
+            if e.status_code not in (400, 404, 405) or e.error == "index_not_found_exception":
+                raise
+            logger.info(f"No point in time support, scanning '{self.index}' with a scroll: {e}")
+            self._pit_supported = False
+            return None
+        return pit["id"]
+
+    def _scan_pit(self, pit_id):
+        search_after = None
+        try:
+            while True:
+                body = {
+                    "pit": {"id": pit_id, "keep_alive": KEEP_ALIVE},
+                    "size": PAGE_SIZE,
+                    "sort": [{"_shard_doc": "asc"}],
+                    "track_total_hits": False,
+                    "_source": SOURCE_FIELDS,
+                }
+                if search_after is not None:
+                    body["search_after"] = search_after
+                response = self.client.search(body=body)
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+                yield from hits
+                if len(hits) < PAGE_SIZE:
+                    return
+                search_after = hits[-1]["sort"]
+        finally:
+            try:
+                self.client.close_point_in_time(body={"id": pit_id})
+            except TransportError as e:
+                logger.warning(f"Failed to close point in time on '{self.index}': {e}")
@@ -2,13 +2,16 @@
 API routes for data management module
 """
 
+import functools
+import hmac
 import logging
+import os
 
 
-from flask import request
+from flask import Response, g, request, send_file, stream_with_context
 from flask_cors import cross_origin
 
-from apping import ResponseDto
+from apping import ResponseDto, config
 from apping.custom_dashboard.model import (
     ChartData,
     DashboardRequest,
@@ -19,16 +22,183 @@ from apping.custom_dashboard.model import (
 )
 from flask_pydantic import validate
 from apping.custom_dashboard.controllers import dashboardController as controller
+from apping.custom_dashboard.controllers import asyncController as async_controller
 from apping.custom_dashboard.controllers import (
     visualizationController as viz_controller,
 )
 
 
+from apping.custom_dashboard.controllers.esController import router, slow_query_log
+from utils import deadline, metrics, profiling, slow_queries, timing
+from utils.circuit_breaker import ClusterUnavailable
 from . import custom_dashboard
 
 
 logger = logging.getLogger(__name__)
 
+PROFILE_DIR = config.get("profiling", "output_dir", fallback="profiles")
+profile_sampler = profiling.Sampler(
+    every=config.getint("profiling", "sample_every", fallback=0),
+    min_interval=config.getfloat("profiling", "min_interval_seconds", fallback=60),
+)
+
+HTTP_REQUESTS = metrics.counter(
+    "custom_dashboard_http_requests_total",
+    "Requests handled by the custom_dashboard blueprint.",
+    ("endpoint", "method", "status"),
+)
+HTTP_LATENCY = metrics.histogram(
+    "custom_dashboard_http_request_duration_seconds",
+    "Latency of custom_dashboard endpoints.",
+    ("endpoint", "method"),
+)
+
+
+def is_admin_request():
+    """True when the request carries the admin token from config.ini."""
+    token = config.get("admin", "token", fallback="")
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(token, supplied)
+
+
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return {"message": "Admin token required"}, 403
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def request_budget():
+    """Seconds this request may spend, from X-Request-Timeout or config."""
+    default = config.getfloat("deadline", "default_seconds", fallback=30)
+    maximum = config.getfloat("deadline", "max_seconds", fallback=120)
+    try:
+        requested = float(request.headers.get("X-Request-Timeout", default))
+    except ValueError:
+        requested = default
+    return max(0.1, min(requested, maximum))
+
+
+@custom_dashboard.errorhandler(deadline.DeadlineExceeded)
+def handle_deadline_exceeded(e):
+    return {"message": str(e), "status": "timeout"}, 504
+
+
+@custom_dashboard.errorhandler(ClusterUnavailable)
+def handle_cluster_unavailable(e):
+    return {"message": str(e), "status": e.reason, "cluster": e.cluster}, 503
+
+
+# ---------- REQUEST TIMINGS ----------
+@custom_dashboard.before_request
+def start_request_timings():
+    g.timings = timing.start(request.endpoint)
+    deadline.start(request_budget())
+    slow_queries.bind_origin(endpoint=request.path)
+
+    # profiling: explicit `X-Profile: cpu[,memory]` from an admin, or sampled
+    modes = profiling.parse_modes(request.headers.get("X-Profile"))
+    if modes and not is_admin_request():
+        modes = set()
+    if not modes and profile_sampler.should_sample():
+        modes = {"cpu"}
+    if modes:
+        g.profile = profiling.RequestProfile(
+            request.path,
+            modes,
+            frames=config.getint("profiling", "tracemalloc_frames", fallback=10),
+        ).start()
+
+
+@custom_dashboard.after_request
+def add_server_timing_header(response):
+    profile = g.get("profile")
+    if profile is not None:
+        profile.stop().save(PROFILE_DIR)
+        response.headers["X-Profile-Id"] = profile.profile_id
+        logger.info(f"Stored profile {profile.profile_id} for {request.path}")
+
+    timings = g.get("timings")
+    if timings is not None:
+        response.headers["Server-Timing"] = timings.server_timing()
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUESTS.inc(
+            endpoint=endpoint, method=request.method, status=response.status_code
+        )
+        HTTP_LATENCY.observe(
+            timings.total_ms / 1000, endpoint=endpoint, method=request.method
+        )
+    return response
+
+
+@custom_dashboard.teardown_request
+def stop_request_timings(exc):
+    if g.get("profile") is not None:
+        g.profile.stop()
+    timing.stop()
+    deadline.clear()
+    slow_queries.clear_origin()
+
+
+# ---------- METRICS ----------
+@custom_dashboard.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.REGISTRY.expose(), content_type=metrics.CONTENT_TYPE)
+
+
+# ---------- SLOW QUERY LOG ----------
+@custom_dashboard.route("/admin/slow_queries", methods=["GET"])
+@admin_required
+def get_slow_queries():
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return {"message": "limit must be an integer"}, 400
+    if limit < 1:
+        return {"message": "limit must be positive"}, 400
+    order_by = request.args.get("order_by", "p95_ms")
+    try:
+        queries = slow_query_log.top(limit, order_by)
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    return {"slow_queries": queries, "responseDto": ResponseDto().ok()}
+
+
+@custom_dashboard.route("/admin/slow_queries/dump", methods=["POST"])
+@admin_required
+def dump_slow_queries():
+    path = config.get("slow_query_log", "dump_path", fallback="slow_queries.json")
+    count = slow_query_log.dump(path)
+    return {"path": path, "fingerprints": count, "responseDto": ResponseDto().ok()}
+
+
+# ---------- SAVED SEARCH CACHE ----------
+@custom_dashboard.route("/admin/saved_searches/invalidate", methods=["POST"])
+@admin_required
+def invalidate_saved_searches():
+    """Forget cached saved searches (optionally only ?title= / ?index=) after an edit."""
+    dropped = controller.invalidate_saved_searches(
+        request.args.get("title"), request.args.get("index")
+    )
+    return {"invalidated": dropped, "responseDto": ResponseDto().ok()}
+
+
+# ---------- PROFILES ----------
+@custom_dashboard.route("/admin/profiles/<profile_id>", methods=["GET"])
+@admin_required
+def get_profile(profile_id):
+    fmt = request.args.get("format", "collapsed")
+    path = profiling.profile_path(PROFILE_DIR, profile_id, fmt)
+    if path is None:
+        return {"message": "Profile not found"}, 404
+    if fmt == "pstats":
+        return send_file(os.path.abspath(path), as_attachment=True)
+    with open(path, encoding="utf-8") as f:
+        return Response(f.read(), mimetype="text/plain")
+
 
 # ---------- Get table data ----------
 @custom_dashboard.route("/create_table", methods=["POST"])
@@ -86,7 +256,39 @@ def view_dashboard():
     gte = request.args.get("gte", None)
     print("??")
     print(f"Dashboard ID: {dashboard_id}, lte: {lte}, gte: {gte}")
-    return controller.view_dashboard(dashboard_id, lte, gte)
+    include_timings = request.args.get("timings", "").lower() in ("1", "true")
+    return controller.view_dashboard(dashboard_id, lte, gte, include_timings)
+
+
+# ---------- VIEW DASHBOARD DATA (ASYNC) ----------
+@custom_dashboard.route("view_dashboard_async", methods=["GET"])
+async def view_dashboard_async():
+    """Same response as /view_dashboard, with all panels queried concurrently."""
+    dashboard_id = request.args.get("dashboard_id")
+    lte = request.args.get("lte", None)
+    gte = request.args.get("gte", None)
+    include_timings = request.args.get("timings", "").lower() in ("1", "true")
+    return await async_controller.runtime.run_async(
+        async_controller.view_dashboard(dashboard_id, lte, gte, include_timings)
+    )
+
+
+# ---------- STREAM DASHBOARD DATA (SSE) ----------
+@custom_dashboard.route("view_dashboard_stream", methods=["GET"])
+def view_dashboard_stream():
+    """Dashboard skeleton first, then each panel as soon as its query completes."""
+    dashboard_id = request.args.get("dashboard_id")
+    lte = request.args.get("lte", None)
+    gte = request.args.get("gte", None)
+    include_timings = request.args.get("timings", "").lower() in ("1", "true")
+    events = async_controller.stream_dashboard(dashboard_id, lte, gte, include_timings)
+    if events is None:
+        return {"error": "Dashboard not found"}, 404
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ---------- FILTER FIELDS ----------
@@ -187,12 +389,8 @@ def get_mappings():
     if not label:
         return {"error": "index parameter is required"}, 400
 
-    # Map label to actual index pattern
-    label_to_pattern = {
-        "SIEM": "wazuh-alerts-*",
-        "NDR": "logstash-*",
-        "Vulnerability": "wazuh-states-vulnerabilities-devops",
-    }
+    # Map label to actual index pattern ([route:<label>] in config.ini)
+    label_to_pattern = router.label_patterns()
 
     pattern = label_to_pattern.get(
         label, label
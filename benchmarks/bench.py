@@ -0,0 +1,201 @@
+"""
+Micro-benchmarks for the Python side of dashboard rendering.
+
+Runs the controllers against `FakeTransport` (no cluster required) and
+reports per-function throughput, latency and allocations. Run from the
+repository root so `config.ini` is found:
+
+    python -m benchmarks.bench --buckets 50 --hits 100 --fields 40
+    python -m benchmarks.bench --save benchmarks/baseline.json
+    python -m benchmarks.bench --compare benchmarks/baseline.json --threshold 0.15
+
+`--recorded file.json` replays real responses ({"<index>": <search response>})
+instead of synthetic ones. `--compare` exits with status 1 when a function
+is slower (or allocates more) than the baseline by more than `--threshold`.
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+from benchmarks import fake_es
+
+warnings.filterwarnings("ignore")
+
+
+def build_cases(spec):
+    from apping.custom_dashboard.controllers import dashboardController as controller
+    from apping.custom_dashboard.controllers import visualizationController as viz_controller
+    from apping.custom_dashboard.controllers.filtersController import (
+        CustomDashboardAdvancedFilters,
+    )
+    from apping.custom_dashboard.model import TableData, VizData
+
+    gte = "2025-01-01T00:00:00.000Z"
+    lte = "2025-01-08T00:00:00.000Z"
+    table = TableData(
+        index=fake_es.TABLE_INDEX, title=fake_es.SAVED_SEARCH_TITLE, size=spec.hits, gte=gte, lte=lte
+    )
+    viz = VizData.model_validate({**fake_es.bar_query(spec), "gte": gte, "lte": lte})
+    aggregations = fake_es.aggs_response(
+        spec, {"chart_data": {"terms": {}, "aggs": {"level_1": {"terms": {}}}}}
+    )
+    filters = fake_es.make_filters(spec)
+
+    def advanced_filters():
+        query = controller.build_es_query(gte, lte)
+        CustomDashboardAdvancedFilters(filters, query).evaluate_filter_expression()
+
+    return {
+        "view_dashboard": lambda: controller.view_dashboard(fake_es.DASHBOARD_ID, lte, gte),
+        "create_bar_chart": lambda: viz_controller.create_bar_chart(viz.model_copy(deep=True)),
+        "get_table_data": lambda: controller.get_table_data(table.model_copy(deep=True)),
+        "format_es_response": lambda: controller.format_es_response(aggregations, "bar"),
+        "CustomDashboardAdvancedFilters": advanced_filters,
+    }
+
+
+def measure(func, iterations, warmup, alloc_iterations):
+    for _ in range(warmup):
+        func()
+
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    snapshot_start = tracemalloc.take_snapshot()
+    for _ in range(alloc_iterations):
+        func()
+    snapshot_end = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff for stat in snapshot_end.compare_to(snapshot_start, "filename") if stat.size_diff > 0
+    )
+    blocks = sum(
+        stat.count_diff for stat in snapshot_end.compare_to(snapshot_start, "filename") if stat.count_diff > 0
+    )
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return {
+        "ops_per_sec": round(1 / mean, 1) if mean else None,
+        "mean_us": round(mean * 1e6, 1),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 1),
+        "retained_kib_per_call": round(allocated / 1024 / alloc_iterations, 2),
+        "retained_blocks_per_call": round(blocks / alloc_iterations, 1),
+        "peak_kib": round((peak - before) / 1024, 1),
+    }
+
+
+def run(spec, iterations, warmup, alloc_iterations, recorded=None, only=None):
+    from apping import es
+    from apping.custom_dashboard.controllers.esController import es_con
+
+    clients = [es, es_con]
+    originals = fake_es.install(clients, spec, recorded)
+    try:
+        results = {}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for name, func in build_cases(spec).items():
+                if only and name not in only:
+                    continue
+                results[name] = measure(func, iterations, warmup, alloc_iterations)
+        return results
+    finally:
+        fake_es.restore(clients, originals)
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("mean_us", "retained_kib_per_call"):
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            current[f"{metric}_change"] = f"{change:+.1%}"
+            if change > threshold:
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_table(results):
+    columns = ["ops_per_sec", "mean_us", "p50_us", "p95_us", "retained_kib_per_call", "peak_kib"]
+    print(f"{'function':32}" + "".join(f"{c:>24}" for c in columns))
+    for name, row in results.items():
+        cells = []
+        for c in columns:
+            cell = str(row.get(c))
+            if f"{c}_change" in row:
+                cell += f" ({row[f'{c}_change']})"
+            cells.append(f"{cell:>24}")
+        print(f"{name:32}" + "".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = fake_es.DatasetSpec()
+    for field in dataclasses.fields(fake_es.DatasetSpec):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(getattr(defaults, field.name)), default=getattr(defaults, field.name))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-iterations", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="function names to run")
+    parser.add_argument("--recorded", help="JSON file of recorded responses keyed by index")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    spec = fake_es.DatasetSpec(**{f.name: getattr(args, f.name) for f in dataclasses.fields(fake_es.DatasetSpec)})
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, encoding="utf-8") as f:
+            recorded = json.load(f)
+
+    results = run(spec, args.iterations, args.warmup, args.alloc_iterations, recorded, args.only)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("spec") != dataclasses.asdict(spec):
+            print(f"warning: baseline was recorded with {baseline.get('spec')}")
+        regressions = compare(results, baseline, args.threshold)
+
+    print_table(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"spec": dataclasses.asdict(spec), "results": results}, f, indent=2)
+        print(f"saved baseline to {args.save}")
+
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
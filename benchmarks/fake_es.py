@@ -0,0 +1,336 @@
+"""
+Local stand-in for an Elasticsearch cluster.
+
+`FakeTransport` replaces the transport of an `Elasticsearch` client and
+answers searches, document gets, mapping, alias and write requests from
+canned responses, so the Python side of the dashboard code can be
+measured without a cluster. Documents the app indexes by id (render
+plans) are kept and served back by gets.
+
+Responses are synthetic (sized by `DatasetSpec`) unless a recorded response
+is supplied for an index. Request bodies are serialized and responses are
+deserialized from JSON on every call, as the real transport does.
+"""
+
+import copy
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from elasticsearch import Transport
+from elasticsearch.exceptions import NotFoundError
+
+DASHBOARD_ID = "00000000-0000-4000-8000-000000000001"
+SAVED_SEARCH_TITLE = "bench-search"
+TABLE_INDEX = "wazuh-alerts-*"
+CHART_INDEX = "logstash-*"
+
+
+@dataclass
+class DatasetSpec:
+    buckets: int = 20
+    sub_buckets: int = 5
+    hits: int = 20
+    fields: int = 20
+    filters: int = 4
+    panels: int = 6
+    latency_ms: float = 0.0
+
+
+def field_names(count):
+    return [f"data.field_{i}" for i in range(count)]
+
+
+def make_source(spec, seq):
+    """Nested document with scalar, list and object values."""
+    source = {"@timestamp": "2025-01-01T00:00:00.000Z"}
+    for i, name in enumerate(field_names(spec.fields)):
+        leaf = name.split(".")[-1]
+        if i % 5 == 3:
+            value = [f"v{seq}-{i}-{j}" for j in range(3)]
+        elif i % 5 == 4:
+            value = {"id": seq, "name": f"name-{seq}"}
+        else:
+            value = f"value-{seq}-{i}"
+        source.setdefault("data", {})[leaf] = value
+    return source
+
+
+def make_filters(spec):
+    operators = ["is", "is_not", "is_one_of", "exists"]
+    filters = []
+    for i in range(spec.filters):
+        operator = operators[i % len(operators)]
+        value = ["a", "b", "c"] if operator == "is_one_of" else f"value-{i}"
+        filters.append(
+            {"field": field_names(spec.fields)[i % spec.fields], "operator": operator, "value": value}
+        )
+    return filters
+
+
+def make_panels(spec):
+    """Alternating table and bar visualizations."""
+    panels = []
+    for i in range(spec.panels):
+        viz_id = str(uuid.UUID(int=i + 1))
+        options = {"height": 300, "width": 600}
+        if i % 2 == 0:
+            panels.append(
+                {
+                    "title": f"table-{i}",
+                    "viz_id": viz_id,
+                    "type": "table",
+                    "table_data": {"index": TABLE_INDEX, "title": SAVED_SEARCH_TITLE, "size": spec.hits},
+                    "options": options,
+                }
+            )
+        else:
+            panels.append(
+                {
+                    "title": f"bar-{i}",
+                    "viz_id": viz_id,
+                    "type": "bar",
+                    "viz_data": bar_query(spec, f"bar-{i}"),
+                    "options": options,
+                }
+            )
+    return panels
+
+
+def bar_query(spec, title="bench-bar", breakdown=True):
+    query = {
+        "index": CHART_INDEX,
+        "title": title,
+        "type": "bar",
+        "xAxis": {"fields": [field_names(spec.fields)[0]], "size": spec.buckets},
+        "custom_filter": [
+            {"condition": "ALL", "filters": [{"field": "alert.action", "operator": "exists", "value": None}]}
+        ],
+    }
+    if breakdown:
+        query["breakdown"] = {"fields": [field_names(spec.fields)[1]], "size": spec.sub_buckets}
+    return query
+
+
+def make_dashboard(spec):
+    return {
+        "name": "bench-dashboard",
+        "dashboard_id": DASHBOARD_ID,
+        "description": "synthetic",
+        "filters": [],
+        "visualizers": [{"title": p["title"], "viz_id": p["viz_id"]} for p in make_panels(spec)],
+    }
+
+
+def hits_response(docs, total=None):
+    return {
+        "took": 2,
+        "timed_out": False,
+        "hits": {
+            "total": {"value": len(docs) if total is None else total, "relation": "eq"},
+            "hits": [
+                {"_index": d[0], "_id": d[1], "_seq_no": 1, "_primary_term": 1, "_source": d[2]}
+                for d in docs
+            ],
+        },
+    }
+
+
+def aggs_response(spec, aggs, depth=0):
+    result = {}
+    for name, agg in (aggs or {}).items():
+        count = spec.buckets if depth == 0 else spec.sub_buckets
+        buckets = []
+        for i in range(count):
+            if "multi_terms" in agg:
+                key = [f"k{i}", f"m{i}"]
+            elif "date_histogram" in agg:
+                key = 1735689600000 + i * 3600000
+            else:
+                key = f"key-{i}"
+            bucket = {"key": key, "doc_count": (count - i) * 10}
+            if "date_histogram" in agg:
+                bucket["key_as_string"] = str(key)
+            bucket.update(aggs_response(spec, agg.get("aggs"), depth + 1))
+            buckets.append(bucket)
+        result[name] = {"buckets": buckets}
+    return result
+
+
+class FakeTransport(Transport):
+    def __init__(self, spec=None, recorded=None):
+        super().__init__([{"host": "fake-es"}])
+        self.spec = spec or DatasetSpec()
+        self.recorded = recorded or {}
+        self.panels = {p["viz_id"]: p for p in make_panels(self.spec)}
+        self.calls = 0
+        # documents indexed by the app (render plans), served back by GET
+        self.documents = {}
+        self._raw_cache = {}
+        self._lock = threading.Lock()
+
+    def _raw(self, key, build):
+        raw = self._raw_cache.get(key)
+        if raw is None:
+            raw = json.dumps(build())
+            with self._lock:
+                self._raw_cache[key] = raw
+        return raw
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        self.calls += 1
+        if body is not None and not isinstance(body, (str, bytes)):
+            body = self.serializer.dumps(body)
+        parsed = json.loads(body) if body else {}
+        if self.spec.latency_ms:
+            time.sleep(self.spec.latency_ms / 1000)
+        raw = self.route(method, url, parsed)
+        return self.deserializer.loads(raw, "application/json")
+
+    def route(self, method, url, body):
+        parts = [p for p in url.split("?")[0].split("/") if p]
+        index = parts[0] if parts and not parts[0].startswith("_") else None
+        action = parts[1] if len(parts) > 1 else (parts[0] if parts else "")
+
+        if index in self.recorded:
+            return json.dumps(self.recorded[index])
+
+        if action == "_pit":
+            # the point in time id is the index it was opened on
+            return json.dumps({"id": index, "succeeded": True})
+        if action in ("_search", "_msearch"):
+            if index is None and "pit" in body:
+                index = body["pit"]["id"]
+            return self.search(index, body)
+        if action == "_mapping" and len(parts) > 3 and parts[2] == "field":
+            return self._raw(("field", index, parts[3]), lambda: self.field_mapping(index, parts[3]))
+        if action == "_mapping":
+            return self._raw(("mapping", index), lambda: self.mapping(index))
+        if action == "_alias":
+            return self._raw(("alias", index), lambda: {index or "fake": {"aliases": {}}})
+        if action == "_bulk":
+            return json.dumps({"took": 1, "errors": False, "items": []})
+        if action == "_doc" and method == "HEAD":
+            return json.dumps(index == ".custom_dashboards" and parts[-1] == DASHBOARD_ID)
+        if action == "_mget":
+            return json.dumps(
+                {"docs": [self.document(doc["_index"], doc["_id"]) for doc in body["docs"]]}
+            )
+        if action == "_doc" and method == "GET":
+            return self.get(index, parts[-1])
+        if action == "_doc" and method in ("PUT", "POST") and len(parts) > 2:
+            with self._lock:
+                self.documents[(index, parts[-1])] = body
+        if action in ("_doc", "_update", "_create"):
+            return json.dumps({"_index": index, "_id": parts[-1], "result": "updated", "_seq_no": 2, "_primary_term": 1})
+        return json.dumps({"acknowledged": True})
+
+    def search(self, index, body):
+        spec = self.spec
+        if index == ".custom_dashboards":
+            return self._raw(
+                ("dashboard",), lambda: hits_response([(index, DASHBOARD_ID, make_dashboard(spec))])
+            )
+        if index == ".saved_visualizations":
+            text = json.dumps(body)
+            found = [p for viz_id, p in self.panels.items() if viz_id in text]
+            key = ("viz",) + tuple(p["viz_id"] for p in found)
+            return self._raw(
+                key, lambda: hits_response([(index, p["viz_id"], p) for p in found])
+            )
+        if index == "saved_searches":
+            saved = {
+                "title": SAVED_SEARCH_TITLE,
+                "index_name": TABLE_INDEX,
+                "columns": field_names(spec.fields),
+                "filter": make_filters(spec),
+            }
+            return self._raw(("saved",), lambda: hits_response([(index, "saved-1", saved)]))
+        if body.get("aggs"):
+            aggs = body["aggs"]
+            return self._raw(
+                ("aggs", json.dumps(aggs, sort_keys=True)),
+                lambda: {"took": 5, "timed_out": False, "hits": {"total": {"value": 1000}, "hits": []}, "aggregations": aggs_response(spec, aggs)},
+            )
+        return self._raw(
+            ("hits", index),
+            lambda: hits_response(
+                [(index, str(i), make_source(spec, i)) for i in range(spec.hits)], total=spec.hits * 50
+            ),
+        )
+
+    def get(self, index, doc_id):
+        document = self.document(index, doc_id)
+        if document["found"]:
+            return json.dumps(document)
+        raise NotFoundError(404, json.dumps(document), document)
+
+    def document(self, index, doc_id):
+        document = self.documents.get((index, doc_id))
+        if document is not None:
+            return {
+                "_index": index,
+                "_id": doc_id,
+                "_seq_no": 2,
+                "_primary_term": 1,
+                "found": True,
+                "_source": document,
+            }
+        if index == ".custom_dashboards" and doc_id == DASHBOARD_ID:
+            raw = self._raw(
+                ("get", index, doc_id),
+                lambda: {
+                    "_index": index,
+                    "_id": doc_id,
+                    "_version": 1,
+                    "_seq_no": 1,
+                    "_primary_term": 1,
+                    "found": True,
+                    "_source": make_dashboard(self.spec),
+                },
+            )
+            return json.loads(raw)
+        return {"_index": index, "_id": doc_id, "found": False}
+
+    def mapping(self, index):
+        from apping.custom_dashboard import index_templates
+
+        for name, app_index in index_templates.INDICES.items():
+            if index == app_index:
+                # the app's own indices, as created from the current templates
+                template = index_templates.TEMPLATES[name]["template"]
+                return {index: {"mappings": template["mappings"]}}
+        properties = {"@timestamp": {"type": "date"}, "data": {"properties": {}}}
+        for name in field_names(self.spec.fields):
+            properties["data"]["properties"][name.split(".")[-1]] = {
+                "type": "text",
+                "fields": {"keyword": {"type": "keyword"}},
+            }
+        return {f"{index or 'fake'}-000001": {"mappings": {"properties": properties}}}
+
+    def field_mapping(self, index, fields):
+        mappings = {}
+        for field in fields.split(","):
+            if field in field_names(self.spec.fields):
+                leaf = field.split(".")[-1]
+                mappings[field] = {
+                    "full_name": field,
+                    "mapping": {leaf: {"type": "text", "fields": {"keyword": {"type": "keyword"}}}},
+                }
+        return {f"{index or 'fake'}-000001": {"mappings": mappings}}
+
+
+def install(clients, spec=None, recorded=None):
+    """Swap the transport of each client for a `FakeTransport`; returns the originals."""
+    originals = []
+    for client in clients:
+        originals.append(client.transport)
+        client.transport = FakeTransport(spec, copy.deepcopy(recorded))
+    return originals
+
+
+def restore(clients, originals):
+    for client, transport in zip(clients, originals):
+        client.transport = transport
@@ -0,0 +1,260 @@
+"""
+End-to-end load test for the dashboard endpoints.
+
+Replays a weighted mix of `/view_dashboard`, `/create_table`,
+`/create_bar_chart` and `/filter-values` at a target request rate for each
+concurrency level and reports throughput, latency percentiles and error
+rate. Run from the repository root:
+
+    python -m benchmarks.loadtest --concurrency 1,4,16,64 --rps 200 --es-latency-ms 20
+    python -m benchmarks.loadtest --url http://127.0.0.1:5050 --rps 0
+
+Without `--url` the app is served in-process by the Werkzeug server with the
+ES clients swapped for `FakeTransport`; `--es-latency-ms` adds a fixed delay
+to every ES call so the cost of serial ES I/O shows up. `--rps 0` runs
+closed-loop (as fast as the workers can go).
+
+Latency is measured from each request's scheduled start, so queueing delay
+is included once the server falls behind the target rate.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import warnings
+
+import requests
+
+from benchmarks import fake_es
+
+warnings.filterwarnings("ignore")
+
+DEFAULT_MIX = "view_dashboard=4,create_table=3,create_bar_chart=2,filter_values=1"
+
+
+def build_requests(spec):
+    gte = "2025-01-01T00:00:00.000Z"
+    lte = "2025-01-08T00:00:00.000Z"
+    prefix = "/custom_dashboard"
+    return {
+        "view_dashboard": (
+            "GET",
+            f"{prefix}/view_dashboard",
+            {"params": {"dashboard_id": fake_es.DASHBOARD_ID, "gte": gte, "lte": lte}},
+        ),
+        "create_table": (
+            "POST",
+            f"{prefix}/create_table",
+            {
+                "json": {
+                    "index": fake_es.TABLE_INDEX,
+                    "title": fake_es.SAVED_SEARCH_TITLE,
+                    "size": spec.hits,
+                    "gte": gte,
+                    "lte": lte,
+                }
+            },
+        ),
+        "create_bar_chart": (
+            "POST",
+            f"{prefix}/create_bar_chart",
+            {"json": {**fake_es.bar_query(spec), "gte": gte, "lte": lte}},
+        ),
+        "filter_values": (
+            "POST",
+            f"{prefix}/filter-values",
+            {"params": {"field": fake_es.field_names(spec.fields)[0]}},
+        ),
+    }
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def run_level(base_url, plan, weights, concurrency, rps, duration, timeout):
+    names = list(weights)
+    cumulative = list(itertools.accumulate(weights[n] for n in names))
+    interval = 1 / rps if rps else 0
+    slots = itertools.count()
+    results = []
+    start = time.perf_counter() + 0.05
+    deadline = start + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local = []
+        while True:
+            slot = next(slots)
+            scheduled = start + slot * interval if interval else time.perf_counter()
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rng.choices(names, cum_weights=cumulative)[0]
+            method, path, kwargs = plan[name]
+            try:
+                response = session.request(method, base_url + path, timeout=timeout, **kwargs)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.append((name, time.perf_counter() - scheduled, ok))
+        results.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize(results, elapsed)
+
+
+def summarize(results, elapsed):
+    latencies = sorted(r[1] for r in results)
+    errors = sum(1 for r in results if not r[2])
+    summary = {
+        "requests": len(results),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0,
+        "error_rate": round(errors / len(results), 4) if results else 0,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p90_ms": _ms(percentile(latencies, 90)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "mean_ms": _ms(statistics.fmean(latencies) if latencies else None),
+        "endpoints": {},
+    }
+    for name in sorted({r[0] for r in results}):
+        endpoint_latencies = sorted(r[1] for r in results if r[0] == name)
+        summary["endpoints"][name] = {
+            "requests": len(endpoint_latencies),
+            "p50_ms": _ms(percentile(endpoint_latencies, 50)),
+            "p99_ms": _ms(percentile(endpoint_latencies, 99)),
+            "errors": sum(1 for r in results if r[0] == name and not r[2]),
+        }
+    return summary
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def start_local_server(spec, threaded=True):
+    from werkzeug.serving import make_server
+
+    from apping import es, main
+    from apping.custom_dashboard.controllers.esController import es_con
+
+    fake_es.install([es, es_con], spec)
+    server = make_server("127.0.0.1", 0, main, threaded=threaded)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def knee(levels):
+    """First concurrency level where adding workers no longer adds throughput."""
+    previous = None
+    for concurrency, summary in levels:
+        if previous and summary["throughput_rps"] < previous["throughput_rps"] * 1.1:
+            return concurrency
+        previous = summary
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running server instead of an in-process one")
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--rps", type=float, default=100, help="target request rate (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--es-latency-ms", type=float, default=10)
+    parser.add_argument("--panels", type=int, default=6)
+    parser.add_argument("--hits", type=int, default=20)
+    parser.add_argument("--buckets", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--no-threaded", action="store_true", help="serve one request at a time")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    spec = fake_es.DatasetSpec(
+        buckets=args.buckets,
+        hits=args.hits,
+        fields=args.fields,
+        panels=args.panels,
+        latency_ms=args.es_latency_ms,
+    )
+    plan = build_requests(spec)
+    weights = parse_mix(args.mix)
+    unknown = set(weights) - set(plan)
+    if unknown:
+        parser.error(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+
+    out = sys.stdout
+    server = None
+    base_url = args.url
+    levels = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if not base_url:
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            server, base_url = start_local_server(spec, threaded=not args.no_threaded)
+        try:
+            run_levels(args, base_url, plan, weights, levels, out)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    saturation = knee(levels)
+    if saturation:
+        print(f"\nthroughput stops scaling at concurrency {saturation}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": vars(args), "levels": [{"concurrency": c, **s} for c, s in levels]},
+                f,
+                indent=2,
+            )
+
+
+def run_levels(args, base_url, plan, weights, levels, out):
+    header = f"{'conc':>6}{'reqs':>8}{'rps':>10}{'err%':>8}{'p50ms':>10}{'p90ms':>10}{'p99ms':>10}{'maxms':>10}"
+    print(header, file=out, flush=True)
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        summary = run_level(
+            base_url, plan, weights, concurrency, args.rps, args.duration, args.timeout
+        )
+        levels.append((concurrency, summary))
+        print(
+            f"{concurrency:>6}{summary['requests']:>8}{summary['throughput_rps']:>10}"
+            f"{summary['error_rate'] * 100:>8.2f}{summary['p50_ms']!s:>10}{summary['p90_ms']!s:>10}"
+            f"{summary['p99_ms']!s:>10}{summary['max_ms']!s:>10}",
+            file=out,
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings, read from the [server] section of config.ini.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import configparser
+
+_config = configparser.ConfigParser()
+_config.read("config.ini", encoding="utf-8")
+_server = _config["server"] if _config.has_section("server") else {}
+
+bind = f"{_server.get('host', '0.0.0.0')}:{_server.get('port', '5050')}"
+workers = int(_server.get("workers", 4))
+threads = int(_server.get("threads", 8))
+worker_class = "gthread" if threads > 1 else "sync"
+keepalive = int(_server.get("keepalive", 5))
+timeout = int(_server.get("timeout", 120))
+graceful_timeout = int(_server.get("graceful_timeout", 30))
+
+# Import the app in each worker, not the master, so every worker builds
+# its own ES clients and connection pools after the fork.
+preload_app = False
+reload = False
+
+
+def post_worker_init(worker):
+    if _server.get("warm_up", "true").lower() in ("1", "true", "yes"):
+        from apping import warm_up
+
+        warm_up()
+
+
+def worker_exit(server, worker):
+    from apping import close_clients
+
+    close_clients()
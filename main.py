@@ -1,4 +1,11 @@
-from apping import main
+from apping import config, install_index_templates, main
 
+# Development server only; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
 if __name__ == '__main__':
-    main.run(host = '0.0.0.0', port=5050, debug=True)
+    install_index_templates()
+    main.run(
+        host=config.get("server", "host", fallback="0.0.0.0"),
+        port=config.getint("server", "port", fallback=5050),
+        debug=main.debug,
+        threaded=True,
+    )
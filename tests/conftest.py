@@ -0,0 +1,78 @@
+import pytest
+from elasticsearch.exceptions import ConflictError, NotFoundError
+
+from apping.custom_dashboard.controllers import dashboardController as dc
+
+
+class FakeES:
+    """Documents held in memory, with the seq_no checks of the document API."""
+
+    def __init__(self):
+        # (index, id) -> (_source, _seq_no)
+        self.docs = {}
+        self.seq_no = 0
+
+    def write(self, index, id, body):
+        self.seq_no += 1
+        self.docs[(index, id)] = (dict(body), self.seq_no)
+        return {"_index": index, "_id": id, "_seq_no": self.seq_no, "_primary_term": 1}
+
+    def _document(self, index, id):
+        if (index, id) not in self.docs:
+            return {"_index": index, "_id": id, "found": False}
+        source, seq_no = self.docs[(index, id)]
+        return {
+            "_index": index,
+            "_id": id,
+            "_seq_no": seq_no,
+            "_primary_term": 1,
+            "found": True,
+            "_source": dict(source),
+        }
+
+    def _check(self, index, id, op_type=None, if_seq_no=None):
+        current = self.docs.get((index, id))
+        if op_type == "create" and current is not None:
+            raise ConflictError(409, "version_conflict_engine_exception", {})
+        if if_seq_no is not None and (current is None or current[1] != if_seq_no):
+            raise ConflictError(409, "version_conflict_engine_exception", {})
+
+    def create(self, index, id, body, **params):
+        self._check(index, id, op_type="create")
+        return self.write(index, id, body)
+
+    def index(self, index, id, body, op_type=None, if_seq_no=None, if_primary_term=None, **params):
+        self._check(index, id, op_type, if_seq_no)
+        return self.write(index, id, body)
+
+    def update(self, index, id, body, **params):
+        if (index, id) not in self.docs:
+            raise NotFoundError(404, "document_missing_exception", {})
+        source = {**self.docs[(index, id)][0], **body["doc"]}
+        return {**self.write(index, id, source), "result": "updated"}
+
+    def delete(self, index, id, if_seq_no=None, if_primary_term=None, **params):
+        if (index, id) not in self.docs:
+            raise NotFoundError(404, "not_found", {})
+        self._check(index, id, if_seq_no=if_seq_no)
+        del self.docs[(index, id)]
+        return {"_index": index, "_id": id, "result": "deleted"}
+
+    def exists(self, index, id, **params):
+        return (index, id) in self.docs
+
+    def get(self, index, id, **params):
+        document = self._document(index, id)
+        if not document["found"]:
+            raise NotFoundError(404, "not_found", document)
+        return document
+
+    def mget(self, body, **params):
+        return {"docs": [self._document(doc["_index"], doc["_id"]) for doc in body["docs"]]}
+
+
+@pytest.fixture
+def fake_es(monkeypatch):
+    fake = FakeES()
+    monkeypatch.setattr(dc, "es", fake)
+    return fake
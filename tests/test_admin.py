@@ -0,0 +1,33 @@
+import pytest
+
+from apping import config, main
+
+SLOW_QUERIES = "/custom_dashboard/admin/slow_queries"
+
+
+@pytest.fixture
+def token():
+    """Sets the admin token for one test; restores the shipped one after."""
+    shipped = config.get("admin", "token", fallback="")
+    config.set("admin", "token", "s3cret")
+    yield "s3cret"
+    config.set("admin", "token", shipped)
+
+
+def test_admin_endpoints_are_closed_with_the_shipped_config():
+    assert config.get("admin", "token", fallback="") == ""
+    response = main.test_client().get(SLOW_QUERIES, headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+
+
+def test_admin_token_opens_them(token):
+    response = main.test_client().get(SLOW_QUERIES, headers={"X-Admin-Token": token})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("limit", ["ten", "0"])
+def test_slow_query_limit_must_be_a_positive_integer(token, limit):
+    response = main.test_client().get(
+        SLOW_QUERIES, query_string={"limit": limit}, headers={"X-Admin-Token": token}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from apping.custom_dashboard.controllers import asyncController
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+class HangingClient:
+    async def search(self, **kwargs):
+        await asyncio.sleep(60)
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30.0, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    transport = SimpleNamespace(breaker=breaker)
+    monkeypatch.setitem(asyncController.clients, "test", SimpleNamespace(transport=transport))
+    monkeypatch.setitem(asyncController._clients, "test", HangingClient())
+    return breaker
+
+
+def test_cancelled_search_gives_its_half_open_trial_back(half_open_breaker):
+    async def cancelled_search():
+        asyncController._semaphores["test"] = asyncio.Semaphore(1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                asyncController._search_cluster("test", "logs-x", {}, "query", None), 0.01
+            )
+
+    try:
+        asyncio.run(cancelled_search())
+    finally:
+        asyncController._semaphores.pop("test", None)
+
+    # the trial is free again; without the release the breaker would stay wedged
+    half_open_breaker.allow()
+    with pytest.raises(CircuitOpen):
+        half_open_breaker.allow()
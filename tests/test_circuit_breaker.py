@@ -0,0 +1,121 @@
+import pytest
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_breaker(clock, **kwargs):
+    kwargs.setdefault("failure_threshold", 2)
+    kwargs.setdefault("reset_timeout", 30.0)
+    return CircuitBreaker("test", clock=clock, **kwargs)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make_breaker(clock)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = make_breaker(clock)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_successful_trial_closes(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+    breaker.allow()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_released_trial_is_handed_out_again(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+
+    # the trial request was cancelled before it got a response
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_trial_without_outcome_expires(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+
+    clock.now += 29
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    clock.now += 1
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_release_outside_half_open_is_a_no_op(clock):
+    breaker = make_breaker(clock)
+    breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
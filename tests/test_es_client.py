@@ -0,0 +1,36 @@
+import pytest
+
+from utils.es_client import is_idempotent_read
+
+
+@pytest.mark.parametrize(
+    "method, url",
+    [
+        ("GET", "/.custom_dashboards/_doc/1"),
+        ("HEAD", "/.custom_dashboards/_doc/1"),
+        ("POST", "/logs-*/_search"),
+        ("POST", "/logs-*/_search?typed_keys=true"),
+        ("POST", "/_msearch"),
+        ("POST", "/_mget"),
+        ("POST", "/logs-*/_count"),
+        ("POST", "/logs-*/_field_caps?fields=*"),
+    ],
+)
+def test_reads_are_retried(method, url):
+    assert is_idempotent_read(method, url)
+
+
+@pytest.mark.parametrize(
+    "method, url",
+    [
+        ("POST", "/_aliases"),
+        ("POST", "/logs/_alias/current"),
+        ("POST", "/logs/_mapping"),
+        ("POST", "/.custom_dashboards/_update/1"),
+        ("POST", "/_search_history/_doc"),
+        ("PUT", "/.custom_dashboards/_doc/1"),
+        ("DELETE", "/_search/scroll"),
+    ],
+)
+def test_writes_are_not_retried(method, url):
+    assert not is_idempotent_read(method, url)
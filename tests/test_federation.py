@@ -0,0 +1,143 @@
+from utils import federation
+
+
+def terms_response(buckets, other=0, total=None, relation="eq"):
+    return {
+        "took": 5,
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "failed": 0},
+        "hits": {"total": {"value": total or 0, "relation": relation}, "hits": []},
+        "aggregations": {
+            "by_host": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": other,
+                "buckets": [{"key": key, "doc_count": count} for key, count in buckets],
+            }
+        },
+    }
+
+
+TERMS_BODY = {"size": 0, "aggs": {"by_host": {"terms": {"field": "host", "size": 2}}}}
+
+
+def test_over_fetch_raises_terms_sizes_without_touching_the_body():
+    body = {
+        "aggs": {
+            "outer": {
+                "terms": {"field": "a", "size": 5},
+                "aggs": {"inner": {"multi_terms": {"terms": [], "size": 3}}},
+            }
+        }
+    }
+    fetched = federation.over_fetch(body, factor=2, extra=10)
+
+    assert body["aggs"]["outer"]["terms"] == {"field": "a", "size": 5}
+    assert fetched["aggs"]["outer"]["terms"]["size"] == 20
+    assert fetched["aggs"]["outer"]["terms"]["shard_size"] == 40
+    assert fetched["aggs"]["outer"]["aggs"]["inner"]["multi_terms"]["size"] == 16
+
+
+def test_single_response_is_returned_as_is():
+    response = terms_response([("a", 1)])
+    assert federation.merge_responses([response, None], TERMS_BODY) is response
+
+
+def test_terms_are_summed_re_ranked_and_cut_to_size():
+    merged = federation.merge_responses(
+        [
+            terms_response([("a", 10), ("b", 6), ("c", 1)], other=3, total=20),
+            terms_response([("b", 7), ("d", 4)], total=11),
+        ],
+        TERMS_BODY,
+    )
+
+    agg = merged["aggregations"]["by_host"]
+    assert agg["buckets"] == [{"key": "b", "doc_count": 13}, {"key": "a", "doc_count": 10}]
+    # the cut buckets move into the "other" count
+    assert agg["sum_other_doc_count"] == 3 + 4 + 1
+    assert merged["hits"]["total"] == {"value": 31, "relation": "eq"}
+    assert merged["_shards"] == {"total": 2, "successful": 2, "failed": 0}
+
+
+def test_terms_ordered_by_key():
+    body = {"aggs": {"by_host": {"terms": {"field": "host", "size": 3, "order": {"_key": "asc"}}}}}
+    merged = federation.merge_responses(
+        [terms_response([("c", 9), ("a", 1)]), terms_response([("b", 5)])], body
+    )
+    keys = [b["key"] for b in merged["aggregations"]["by_host"]["buckets"]]
+    assert keys == ["a", "b", "c"]
+
+
+def test_total_is_a_lower_bound_if_any_cluster_stopped_counting():
+    merged = federation.merge_responses(
+        [terms_response([], total=10000, relation="gte"), terms_response([], total=5)],
+        TERMS_BODY,
+    )
+    assert merged["hits"]["total"] == {"value": 10005, "relation": "gte"}
+
+
+def test_histograms_merge_by_key_with_sub_aggregations():
+    aggs = {
+        "over_time": {
+            "date_histogram": {"field": "@timestamp", "fixed_interval": "1h"},
+            "aggs": {"bytes": {"sum": {"field": "bytes"}}, "peak": {"max": {"field": "bytes"}}},
+        }
+    }
+
+    def bucket(key, count, total, peak):
+        return {"key": key, "doc_count": count, "bytes": {"value": total}, "peak": {"value": peak}}
+
+    merged = federation.merge_aggregations(
+        [
+            {"over_time": {"buckets": [bucket(2000, 1, 10, 10), bucket(1000, 2, 5, 4)]}},
+            {"over_time": {"buckets": [bucket(1000, 3, 7, 6)]}},
+        ],
+        aggs,
+    )
+
+    assert merged["over_time"]["buckets"] == [
+        bucket(1000, 5, 12, 6),
+        bucket(2000, 1, 10, 10),
+    ]
+
+
+def test_filters_merge_by_position_and_by_name():
+    aggs = {"f": {"filters": {"filters": [{}, {}]}}}
+    merged = federation.merge_aggregations(
+        [
+            {"f": {"buckets": [{"doc_count": 1}, {"doc_count": 2}]}},
+            {"f": {"buckets": [{"doc_count": 3}, {"doc_count": 4}]}},
+        ],
+        aggs,
+    )
+    assert merged["f"]["buckets"] == [{"doc_count": 4}, {"doc_count": 6}]
+
+    keyed = federation.merge_aggregations(
+        [{"f": {"buckets": {"x": {"doc_count": 1}}}}, {"f": {"buckets": {"x": {"doc_count": 2}}}}],
+        aggs,
+    )
+    assert keyed["f"]["buckets"] == {"x": {"doc_count": 3}}
+
+
+def test_metrics_that_cannot_be_combined_keep_the_first_value():
+    aggs = {"avg_bytes": {"avg": {"field": "bytes"}}, "lo": {"min": {"field": "bytes"}}}
+    merged = federation.merge_aggregations(
+        [
+            {"avg_bytes": {"value": 2.0}, "lo": {"value": 3}},
+            {"avg_bytes": {"value": 8.0}, "lo": {"value": 1}},
+        ],
+        aggs,
+    )
+    assert merged == {"avg_bytes": {"value": 2.0}, "lo": {"value": 1}}
+
+
+def test_multi_terms_keys_group_as_tuples():
+    body = {"aggs": {"pair": {"multi_terms": {"terms": [{}, {}], "size": 5}}}}
+    merged = federation.merge_aggregations(
+        [
+            {"pair": {"buckets": [{"key": ["a", 1], "doc_count": 2}]}},
+            {"pair": {"buckets": [{"key": ["a", 1], "doc_count": 3}]}},
+        ],
+        body["aggs"],
+    )
+    assert merged["pair"]["buckets"] == [{"key": ["a", 1], "doc_count": 5}]
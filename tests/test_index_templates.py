@@ -0,0 +1,129 @@
+import pytest
+from elasticsearch.exceptions import NotFoundError
+
+from apping.custom_dashboard import index_templates
+
+
+class FakeIndices:
+    def __init__(self, versions):
+        # index -> mapping version (0: no `_meta`, as dynamic mapping creates)
+        self.versions = versions
+        self.calls = []
+
+    def get_mapping(self, index):
+        self.calls.append(("get_mapping", index))
+        if index not in self.versions:
+            raise NotFoundError(404, "index_not_found_exception", {})
+        version = self.versions[index]
+        return {index: {"mappings": {"_meta": {"version": version}} if version else {}}}
+
+    def get(self, index):
+        return {index: {}}
+
+    def get_index_template(self, name):
+        template = index_templates.TEMPLATES[name]
+        return {"index_templates": [{"name": name, "index_template": template}]}
+
+    def exists(self, index):
+        return index in self.versions
+
+    def create(self, index):
+        self.calls.append(("create", index))
+
+    def delete(self, index):
+        self.calls.append(("delete", index))
+
+    def put_settings(self, index, body):
+        self.calls.append(("put_settings", index, body))
+
+    def update_aliases(self, body):
+        self.calls.append(("update_aliases",))
+
+
+class FakeClient:
+    def __init__(self, versions, reindex_result=None):
+        self.indices = FakeIndices(versions)
+        self.reindex_result = reindex_result or {"total": 0, "failures": []}
+
+    def reindex(self, **params):
+        self.indices.calls.append(("reindex",))
+        if isinstance(self.reindex_result, Exception):
+            raise self.reindex_result
+        return self.reindex_result
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    index_templates._mapping_versions.clear()
+    yield
+    index_templates._mapping_versions.clear()
+
+
+def test_lookup_field_uses_keyword_sub_fields_of_old_mappings():
+    client = FakeClient({".custom_dashboards": 0})
+    assert index_templates.lookup_field(client, ".custom_dashboards", "name") == "name.keyword"
+    # dates and payloads are not keyword lookups
+    assert index_templates.lookup_field(client, ".custom_dashboards", "updated_at") == "updated_at"
+    assert index_templates.lookup_field(client, ".custom_dashboards", "filters") == "filters"
+
+
+def test_lookup_field_uses_the_field_on_current_mappings():
+    client = FakeClient({"saved_searches": index_templates.TEMPLATE_VERSION})
+    assert index_templates.lookup_field(client, "saved_searches", "title") == "title"
+
+
+def test_lookup_field_on_a_missing_index_expects_the_template():
+    client = FakeClient({})
+    assert index_templates.lookup_field(client, ".saved_visualizations", "viz_id") == "viz_id"
+
+
+def test_lookup_field_caches_the_mapping_version():
+    client = FakeClient({".custom_dashboards": 0})
+    index_templates.lookup_field(client, ".custom_dashboards", "name")
+    index_templates.lookup_field(client, ".custom_dashboards", "dashboard_id")
+    assert client.indices.calls == [("get_mapping", ".custom_dashboards")]
+
+
+def test_reindex_blocks_writes_to_the_source_during_the_copy():
+    client = FakeClient({".custom_dashboards": 0})
+    target = index_templates.reindex(client, ".custom_dashboards")
+
+    assert target == f".custom_dashboards-v{index_templates.TEMPLATE_VERSION}"
+    calls = [call[0] for call in client.indices.calls]
+    assert calls == ["create", "put_settings", "reindex", "update_aliases"]
+    assert client.indices.calls[1][2] == {"index.blocks.write": True}
+
+
+def test_failed_reindex_unblocks_the_source():
+    client = FakeClient({".custom_dashboards": 0}, reindex_result=RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        index_templates.reindex(client, ".custom_dashboards")
+
+    assert client.indices.calls[-1] == (
+        "put_settings",
+        ".custom_dashboards",
+        {"index.blocks.write": None},
+    )
+
+
+def test_reindex_outdated_drops_the_render_plans_instead_of_copying_them():
+    client = FakeClient({".custom_dashboards": 0, ".custom_dashboard_render_plans": 0})
+    assert index_templates.reindex_outdated(client) == [
+        f".custom_dashboards-v{index_templates.TEMPLATE_VERSION}"
+    ]
+    calls = [call for call in client.indices.calls if call[0] in ("create", "delete")]
+    assert calls == [
+        ("create", f".custom_dashboards-v{index_templates.TEMPLATE_VERSION}"),
+        ("delete", ".custom_dashboard_render_plans"),
+    ]
+
+
+def test_reindex_of_the_dashboards_drops_current_render_plans():
+    client = FakeClient(
+        {
+            ".custom_dashboards": 0,
+            ".custom_dashboard_render_plans": index_templates.TEMPLATE_VERSION,
+        }
+    )
+    index_templates.reindex_outdated(client)
+    assert ("delete", ".custom_dashboard_render_plans") in client.indices.calls
@@ -0,0 +1,115 @@
+import base64
+
+import pytest
+
+from apping import main
+from apping.custom_dashboard import index_templates
+from apping.custom_dashboard.controllers import dashboardController as dc
+
+
+def test_cursor_round_trip():
+    cursor = dc.encode_cursor(["2026-01-02T00:00:00", "d-1"], 42)
+    assert dc.decode_cursor(cursor) == {"after": ["2026-01-02T00:00:00", "d-1"], "total": 42}
+
+
+def test_cursor_is_url_safe():
+    cursor = dc.encode_cursor(["ü" * 50, ">>>???"], None)
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        "é",
+        base64.urlsafe_b64encode(b"not json").decode(),
+        base64.urlsafe_b64encode(b"[1, 2]").decode(),
+        base64.urlsafe_b64encode(b'{"after": "x"}').decode(),
+    ],
+)
+def test_bad_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        dc.decode_cursor(cursor)
+
+
+class FakeIndices:
+    def get_mapping(self, index):
+        return {index: {"mappings": {"_meta": {"version": index_templates.TEMPLATE_VERSION}}}}
+
+
+class FakeES:
+    def __init__(self, last_updated="2026-01-05T00:00:00.000Z"):
+        self.indices = FakeIndices()
+        self.last_updated = last_updated
+        self.searches = []
+
+    def search(self, index, body, **params):
+        self.searches.append(body)
+        hits = [
+            {"_id": f"d{i}", "_source": {"dashboard_id": f"d{i}", "name": f"Dash {i}"}, "sort": [i]}
+            for i in range(params.get("size", 0))
+        ]
+        response = {"hits": {"total": {"value": 5, "relation": "eq"}, "hits": hits}}
+        if "aggs" in body:
+            response["aggregations"] = {
+                "last_updated": {"value": 1, "value_as_string": self.last_updated}
+            }
+        return response
+
+
+@pytest.fixture
+def fake_es(monkeypatch):
+    index_templates._mapping_versions.clear()
+    fake = FakeES()
+    monkeypatch.setattr(dc, "es", fake)
+    return fake
+
+
+def list_dashboards(query="size=2", headers=None):
+    with main.test_request_context(f"/?{query}", headers=headers or {}):
+        return dc.list_dashboards()
+
+
+def test_first_page_carries_the_etag_from_one_search(fake_es):
+    body, status, headers = list_dashboards()
+
+    assert status == 200
+    assert body["total"] == 5
+    assert headers["ETag"].startswith('"')
+    assert len(fake_es.searches) == 1
+    assert fake_es.searches[0]["track_total_hits"] is True
+    assert "last_updated" in fake_es.searches[0]["aggs"]
+
+
+def test_matching_if_none_match_skips_the_page(fake_es):
+    _, _, headers = list_dashboards()
+    fake_es.searches.clear()
+
+    body, status, _ = list_dashboards(headers={"If-None-Match": headers["ETag"]})
+
+    assert status == 304
+    assert [search["size"] for search in fake_es.searches] == [0]
+
+
+def test_changed_list_is_fetched_again(fake_es):
+    _, _, headers = list_dashboards()
+    fake_es.last_updated = "2026-02-01T00:00:00.000Z"
+
+    body, status, new_headers = list_dashboards(headers={"If-None-Match": headers["ETag"]})
+
+    assert status == 200
+    assert new_headers["ETag"] != headers["ETag"]
+
+
+def test_cursor_pages_reuse_the_first_total(fake_es):
+    body, _, _ = list_dashboards()
+    fake_es.searches.clear()
+
+    page, status, headers = list_dashboards(f"size=2&cursor={body['next_cursor']}")
+
+    assert status == 200
+    assert page["total"] == 5
+    assert headers == {}
+    assert fake_es.searches[0]["search_after"] == [1]
+    assert fake_es.searches[0]["track_total_hits"] is False
+    assert "aggs" not in fake_es.searches[0]
@@ -0,0 +1,40 @@
+import threading
+
+from utils import metrics
+
+
+def run_threads(count, target):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_counter_sums_the_threads():
+    counter = metrics.Counter("test_requests_total", "Requests.", ("route",))
+    counter.inc(route="a")
+    run_threads(3, lambda: counter.inc(2, route="a"))
+    assert counter.collect() == {("a",): 7}
+
+
+def test_tables_of_exited_threads_are_merged_and_dropped():
+    counter = metrics.Counter("test_requests_total", "Requests.")
+    histogram = metrics.Histogram("test_latency_seconds", "Latency.", buckets=(1,))
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    run_threads(200, work)
+    assert counter.collect() == {(): 200}
+    assert histogram.collect() == {(): [200, 0, 100.0]}
+    assert counter._shards == []
+    assert histogram._shards == []
+
+
+def test_exposition_includes_exited_threads():
+    histogram = metrics.Histogram("test_latency_seconds", "Latency.", buckets=(1,))
+    run_threads(2, lambda: histogram.observe(2))
+    samples = histogram.expose()
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in samples
+    assert "test_latency_seconds_count 2" in samples
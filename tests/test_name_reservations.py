@@ -0,0 +1,115 @@
+import uuid
+
+import pytest
+
+from apping.custom_dashboard.controllers import dashboardController as dc
+from apping.custom_dashboard.model import DashboardRequest
+
+NAMES = ".custom_dashboard_names"
+DASHBOARDS = ".custom_dashboards"
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr(dc.time, "time", lambda: clock[0])
+    return clock
+
+
+def owner(fake_es, name):
+    source, _ = fake_es.docs[(NAMES, dc.dashboard_name_key(name))]
+    return source["dashboard_id"]
+
+
+def save_dashboard(fake_es, dashboard_id, name):
+    fake_es.write(DASHBOARDS, str(dashboard_id), {"name": name})
+
+
+def test_first_reservation_wins(fake_es, now):
+    first, second = uuid.uuid4(), uuid.uuid4()
+    assert dc.reserve_dashboard_name("ops", first) is not None
+    save_dashboard(fake_es, first, "ops")
+
+    assert dc.reserve_dashboard_name("ops", second) is None
+    assert owner(fake_es, "ops") == str(first)
+
+
+def test_owner_may_reserve_again(fake_es, now):
+    dashboard_id = uuid.uuid4()
+    dc.reserve_dashboard_name("ops", dashboard_id)
+    assert dc.reserve_dashboard_name("ops", dashboard_id) is not None
+
+
+def test_reservation_of_a_dashboard_being_created_is_kept(fake_es, now):
+    creating, other = uuid.uuid4(), uuid.uuid4()
+    dc.reserve_dashboard_name("ops", creating)
+
+    # the first create is still saving its visualizations: no dashboard yet
+    now[0] += dc.NAME_RESERVATION_GRACE - 1
+    assert dc.reserve_dashboard_name("ops", other) is None
+    assert owner(fake_es, "ops") == str(creating)
+
+
+def test_reservation_of_a_missing_dashboard_is_taken_over_after_the_grace(fake_es, now):
+    abandoned, other = uuid.uuid4(), uuid.uuid4()
+    dc.reserve_dashboard_name("ops", abandoned)
+
+    now[0] += dc.NAME_RESERVATION_GRACE
+    assert dc.reserve_dashboard_name("ops", other) is not None
+    assert owner(fake_es, "ops") == str(other)
+
+
+def test_reservation_of_a_renamed_dashboard_is_taken_over(fake_es, now):
+    renamed, other = uuid.uuid4(), uuid.uuid4()
+    dc.reserve_dashboard_name("ops", renamed)
+    save_dashboard(fake_es, renamed, "ops (old)")
+
+    assert dc.reserve_dashboard_name("ops", other) is not None
+    assert owner(fake_es, "ops") == str(other)
+
+
+def test_reservation_without_timestamp_counts_as_old(fake_es, now):
+    # written before reservations had `reserved_at` (e.g. by the id migration)
+    key = dc.dashboard_name_key("ops")
+    fake_es.write(NAMES, key, {"name": "ops", "dashboard_id": str(uuid.uuid4())})
+
+    other = uuid.uuid4()
+    assert dc.reserve_dashboard_name("ops", other) is not None
+    assert owner(fake_es, "ops") == str(other)
+
+
+def test_concurrent_takeover_loses_the_compare_and_set(fake_es, now, monkeypatch):
+    stale, first, second = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    dc.reserve_dashboard_name("ops", stale)
+    now[0] += dc.NAME_RESERVATION_GRACE
+
+    get = fake_es.get
+
+    def get_then_race(index, id, **params):
+        doc = get(index, id, **params)
+        if index == NAMES and not hasattr(fake_es, "raced"):
+            # another worker takes the stale reservation over in between
+            fake_es.raced = True
+            fake_es.write(NAMES, id, {"name": "ops", "dashboard_id": str(first)})
+        return doc
+
+    monkeypatch.setattr(fake_es, "get", get_then_race)
+    assert dc.reserve_dashboard_name("ops", second) is None
+    assert owner(fake_es, "ops") == str(first)
+
+
+def test_create_is_one_create_only_write_under_a_new_id(fake_es, now, monkeypatch):
+    def exists(index, id, **params):
+        raise AssertionError("create_dashboard checked for the dashboard first")
+
+    monkeypatch.setattr(fake_es, "exists", exists)
+    monkeypatch.setattr(dc, "save_visualizations", lambda index, vizs, refresh: (vizs, None))
+    monkeypatch.setattr(dc, "refresh_render_plan", lambda *args, **kwargs: None)
+    sent_id = uuid.uuid4()
+
+    request = DashboardRequest(dashboard_id=sent_id, name="ops", visualizers=[])
+    body, status = dc.create_dashboard(request)
+    assert status == 201
+    (dashboard_id,) = [id for index, id in fake_es.docs if index == DASHBOARDS]
+    assert dashboard_id != str(sent_id)
+    assert owner(fake_es, "ops") == dashboard_id
@@ -0,0 +1,105 @@
+import pytest
+
+from apping.custom_dashboard import index_templates
+from apping.custom_dashboard.controllers import dashboardController as dc
+from apping.custom_dashboard.controllers import visualizationController as vc
+
+PLANS = ".custom_dashboard_render_plans"
+DASHBOARDS = ".custom_dashboards"
+DASHBOARD_ID = "d1"
+
+
+@pytest.fixture(autouse=True)
+def builds(monkeypatch):
+    """Names of the dashboards render plans were built for."""
+    builds = []
+
+    def build_render_plan(dashboard_id, dashboard_source, written, visualizations=None):
+        builds.append(dashboard_source["name"])
+        return {
+            "dashboard_id": str(dashboard_id),
+            "version": dc.RENDER_PLAN_VERSION,
+            "dashboard_seq_no": written.get("_seq_no"),
+            "dashboard_primary_term": written.get("_primary_term"),
+            "dashboard": dashboard_source,
+        }
+
+    monkeypatch.setattr(dc, "build_render_plan", build_render_plan)
+    return builds
+
+
+def stored_plan(fake_es):
+    return fake_es.docs[(PLANS, DASHBOARD_ID)][0]
+
+
+def test_missing_dashboard_has_no_plan(fake_es, builds):
+    assert dc.get_render_plan(DASHBOARD_ID) is None
+    assert builds == []
+
+
+def test_plan_is_built_once_and_then_served(fake_es, builds):
+    fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+
+    assert dc.get_render_plan(DASHBOARD_ID)["dashboard"] == {"name": "ops"}
+    assert dc.get_render_plan(DASHBOARD_ID)["dashboard"] == {"name": "ops"}
+    assert builds == ["ops"]
+
+
+def test_plan_of_an_earlier_write_is_rebuilt(fake_es):
+    written = fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+    dc.refresh_render_plan(DASHBOARD_ID, {"name": "ops"}, written)
+    # written meanwhile without its plan being stored
+    fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops2"})
+
+    assert dc.get_render_plan(DASHBOARD_ID)["dashboard"] == {"name": "ops2"}
+    assert stored_plan(fake_es)["dashboard"] == {"name": "ops2"}
+
+
+def test_outdated_layout_is_rebuilt(fake_es):
+    written = fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+    dc.refresh_render_plan(DASHBOARD_ID, {"name": "ops"}, written)
+    plan = stored_plan(fake_es)
+    fake_es.write(PLANS, DASHBOARD_ID, {**plan, "version": dc.RENDER_PLAN_VERSION - 1})
+
+    assert dc.get_render_plan(DASHBOARD_ID)["version"] == dc.RENDER_PLAN_VERSION
+    assert stored_plan(fake_es)["version"] == dc.RENDER_PLAN_VERSION
+
+
+def test_rebuild_does_not_overwrite_a_newer_plan(fake_es):
+    fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+    read = fake_es.write(PLANS, DASHBOARD_ID, {"dashboard": "stale"})
+    fake_es.write(PLANS, DASHBOARD_ID, {"dashboard": "newer"})
+
+    assert dc.rebuild_render_plan(DASHBOARD_ID, read)["dashboard"] == {"name": "ops"}
+    assert stored_plan(fake_es) == {"dashboard": "newer"}
+
+
+def test_rebuild_does_not_bring_back_a_dropped_plan(fake_es):
+    fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+    read = fake_es.write(PLANS, DASHBOARD_ID, {"dashboard": "stale"})
+    del fake_es.docs[(PLANS, DASHBOARD_ID)]
+
+    assert dc.rebuild_render_plan(DASHBOARD_ID, read) is not None
+    assert (PLANS, DASHBOARD_ID) not in fake_es.docs
+
+
+def test_rebuild_does_not_replace_a_plan_created_meanwhile(fake_es):
+    fake_es.write(DASHBOARDS, DASHBOARD_ID, {"name": "ops"})
+    fake_es.write(PLANS, DASHBOARD_ID, {"dashboard": "newer"})
+
+    dc.rebuild_render_plan(DASHBOARD_ID, None)
+    assert stored_plan(fake_es) == {"dashboard": "newer"}
+
+
+@pytest.mark.parametrize("version, field", [(0, "viz_ids.keyword"), (2, "viz_ids")])
+def test_visualization_edits_drop_plans_by_the_mapped_viz_ids(monkeypatch, version, field):
+    queries = []
+
+    class Client:
+        def delete_by_query(self, index, body, **params):
+            queries.append(body["query"])
+
+    monkeypatch.setattr(vc, "es", Client())
+    monkeypatch.setattr(index_templates, "cached_mapping_version", lambda client, index: version)
+    vc.invalidate_render_plans(["v1"])
+    assert queries == [{"terms": {field: ["v1"]}}]
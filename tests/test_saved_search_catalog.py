@@ -0,0 +1,136 @@
+import pytest
+from elasticsearch.exceptions import RequestError
+
+from apping.custom_dashboard import saved_search_catalog as catalog_module
+from apping.custom_dashboard.controllers import dashboardController as dc
+from apping.custom_dashboard.saved_search_catalog import SavedSearchCatalog
+
+
+class FakeClient:
+    """Saved searches behind a point in time, a scroll and a range search."""
+
+    def __init__(self, docs, pit_search_error=None):
+        # id -> _source
+        self.docs = docs
+        self.pit_search_error = pit_search_error
+        self.calls = []
+
+    def _hit(self, id, sort):
+        return {"_id": id, "_source": dict(self.docs[id]), "sort": sort}
+
+    def _modified(self):
+        return max((doc.get("updated_at", 0) for doc in self.docs.values()), default=None)
+
+    def open_point_in_time(self, index, keep_alive):
+        self.calls.append("open_pit")
+        return {"id": "pit-1"}
+
+    def close_point_in_time(self, body):
+        self.calls.append("close_pit")
+
+    def search(self, index=None, body=None, scroll=None, **params):
+        if "pit" in body:
+            self.calls.append("pit_search")
+            if self.pit_search_error is not None:
+                raise self.pit_search_error
+            return {"hits": {"hits": [self._hit(id, [n]) for n, id in enumerate(self.docs)]}}
+        if scroll is not None:
+            self.calls.append("scroll")
+            hits = [self._hit(id, [n]) for n, id in enumerate(self.docs)]
+            return {
+                "_scroll_id": "scroll-1",
+                "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+                "hits": {"hits": hits},
+            }
+        aggregations = {"modified": {"value": self._modified()}}
+        if body.get("size") == 0:
+            total = {"value": len(self.docs)}
+            return {"hits": {"total": total, "hits": []}, "aggregations": aggregations}
+        since = body["query"]["range"]["updated_at"]["gte"]
+        changed = sorted(
+            (id for id, doc in self.docs.items() if doc.get("updated_at", -1) >= since),
+            key=lambda id: self.docs[id]["updated_at"],
+        )
+        aggregations["all"] = {"doc_count": len(self.docs)}
+        return {
+            "hits": {
+                "total": {"value": len(changed)},
+                "hits": [self._hit(id, [self.docs[id]["updated_at"]]) for id in changed],
+            },
+            "aggregations": aggregations,
+        }
+
+    def scroll(self, body=None, **params):
+        return {"_scroll_id": "scroll-1", "hits": {"hits": []}}
+
+    def clear_scroll(self, body=None, **params):
+        pass
+
+
+@pytest.fixture
+def docs():
+    return {
+        "a": {"title": "Alpha", "index_name": "logs", "updated_at": 100},
+        "b": {"title": "beta", "index_name": "logs", "updated_at": 200},
+    }
+
+
+def titles(catalog, prefix=""):
+    return [entry.title for entry in catalog.search(prefix)[0]]
+
+
+def test_full_scan_with_a_point_in_time(docs):
+    client = FakeClient(docs)
+    catalog = SavedSearchCatalog(client)
+    assert titles(catalog) == ["Alpha", "beta"]
+    assert client.calls == ["open_pit", "pit_search", "close_pit"]
+
+
+def test_rejected_point_in_time_search_falls_back_to_a_scroll(docs):
+    error = RequestError(400, "search_phase_execution_exception", {})
+    client = FakeClient(docs, pit_search_error=error)
+    catalog = SavedSearchCatalog(client)
+    assert titles(catalog) == ["Alpha", "beta"]
+    assert client.calls == ["open_pit", "pit_search", "close_pit", "scroll"]
+
+    catalog.refresh(full=True)
+    assert client.calls[-1] == "scroll"
+    assert "open_pit" not in client.calls[4:]
+
+
+def test_other_point_in_time_search_errors_are_raised(docs):
+    error = catalog_module.TransportError(500, "boom", {})
+    catalog = SavedSearchCatalog(FakeClient(docs, pit_search_error=error))
+    with pytest.raises(catalog_module.TransportError):
+        catalog.refresh()
+
+
+def test_incremental_refresh_reports_documents_modified_since(docs):
+    changed = []
+    now = [0.0]
+    client = FakeClient(docs)
+    catalog = SavedSearchCatalog(client, on_change=changed.append, clock=lambda: now[0])
+    catalog.refresh()
+
+    docs["b"] = {"title": "beta", "index_name": "metrics", "updated_at": 300}
+    now[0] += catalog_module.REFRESH_INTERVAL
+    assert catalog.due
+    catalog.poll()
+
+    assert [entry.index_name for entry in catalog.search("beta")[0]] == ["metrics"]
+    assert changed == [[docs["b"]]]
+
+    # nothing modified since: the document at the watermark is not reported again
+    now[0] += catalog_module.REFRESH_INTERVAL
+    catalog.poll()
+    assert changed == [[docs["b"]]]
+
+
+def test_titles_endpoint_reports_catalog_errors(monkeypatch):
+    def search(**params):
+        raise catalog_module.TransportError("N/A", "connection refused", {})
+
+    monkeypatch.setattr(dc.saved_search_catalog, "search", search)
+    body, status = dc.saved_searches_all_titles()
+    assert status == 500
+    assert body["error"] == "Internal server error"
@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight, canonical_key
+
+
+def run_concurrently(flight, key, leader_func, waiter_func, waiters=3):
+    """Start `leader_func` under `key`, then `waiters` callers of `waiter_func`."""
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return leader_func()
+
+    def call(func):
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=call, args=(leader,))]
+    threads[0].start()
+    started.wait(5)
+    for _ in range(waiters):
+        threads.append(threading.Thread(target=call, args=(waiter_func,)))
+        threads[-1].start()
+    # let the waiters join the leader's call before it completes
+    while flight._calls[key].waiters < waiters:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def waiter():
+        calls.append("waiter")
+        return {"value": "waiter"}
+
+    results = run_concurrently(flight, "k", lambda: {"value": 1}, waiter)
+
+    assert calls == []
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(result == {"value": 1} for result, _ in results)
+    # every caller gets its own copy
+    assert len({id(result) for result, _ in results}) == len(results)
+
+
+def test_waiters_retry_when_the_leader_fails():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    results = run_concurrently(flight, "k", fail, lambda: "own")
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert [str(e) for e in errors] == ["boom"]
+    # each waiter ran (or shared) a call of its own instead of the error
+    assert [r[0] for r in results if not isinstance(r, Exception)] == ["own"] * 3
+
+
+def test_unshareable_result_is_not_handed_to_waiters():
+    flight = SingleFlight()
+    partial = {"timed_out": True}
+
+    def shareable_do(func):
+        return flight.do("k", func, shareable=lambda r: not r.get("timed_out"))
+
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return partial
+
+    def run(name, func):
+        results[name] = shareable_do(func)
+
+    first = threading.Thread(target=run, args=("leader", leader))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=run, args=("waiter", lambda: {"timed_out": False}))
+    second.start()
+    while flight._calls["k"].waiters < 1:
+        pass
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results["leader"] == (partial, False)
+    assert results["waiter"] == ({"timed_out": False}, False)
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+    assert flight.in_flight() == 0
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: int("x"))
+    assert flight.in_flight() == 0
+
+
+def test_canonical_key_ignores_dict_order():
+    assert canonical_key({"a": 1, "b": 2}) == canonical_key({"b": 2, "a": 1})
+    assert canonical_key({"a": 1}) != canonical_key({"a": 2})
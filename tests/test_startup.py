@@ -0,0 +1,50 @@
+import pytest
+
+import apping
+from apping.custom_dashboard import index_templates
+
+
+class FakeEnsure:
+    """Stands in for index_templates.ensure; fails while `failing` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = False
+
+    def __call__(self, client):
+        self.calls.append(client)
+        if self.failing:
+            raise ConnectionError("cluster down")
+
+
+@pytest.fixture
+def ensure(monkeypatch):
+    ensure = FakeEnsure()
+    monkeypatch.setattr(index_templates, "ensure", ensure)
+    monkeypatch.setattr(index_templates, "outdated_indices", lambda client: [])
+    monkeypatch.setattr(apping, "_index_templates", {"installed": False, "attempted_at": None})
+    return ensure
+
+
+def test_create_app_installs_the_index_templates(ensure):
+    assert apping.create_app() is apping.main
+    assert ensure.calls == [apping.es]
+    assert apping._index_templates["installed"]
+
+
+def test_failed_install_is_retried_by_a_later_request(ensure, monkeypatch):
+    ensure.failing = True
+    apping.create_app()
+    assert not apping._index_templates["installed"]
+
+    # too soon: no retry
+    apping.retry_index_templates()
+    assert len(ensure.calls) == 1
+
+    ensure.failing = False
+    attempted_at = apping._index_templates["attempted_at"]
+    later = attempted_at + apping.INDEX_TEMPLATES_RETRY_INTERVAL
+    monkeypatch.setattr(apping.time, "monotonic", lambda: later)
+    apping.retry_index_templates()
+    assert len(ensure.calls) == 2
+    assert apping._index_templates["installed"]
@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+
+from apping.custom_dashboard.controllers import dashboardController as dc
+from apping.custom_dashboard.model import DashboardRequest
+
+DASHBOARDS = ".custom_dashboards"
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Visualizations passed to save_visualizations, saved as they are."""
+    saved = []
+
+    def save_visualizations(index, visualizations, refresh="false"):
+        saved.extend(visualizations)
+        return visualizations, None
+
+    monkeypatch.setattr(dc, "save_visualizations", save_visualizations)
+    monkeypatch.setattr(dc, "refresh_render_plan", lambda *args, **kwargs: None)
+    return saved
+
+
+def dashboard(dashboard_id):
+    return DashboardRequest(
+        dashboard_id=dashboard_id, name="ops", visualizers=[{"title": "t", "type": "bar"}]
+    )
+
+
+def test_missing_dashboard_is_not_found_before_visualizations_are_written(fake_es, saved):
+    body, status = dc.update_dashboard(dashboard(uuid.uuid4()))
+    assert status == 404
+    assert saved == []
+    assert fake_es.docs == {}
+
+
+def test_existing_dashboard_is_updated(fake_es, saved):
+    dashboard_id = uuid.uuid4()
+    fake_es.write(DASHBOARDS, str(dashboard_id), {"name": "old"})
+
+    body, status = dc.update_dashboard(dashboard(dashboard_id))
+    assert status == 200
+    assert [viz.title for viz in saved] == ["t"]
+    assert fake_es.docs[(DASHBOARDS, str(dashboard_id))][0]["name"] == "ops"
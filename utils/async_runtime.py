@@ -0,0 +1,67 @@
+"""
+A long-lived asyncio event loop running in a background thread.
+
+Async clients (aiohttp sessions) are bound to the loop they were created
+on, so they cannot be shared between the short-lived loops a WSGI server
+gives each async view. Coroutines are instead submitted to this loop,
+which owns the pooled async clients for the life of the worker process.
+The caller's context variables (timings, deadline, slow-query origin) are
+copied into the submitted coroutine.
+"""
+
+import asyncio
+import contextvars
+import threading
+
+
+class EventLoopThread:
+    def __init__(self, name="async-runtime"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._loop is not None
+
+    @property
+    def loop(self):
+        """The running loop, started on first use."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=loop.run_forever, name=self.name, daemon=True
+                    )
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop; returns a `concurrent.futures.Future`."""
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(_in_context(context, coro), self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run `coro` on the loop and block the calling thread for its result."""
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """Await `coro` on the runtime loop from a coroutine on another loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+
+async def _in_context(context, coro):
+    # the task runs in a copy of the loop thread's context; restore the
+    # submitting thread's values there (tasks it spawns inherit them)
+    for var, value in context.items():
+        var.set(value)
+    return await coro
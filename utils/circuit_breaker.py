@@ -0,0 +1,198 @@
+"""
+Circuit breakers and admission control for the Elasticsearch clusters.
+
+Each cluster gets a `CircuitBreaker` that opens after consecutive failures
+and fails fast until `reset_timeout` has passed, then lets a few trial
+requests through (half-open) before closing again. A trial that reports
+no outcome within `reset_timeout` (a hung or cancelled request) stops
+counting, so another request is let through in its place. An `Admission` gate
+bounds the requests in flight against the cluster; callers beyond that
+wait in a bounded queue and are shed once the queue is full or the wait
+times out. One degraded cluster then ties up at most `max_in_flight`
+worker threads instead of all of them.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import metrics
+
+CIRCUIT_STATE = metrics.gauge(
+    "custom_dashboard_es_circuit_state",
+    "Circuit breaker state per cluster (0 closed, 1 half-open, 2 open).",
+    ("cluster",),
+)
+IN_FLIGHT = metrics.gauge(
+    "custom_dashboard_es_in_flight",
+    "Elasticsearch requests currently admitted per cluster.",
+    ("cluster",),
+)
+QUEUED = metrics.gauge(
+    "custom_dashboard_es_queued",
+    "Requests waiting for an admission slot per cluster.",
+    ("cluster",),
+)
+AVAILABLE = metrics.gauge(
+    "custom_dashboard_es_available",
+    "1 while the cluster accepts requests, 0 while its circuit is open.",
+    ("cluster",),
+)
+REJECTED = metrics.counter(
+    "custom_dashboard_es_rejected_total",
+    "Requests failed fast by the circuit breaker or shed by admission control.",
+    ("cluster", "reason"),
+)
+
+
+class ClusterUnavailable(Exception):
+    """Raised instead of calling a cluster that cannot take the request."""
+
+    reason = "unavailable"
+
+    def __init__(self, cluster, message):
+        super().__init__(message)
+        self.cluster = cluster
+
+
+class CircuitOpen(ClusterUnavailable):
+    reason = "circuit_open"
+
+
+class Overloaded(ClusterUnavailable):
+    reason = "overloaded"
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        cluster,
+        failure_threshold=5,
+        reset_timeout=30.0,
+        half_open_max=1,
+        clock=time.monotonic,
+    ):
+        self.cluster = cluster
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.failures = 0
+        self.opened_at = None
+        self._clock = clock
+        self._state = self.CLOSED
+        # start times of the half-open trials still waiting for an outcome
+        self._trials = []
+        self._lock = threading.Lock()
+        self._publish()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        now = self._clock()
+        if self._state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+            self._trials = []
+        elif self._state == self.HALF_OPEN:
+            expired = now - self.reset_timeout
+            self._trials = [started for started in self._trials if started > expired]
+        return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        self._publish()
+
+    def _publish(self):
+        CIRCUIT_STATE.set(self.STATE_VALUES[self._state], cluster=self.cluster)
+        AVAILABLE.set(0 if self._state == self.OPEN else 1, cluster=self.cluster)
+
+    def allow(self):
+        """Raise `CircuitOpen` unless a request may be sent now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and len(self._trials) < self.half_open_max:
+                self._trials.append(self._clock())
+                return
+        REJECTED.inc(cluster=self.cluster, reason=CircuitOpen.reason)
+        raise CircuitOpen(self.cluster, f"circuit for cluster {self.cluster} is open")
+
+    def release(self):
+        """Give back a trial taken by `allow` for a request that got no outcome (cancelled)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trials:
+                self._trials.pop(0)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trials = []
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+                self._trials = []
+                self._set_state(self.OPEN)
+
+
+class Admission:
+    """At most `max_in_flight` requests, `max_queued` more may wait `queue_timeout`."""
+
+    def __init__(self, cluster, max_in_flight=20, max_queued=40, queue_timeout=5.0):
+        self.cluster = cluster
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        IN_FLIGHT.set(0, cluster=cluster)
+        QUEUED.set(0, cluster=cluster)
+
+    def _shed(self, message):
+        REJECTED.inc(cluster=self.cluster, reason=Overloaded.reason)
+        return Overloaded(self.cluster, message)
+
+    def _acquire(self, timeout):
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self.queued >= self.max_queued:
+                raise self._shed(f"cluster {self.cluster}: admission queue is full")
+            self.queued += 1
+            QUEUED.set(self.queued, cluster=self.cluster)
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self.queued -= 1
+                QUEUED.set(self.queued, cluster=self.cluster)
+        if not acquired:
+            raise self._shed(f"cluster {self.cluster}: no request slot within {timeout:.1f}s")
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold one in-flight slot for the duration of the block."""
+        wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        self._acquire(wait)
+        with self._lock:
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, cluster=self.cluster)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                IN_FLIGHT.set(self.in_flight, cluster=self.cluster)
+            self._slots.release()
@@ -0,0 +1,50 @@
+"""
+Per-request time budgets.
+
+The route binds a `Deadline` to the running context; the ES transport and
+`run_search` read it to cap client and server-side timeouts to whatever is
+left of the budget, and fail fast once it is spent.
+"""
+
+import time
+from contextvars import ContextVar
+
+_current = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of calling ES when the request budget is spent."""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, minimum=0.0):
+        """Return the remaining seconds, or raise if less than `minimum` is left."""
+        remaining = self.remaining()
+        if remaining <= minimum:
+            raise DeadlineExceeded(f"request deadline of {self.seconds}s exceeded")
+        return remaining
+
+
+def current():
+    return _current.get()
+
+
+def start(seconds):
+    deadline = Deadline(seconds)
+    _current.set(deadline)
+    return deadline
+
+
+def clear():
+    _current.set(None)
@@ -0,0 +1,260 @@
+"""
+Factory for the Elasticsearch clients, driven by config.ini.
+
+`[es_client]` holds the defaults for every cluster and `[es_client:<name>]`
+overrides them for one cluster (e.g. `[es_client:es_con]`):
+
+    connection_class  urllib3 | requests
+    maxsize           pooled connections kept per host
+    http_compress     gzip request bodies / accept gzip responses
+    keep_alive        reuse connections between requests
+    connect_timeout   seconds to establish a connection
+    read_timeout      seconds to wait for a response
+    max_retries       retries for idempotent reads (writes are never retried)
+    retry_backoff     base delay in seconds, doubled per attempt, full jitter
+    retry_backoff_max upper bound of a single retry delay
+    retry_on_timeout  also retry reads that hit read_timeout
+    breaker_failure_threshold  consecutive failures that open the circuit
+    breaker_reset_timeout      seconds an open circuit fails fast
+    max_in_flight     concurrent requests admitted (0 disables admission control)
+    max_queued        requests allowed to wait for a slot before shedding
+    queue_timeout     seconds a queued request waits for a slot
+"""
+
+import random
+import time
+
+import urllib3
+from elasticsearch import Elasticsearch, Transport
+from elasticsearch.exceptions import ConnectionError, ConnectionTimeout, TransportError
+from requests.adapters import HTTPAdapter
+
+from utils import deadline
+from utils.circuit_breaker import Admission, CircuitBreaker
+from utils.timing import TimedRequestsHttpConnection, TimedUrllib3HttpConnection
+
+CONNECTION_CLASSES = {
+    "urllib3": TimedUrllib3HttpConnection,
+    "requests": TimedRequestsHttpConnection,
+}
+
+DEFAULTS = {
+    "connection_class": "urllib3",
+    "maxsize": "25",
+    "http_compress": "true",
+    "keep_alive": "true",
+    "connect_timeout": "5",
+    "read_timeout": "60",
+    "max_retries": "2",
+    "retry_backoff": "0.2",
+    "retry_backoff_max": "2",
+    "retry_on_timeout": "false",
+    "use_ssl": "true",
+    "verify_certs": "false",
+    "breaker_failure_threshold": "5",
+    "breaker_reset_timeout": "30",
+    "max_in_flight": "20",
+    "max_queued": "40",
+    "queue_timeout": "5",
+}
+
+# statuses that say the cluster itself is struggling, not the request
+FAILURE_STATUSES = (429, 502, 503, 504)
+
+# endpoints that only read when POSTed, so repeating them is safe (a POST
+# to `_mapping` or `_alias` writes; their reads are GETs)
+READ_ENDPOINTS = frozenset(("_search", "_count", "_msearch", "_mget", "_field_caps"))
+
+
+def is_idempotent_read(method, url):
+    if method in ("GET", "HEAD"):
+        return True
+    if method != "POST":
+        return False
+    # whole path segments: `/_aliases` is not `/_alias`
+    segments = url.split("?", 1)[0].split("/")
+    return any(segment in READ_ENDPOINTS for segment in segments)
+
+
+def is_cluster_failure(error):
+    return isinstance(error, ConnectionError) or error.status_code in FAILURE_STATUSES
+
+
+class ReadRetryTransport(Transport):
+    """
+    Retries idempotent reads on connection errors (and optionally timeouts
+    or retryable statuses) with exponential backoff and full jitter.
+    Clients are created with `max_retries=0`, so the base transport never
+    repeats a request on its own.
+
+    When a request deadline is bound, every call is capped to the remaining
+    budget and no retry is attempted that could not finish within it.
+
+    With a `breaker` every attempt is refused while the circuit is open, and
+    with an `admission` gate the whole request (retries included) holds one
+    in-flight slot.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        read_retries=2,
+        retry_backoff=0.2,
+        retry_backoff_max=2.0,
+        retry_reads_on_timeout=False,
+        breaker=None,
+        admission=None,
+        **kwargs,
+    ):
+        super().__init__(hosts, **kwargs)
+        self.read_retries = read_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.retry_reads_on_timeout = retry_reads_on_timeout
+        self.breaker = breaker
+        self.admission = admission
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        if self.admission is None:
+            return self._perform_with_retries(method, url, headers, params, body)
+        budget = deadline.current()
+        with self.admission.slot(budget.remaining() if budget is not None else None):
+            return self._perform_with_retries(method, url, headers, params, body)
+
+    def _perform_with_retries(self, method, url, headers, params, body):
+        retries = self.read_retries if is_idempotent_read(method, url) else 0
+        budget = deadline.current()
+        for attempt in range(retries + 1):
+            if budget is not None:
+                params = dict(params or {})
+                remaining = budget.check()
+                requested = params.get("request_timeout")
+                params["request_timeout"] = min(remaining, requested or remaining)
+            if self.breaker is not None:
+                self.breaker.allow()
+            try:
+                response = super().perform_request(
+                    method, url, headers=headers, params=params, body=body
+                )
+            except TransportError as e:
+                self._record(e)
+                if attempt == retries:
+                    raise
+                if isinstance(e, ConnectionTimeout):
+                    if not self.retry_reads_on_timeout:
+                        raise
+                elif not isinstance(e, ConnectionError) and e.status_code not in self.retry_on_status:
+                    raise
+                error = e
+            else:
+                self._record(None)
+                return response
+            delay = self.backoff(attempt)
+            if budget is not None and delay >= budget.remaining():
+                raise error
+            time.sleep(delay)
+
+    def _record(self, error):
+        if self.breaker is None:
+            return
+        if error is not None and is_cluster_failure(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2**attempt))
+
+
+def client_settings(config, name):
+    settings = dict(DEFAULTS)
+    for section in ("es_client", f"es_client:{name}"):
+        if config.has_section(section):
+            settings.update(config[section])
+    return settings
+
+
+def create_client(config, name, hosts):
+    """Build the pooled client for cluster `name` from config.ini settings."""
+    settings = client_settings(config, name)
+    truthy = lambda key: str(settings[key]).lower() in ("1", "true", "yes", "on")
+
+    connection_name = settings["connection_class"].lower()
+    connection_class = CONNECTION_CLASSES.get(connection_name)
+    if connection_class is None:
+        raise ValueError(
+            f"es_client:{name}: connection_class must be one of {', '.join(CONNECTION_CLASSES)}"
+        )
+
+    connect_timeout = float(settings["connect_timeout"])
+    read_timeout = float(settings["read_timeout"])
+    if connection_name == "urllib3":
+        timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+    else:
+        timeout = (connect_timeout, read_timeout)
+
+    maxsize = int(settings["maxsize"])
+    max_in_flight = int(settings["max_in_flight"])
+    breaker = CircuitBreaker(
+        name,
+        failure_threshold=int(settings["breaker_failure_threshold"]),
+        reset_timeout=float(settings["breaker_reset_timeout"]),
+    )
+    admission = None
+    if max_in_flight > 0:
+        admission = Admission(
+            name,
+            max_in_flight=max_in_flight,
+            max_queued=int(settings["max_queued"]),
+            queue_timeout=float(settings["queue_timeout"]),
+        )
+    client = Elasticsearch(
+        hosts=str(hosts),
+        transport_class=ReadRetryTransport,
+        connection_class=connection_class,
+        use_ssl=truthy("use_ssl"),
+        verify_certs=truthy("verify_certs"),
+        http_compress=truthy("http_compress"),
+        headers=None if truthy("keep_alive") else {"connection": "close"},
+        maxsize=maxsize,
+        timeout=timeout,
+        max_retries=0,
+        read_retries=int(settings["max_retries"]),
+        retry_backoff=float(settings["retry_backoff"]),
+        retry_backoff_max=float(settings["retry_backoff_max"]),
+        retry_reads_on_timeout=truthy("retry_on_timeout"),
+        breaker=breaker,
+        admission=admission,
+    )
+
+    if connection_name == "requests":
+        # requests sizes its pool per adapter rather than per connection
+        for connection in client.transport.connection_pool.connections:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+            connection.session.mount("http://", adapter)
+            connection.session.mount("https://", adapter)
+    return client
+
+
+def create_async_client(config, name, hosts):
+    """
+    Build an `AsyncOpenSearch` client for cluster `name` from the same
+    config.ini settings. It must be created on the event loop it is used
+    from; requires `aiohttp` (opensearch-py's async extra).
+    """
+    from opensearchpy import AsyncOpenSearch
+
+    settings = client_settings(config, name)
+    truthy = lambda key: str(settings[key]).lower() in ("1", "true", "yes", "on")
+    return AsyncOpenSearch(
+        hosts=str(hosts),
+        use_ssl=truthy("use_ssl"),
+        verify_certs=truthy("verify_certs"),
+        ssl_show_warn=False,
+        http_compress=truthy("http_compress"),
+        headers=None if truthy("keep_alive") else {"connection": "close"},
+        maxsize=int(settings["maxsize"]),
+        timeout=float(settings["read_timeout"]),
+        max_retries=int(settings["max_retries"]),
+        retry_on_timeout=truthy("retry_on_timeout"),
+    )
@@ -0,0 +1,205 @@
+"""
+Merging of aggregation responses from several clusters.
+
+A federated chart sends the same aggregation to every cluster that serves
+part of its index list and merges the answers here:
+    * terms / multi_terms buckets are summed per key, re-ranked and cut
+      back to the requested size; each cluster is asked for more than
+      `size` buckets (see `over_fetch`) so the merged top-N is not missing
+      terms that ranked just below the cut on one cluster
+    * histogram / date_histogram buckets are summed per key, ordered by key
+    * filters buckets are summed per position (same filters everywhere)
+Sub-aggregations are merged recursively inside each merged bucket.
+"""
+
+import copy
+
+TERMS_AGGS = ("terms", "multi_terms")
+HISTOGRAM_AGGS = ("date_histogram", "histogram")
+SUMMED_METRICS = ("sum", "value_count")
+
+
+def over_fetch(body, factor=2, extra=10):
+    """
+    Return a copy of `body` whose terms aggregations ask each cluster for
+    `size * factor + extra` buckets (and a matching `shard_size`).
+    """
+    body = copy.deepcopy(body)
+    _over_fetch_aggs(body.get("aggs") or body.get("aggregations") or {}, factor, extra)
+    return body
+
+
+def _over_fetch_aggs(aggs, factor, extra):
+    for agg in aggs.values():
+        for kind in TERMS_AGGS:
+            if kind in agg:
+                params = agg[kind]
+                size = params.get("size", 10)
+                fetch = size * factor + extra
+                params["size"] = fetch
+                params["shard_size"] = max(params.get("shard_size", 0), int(fetch * 1.5 + 10))
+        _over_fetch_aggs(agg.get("aggs") or agg.get("aggregations") or {}, factor, extra)
+
+
+def merge_responses(responses, body):
+    """Merge search responses for the same `body` from several clusters."""
+    responses = [r for r in responses if r is not None]
+    if len(responses) == 1:
+        return responses[0]
+    relations = {_total_relation(r) for r in responses}
+    merged = {
+        "took": max((r.get("took") or 0) for r in responses),
+        "timed_out": any(r.get("timed_out") for r in responses),
+        "_shards": _sum_dicts(r.get("_shards") or {} for r in responses),
+        "hits": {
+            "total": {
+                "value": sum(_total_hits(r) for r in responses),
+                # a lower bound from any cluster makes the sum one too
+                "relation": "gte" if "gte" in relations else "eq",
+            },
+            "hits": [hit for r in responses for hit in r.get("hits", {}).get("hits", [])],
+        },
+    }
+    aggs = body.get("aggs") or body.get("aggregations")
+    if aggs:
+        merged["aggregations"] = merge_aggregations(
+            [r.get("aggregations") or {} for r in responses], aggs
+        )
+    return merged
+
+
+def merge_aggregations(results, aggs):
+    """Merge per-cluster `aggregations` objects according to the request `aggs`."""
+    merged = {}
+    for name, agg in aggs.items():
+        parts = [result[name] for result in results if name in result]
+        if not parts:
+            continue
+        sub_aggs = agg.get("aggs") or agg.get("aggregations") or {}
+        if any(kind in agg for kind in TERMS_AGGS):
+            merged[name] = _merge_terms(parts, agg, sub_aggs)
+        elif any(kind in agg for kind in HISTOGRAM_AGGS):
+            merged[name] = _merge_keyed(parts, sub_aggs, sort_by_key=True)
+        elif "filters" in agg:
+            merged[name] = _merge_filters(parts, sub_aggs)
+        elif "buckets" in parts[0]:
+            merged[name] = _merge_keyed(parts, sub_aggs, sort_by_key=False)
+        else:
+            merged[name] = _merge_metric(parts, agg)
+    return merged
+
+
+def _bucket_key(bucket):
+    key = bucket.get("key")
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _merge_bucket_group(buckets, sub_aggs):
+    merged = {k: v for k, v in buckets[0].items() if k not in sub_aggs}
+    merged["doc_count"] = sum(b.get("doc_count", 0) for b in buckets)
+    if sub_aggs:
+        merged.update(merge_aggregations(buckets, sub_aggs))
+    return merged
+
+
+def _group_by_key(parts):
+    groups = {}
+    for part in parts:
+        for bucket in part.get("buckets", []):
+            groups.setdefault(_bucket_key(bucket), []).append(bucket)
+    return groups
+
+
+def _merge_terms(parts, agg, sub_aggs):
+    kind = next(kind for kind in TERMS_AGGS if kind in agg)
+    params = agg[kind]
+    size = params.get("size", 10)
+    buckets = [
+        _merge_bucket_group(group, sub_aggs) for group in _group_by_key(parts).values()
+    ]
+    order = params.get("order") or {"_count": "desc"}
+    if isinstance(order, list):
+        order = order[0]
+    field, direction = next(iter(order.items()))
+    if field == "_key":
+        buckets.sort(key=lambda b: _sortable(b.get("key")), reverse=direction == "desc")
+    else:
+        buckets.sort(key=lambda b: _sortable(b.get("key")))
+        buckets.sort(key=lambda b: b["doc_count"], reverse=direction != "asc")
+    kept, dropped = buckets[:size], buckets[size:]
+    return {
+        "doc_count_error_upper_bound": sum(
+            p.get("doc_count_error_upper_bound", 0) for p in parts
+        ),
+        "sum_other_doc_count": sum(p.get("sum_other_doc_count", 0) for p in parts)
+        + sum(b["doc_count"] for b in dropped),
+        "buckets": kept,
+    }
+
+
+def _merge_keyed(parts, sub_aggs, sort_by_key):
+    buckets = [
+        _merge_bucket_group(group, sub_aggs) for group in _group_by_key(parts).values()
+    ]
+    if sort_by_key:
+        buckets.sort(key=lambda b: _sortable(b.get("key")))
+    return {"buckets": buckets}
+
+
+def _merge_filters(parts, sub_aggs):
+    first = parts[0].get("buckets", [])
+    if isinstance(first, dict):
+        return {
+            "buckets": {
+                key: _merge_bucket_group(
+                    [p["buckets"][key] for p in parts if key in p.get("buckets", {})], sub_aggs
+                )
+                for key in first
+            }
+        }
+    # non-keyed filters come back in request order on every cluster
+    return {
+        "buckets": [
+            _merge_bucket_group([p["buckets"][i] for p in parts], sub_aggs)
+            for i in range(len(first))
+        ]
+    }
+
+
+def _merge_metric(parts, agg):
+    values = [p.get("value") for p in parts if p.get("value") is not None]
+    if not values:
+        return dict(parts[0])
+    if any(kind in agg for kind in SUMMED_METRICS):
+        return {"value": sum(values)}
+    if "min" in agg:
+        return {"value": min(values)}
+    if "max" in agg:
+        return {"value": max(values)}
+    # averages, cardinalities etc. cannot be combined exactly from the parts
+    return dict(parts[0])
+
+
+def _sortable(key):
+    return (0, key) if isinstance(key, (int, float)) else (1, str(key))
+
+
+def _total_hits(response):
+    total = response.get("hits", {}).get("total")
+    if isinstance(total, dict):
+        return total.get("value", 0)
+    return total or 0
+
+
+def _total_relation(response):
+    total = response.get("hits", {}).get("total")
+    return total.get("relation", "eq") if isinstance(total, dict) else "eq"
+
+
+def _sum_dicts(dicts):
+    merged = {}
+    for d in dicts:
+        for key, value in d.items():
+            if isinstance(value, (int, float)):
+                merged[key] = merged.get(key, 0) + value
+    return merged
@@ -0,0 +1,215 @@
+"""
+In-process metrics registry rendered in the Prometheus text exposition format.
+
+Counters and histograms keep one value table per thread, so the hot path
+only touches thread-local state and never takes a lock. The tables are
+summed when `/metrics` is scraped. When a thread exits its table is merged
+into the metric's totals and dropped, so the tables don't pile up with
+servers that start a thread per request.
+"""
+
+import bisect
+import math
+import threading
+import weakref
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Shard:
+    """Value table of one thread; freed with the thread's locals when it exits."""
+
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self):
+        self.values = {}
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # tables of the live threads, and the totals of those that exited
+        self._shards = []
+        self._retired = {}
+        # reentrant: a table may be retired by whichever thread frees it
+        self._lock = threading.RLock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard.values)
+            weakref.finalize(shard, self._retire, shard.values)
+        return shard.values
+
+    def _retire(self, values):
+        with self._lock:
+            self._shards = [shard for shard in self._shards if shard is not values]
+            self._merge(self._retired, values)
+
+    def _merge(self, total, values):
+        """Add the table `values` into `total`."""
+        raise NotImplementedError
+
+    def collect(self):
+        """Return {label key: value} merged across threads."""
+        merged = {}
+        with self._lock:
+            self._merge(merged, self._retired)
+            for shard in self._shards:
+                self._merge(merged, shard)
+        return merged
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + body + "}"
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, total, values):
+        for key, value in dict(values).items():
+            total[key] = total.get(key, 0) + value
+
+    def _samples(self):
+        return [
+            f"{self.name}{self._format_labels(key)} {_format_value(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            # per-bucket counts (+Inf last) followed by the running sum
+            entry = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def _merge(self, total, values):
+        for key, entry in dict(values).items():
+            current = total.get(key)
+            if current is None:
+                total[key] = list(entry)
+            else:
+                total[key] = [a + b for a, b in zip(current, entry)]
+
+    def _samples(self):
+        samples = []
+        for key, entry in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                le = self._format_labels(key, ("le", _format_value(bound)))
+                samples.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = self._format_labels(key)
+            samples.append(f"{self.name}_sum{labels} {_format_value(entry[-1])}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class Gauge(_Metric):
+    """Last-value metric; writes are plain dict assignments."""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def collect(self):
+        return dict(self._values)
+
+    def _samples(self):
+        return [
+            f"{self.name}{self._format_labels(key)} {_format_value(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def expose(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
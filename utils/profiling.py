@@ -0,0 +1,170 @@
+"""
+On-demand profiling of individual requests.
+
+A profiled request runs under `cProfile` (and optionally `tracemalloc`).
+The results are written to the output directory as:
+    * `<profile_id>.pstats`  - load with `pstats` / snakeviz
+    * `<profile_id>.folded`  - collapsed stacks for flamegraph.pl / speedscope
+    * `<profile_id>.memory.txt` - top allocation sites (memory mode only)
+"""
+
+import cProfile
+import datetime
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+MODES = {"cpu", "memory"}
+FORMATS = {"pstats": ".pstats", "collapsed": ".folded", "memory": ".memory.txt"}
+
+# tracemalloc is process wide, so only one request may trace memory at a time
+_memory_lock = threading.Lock()
+
+
+def parse_modes(value):
+    """Parse an `X-Profile` header value like 'cpu,memory'."""
+    if not value:
+        return set()
+    modes = {part.strip().lower() for part in value.split(",")} & MODES
+    return modes or {"cpu"}
+
+
+class RequestProfile:
+    def __init__(self, label, modes, frames=10):
+        self.label = label
+        self.profile_id = (
+            f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        )
+        self.frames = frames
+        self.profiler = cProfile.Profile()
+        self.trace_memory = "memory" in modes and _memory_lock.acquire(blocking=False)
+        self._started_tracemalloc = False
+        self._snapshot = None
+        self.stats = None
+        self.memory_diff = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    def start(self):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_tracemalloc = True
+            self._snapshot = tracemalloc.take_snapshot()
+        self.profiler.enable()
+        return self
+
+    def stop(self):
+        if self.stats is not None:
+            return self
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self.stats = pstats.Stats(self.profiler)
+        if self.trace_memory:
+            try:
+                snapshot = tracemalloc.take_snapshot()
+                self.memory_diff = snapshot.compare_to(self._snapshot, "traceback")
+            finally:
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+                _memory_lock.release()
+        return self
+
+    def save(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, self.profile_id)
+        self.stats.dump_stats(base + FORMATS["pstats"])
+        with open(base + FORMATS["collapsed"], "w", encoding="utf-8") as f:
+            f.write(collapsed_stacks(self.stats))
+        if self.memory_diff is not None:
+            with open(base + FORMATS["memory"], "w", encoding="utf-8") as f:
+                f.write(f"# {self.label}\n")
+                for stat in self.memory_diff[:50]:
+                    f.write(f"{stat}\n")
+                    for line in stat.traceback.format():
+                        f.write(f"    {line}\n")
+        return base
+
+
+def _frame_name(func):
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def collapsed_stacks(stats, max_depth=64):
+    """
+    Approximate collapsed stacks from a cProfile call graph.
+
+    cProfile records caller -> callee edges rather than full stacks, so the
+    inclusive time of each callee is split across callers in proportion to
+    the time spent under each edge. Values are microseconds.
+    """
+    entries = stats.stats
+    children = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    lines = {}
+
+    def walk(func, path, inclusive):
+        cumulative = entries[func][3]
+        own = entries[func][2]
+        if cumulative <= 0 or inclusive <= 0:
+            return
+        scale = inclusive / cumulative
+        stack = path + (_frame_name(func),)
+        self_us = int(own * scale * 1_000_000)
+        if self_us:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0) + self_us
+        if len(stack) >= max_depth:
+            return
+        for child, edge_cumulative in children.get(func, []):
+            if _frame_name(child) in stack:
+                continue
+            walk(child, stack, edge_cumulative * scale)
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    for root in roots:
+        walk(root, (), entries[root][3])
+
+    return "".join(f"{stack} {value}\n" for stack, value in sorted(lines.items()))
+
+
+class Sampler:
+    """Selects 1 in `every` requests, at most once per `min_interval` seconds."""
+
+    def __init__(self, every=0, min_interval=60.0):
+        self.every = every
+        self.min_interval = min_interval
+        self._counter = itertools.count(1)
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def should_sample(self):
+        if self.every <= 0:
+            return False
+        if next(self._counter) % self.every:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last < self.min_interval:
+                return False
+            self._last = now
+            return True
+
+
+def profile_path(output_dir, profile_id, fmt):
+    """Resolve a stored profile file, rejecting anything outside `output_dir`."""
+    suffix = FORMATS.get(fmt)
+    if suffix is None or not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(output_dir, profile_id + suffix)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,94 @@
+"""
+Index pattern -> cluster routing, driven by config.ini.
+
+Each `[route:<label>]` section maps an index pattern to a named cluster
+client; the label is the name the UI uses for that data source (SIEM, NDR,
+...). An index or pattern is routed to the route whose pattern matches it
+with the longest literal prefix, so `logstash-2025.*` follows `logstash-*`
+and a more specific route wins over a broad one:
+
+    [routing]
+    default = es
+
+    [route:NDR]
+    pattern = logstash-*
+    cluster = es_con
+"""
+
+import fnmatch
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Route:
+    label: str
+    pattern: str
+    cluster: str
+
+    @property
+    def prefix(self):
+        """Literal part of the pattern before the first wildcard."""
+        return self.pattern.split("*", 1)[0].split("?", 1)[0]
+
+    def matches(self, index):
+        return index == self.pattern or fnmatch.fnmatchcase(index, self.pattern)
+
+
+class Router:
+    def __init__(self, routes, default="es", max_cached=1024):
+        self.routes = list(routes)
+        self.default = default
+        self.max_cached = max_cached
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def route_for(self, index):
+        """Best matching `Route` for an index name or pattern, or None."""
+        # a comma separated target is routed by its first entry
+        index = (index or "").split(",", 1)[0].strip()
+        try:
+            return self._cache[index]
+        except KeyError:
+            pass
+        candidates = [route for route in self.routes if route.matches(index)]
+        route = max(candidates, key=lambda r: len(r.prefix), default=None)
+        with self._lock:
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            self._cache[index] = route
+        return route
+
+    def resolve(self, index):
+        """Name of the cluster that serves `index`."""
+        route = self.route_for(index)
+        return route.cluster if route is not None else self.default
+
+    def group(self, index):
+        """Split a comma separated target into {cluster: "pattern,pattern"}."""
+        groups = {}
+        for part in (index or "").split(","):
+            part = part.strip()
+            if part:
+                groups.setdefault(self.resolve(part), []).append(part)
+        return {cluster: ",".join(parts) for cluster, parts in groups.items()}
+
+    def label_patterns(self):
+        """{label: index pattern} for every route."""
+        return {route.label: route.pattern for route in self.routes}
+
+    def patterns(self):
+        return [route.pattern for route in self.routes]
+
+
+def from_config(config):
+    routes = []
+    for section in config.sections():
+        if not section.startswith("route:"):
+            continue
+        label = section.split(":", 1)[1].strip()
+        routes.append(
+            Route(label=label, pattern=config[section]["pattern"], cluster=config[section]["cluster"])
+        )
+    default = config.get("routing", "default", fallback="es")
+    return Router(routes, default=default)
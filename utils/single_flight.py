@@ -0,0 +1,85 @@
+"""
+Coalescing of identical concurrent calls.
+
+While a call for a key is in flight, later callers with the same key wait
+for it and share its result instead of issuing their own. Nothing is kept
+once the call completes, so this is not a cache: it only collapses calls
+that overlap in time (e.g. a wallboard dashboard opened on many screens,
+or every worker refreshing the same panel right after a cache expiry).
+
+Only successful results are shared. When the call fails, or its result is
+not `shareable` (e.g. a search cut short by the leader's own deadline),
+the waiters don't inherit it: each retries, under its own deadline.
+"""
+
+import copy
+import json
+import threading
+
+from utils import deadline
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.ok = False
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, shareable=None):
+        """
+        Run `func()` once for all concurrent callers of `key`.
+        Returns (result, shared), where `shared` is True for callers that
+        waited on another caller's call. When a result has several callers
+        each gets its own deep copy, so callers may mutate what they get.
+        A result for which `shareable(result)` is false is only returned
+        to the caller that ran it.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                break
+            self._wait(call)
+            if call.ok:
+                return copy.deepcopy(call.result), True
+            # the leader failed: run (or join) another call for this key
+
+        try:
+            call.result = func()
+            call.ok = shareable is None or bool(shareable(call.result))
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        if shared and call.ok:
+            return copy.deepcopy(call.result), False
+        return call.result, False
+
+    def _wait(self, call):
+        budget = deadline.current()
+        if not call.done.wait(budget.remaining() if budget is not None else None):
+            raise deadline.DeadlineExceeded(
+                f"request deadline of {budget.seconds}s exceeded waiting for a shared query"
+            )
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def canonical_key(*parts):
+    """Stable key for JSON-like parts (dict key order does not matter)."""
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
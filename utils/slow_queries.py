@@ -0,0 +1,175 @@
+"""
+Slow-query log keyed by query fingerprint.
+
+A fingerprint is the structural shape of a query body with literal values
+(search terms, timestamps, sizes) stripped, so every execution of the same
+panel maps to the same entry regardless of the time range or filter values.
+"""
+
+import hashlib
+import json
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# values kept verbatim because they describe the shape, not the data
+STRUCTURAL_KEYS = {"field", "calendar_interval", "fixed_interval", "order"}
+
+_origin = ContextVar("slow_query_origin", default={})
+
+
+def shape(body, key=None):
+    """Return `body` with literal values replaced by '?'."""
+    if isinstance(body, dict):
+        if key == "filters" and all(isinstance(v, dict) for v in body.values()):
+            # keyed `filters` aggregation: bucket names are built from literals
+            return sorted(
+                (shape(v) for v in body.values()), key=lambda s: json.dumps(s, sort_keys=True)
+            )
+        return {k: shape(v, k) for k, v in body.items()}
+    if isinstance(body, list):
+        shapes = [shape(v, key) for v in body]
+        if all(not isinstance(v, (dict, list)) for v in body):
+            return ["?"] if body else []
+        return shapes
+    if key in STRUCTURAL_KEYS:
+        return body
+    return "?"
+
+
+def fingerprint(body):
+    """Return (fingerprint id, shape) for a query body."""
+    body_shape = shape(body)
+    digest = hashlib.sha1(
+        json.dumps(body_shape, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return digest, body_shape
+
+
+def current_origin():
+    return _origin.get()
+
+
+def bind_origin(**fields):
+    """Tag every query run later in this context (e.g. the request path)."""
+    _origin.set({**_origin.get(), **fields})
+
+
+def clear_origin():
+    _origin.set({})
+
+
+@contextmanager
+def origin(**fields):
+    """Tag queries run inside the block with e.g. dashboard_id / viz_id."""
+    token = _origin.set({**_origin.get(), **fields})
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _Entry:
+    def __init__(self, fp, body_shape, cluster, index, max_samples, max_origins):
+        self.fingerprint = fp
+        self.shape = body_shape
+        self.cluster = cluster
+        self.index = index
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.max_took_ms = None
+        self.durations = deque(maxlen=max_samples)
+        self.origins = deque(maxlen=max_origins)
+        self.sample = None
+
+    def add(self, duration_ms, took_ms, body, origin_fields):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.durations.append(duration_ms)
+        if duration_ms >= self.max_ms:
+            self.max_ms = duration_ms
+            self.max_took_ms = took_ms
+            self.sample = {"body": body, "origin": origin_fields}
+        if origin_fields and origin_fields not in self.origins:
+            self.origins.append(origin_fields)
+
+    def summary(self):
+        durations = sorted(self.durations)
+        return {
+            "fingerprint": self.fingerprint,
+            "cluster": self.cluster,
+            "index": self.index,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": _round(percentile(durations, 50)),
+            "p95_ms": _round(percentile(durations, 95)),
+            "p99_ms": _round(percentile(durations, 99)),
+            "took_ms_at_max": self.max_took_ms,
+            "origins": list(self.origins),
+            "shape": self.shape,
+            "sample": self.sample,
+        }
+
+
+class SlowQueryLog:
+    """Per-fingerprint latency statistics, bounded in size."""
+
+    ORDERINGS = ("p50_ms", "p95_ms", "p99_ms", "max_ms", "total_ms", "count")
+
+    def __init__(self, max_fingerprints=500, max_samples=1000, max_origins=20):
+        self.max_fingerprints = max_fingerprints
+        self.max_samples = max_samples
+        self.max_origins = max_origins
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, body, duration_ms, cluster=None, index=None, took_ms=None):
+        fp, body_shape = fingerprint(body)
+        origin_fields = dict(current_origin())
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    self._evict()
+                entry = self._entries[fp] = _Entry(
+                    fp, body_shape, cluster, index, self.max_samples, self.max_origins
+                )
+            entry.add(duration_ms, took_ms, body, origin_fields)
+        return fp
+
+    def _evict(self):
+        # drop the fingerprint with the lowest worst-case latency
+        fastest = min(self._entries.values(), key=lambda e: e.max_ms)
+        del self._entries[fastest.fingerprint]
+
+    def top(self, limit=20, order_by="p95_ms"):
+        if order_by not in self.ORDERINGS:
+            raise ValueError(f"order_by must be one of {', '.join(self.ORDERINGS)}")
+        with self._lock:
+            summaries = [entry.summary() for entry in self._entries.values()]
+        summaries.sort(key=lambda s: s[order_by] or 0, reverse=True)
+        return summaries[:limit]
+
+    def dump(self, path, limit=None, order_by="p95_ms"):
+        entries = self.top(limit or self.max_fingerprints, order_by)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2, default=str)
+        return len(entries)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
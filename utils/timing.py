@@ -0,0 +1,183 @@
+"""
+Phase timers used to break down request and visualization latency.
+
+A `Timings` object is bound to the current context (request, or a single
+visualizer inside `view_dashboard`) and collects:
+    * wall-clock time per named phase (lookups, queries, formatting)
+    * one entry per Elasticsearch search with ES `took`, client wall clock,
+      response bytes and hit / bucket counts
+    * HTTP round-trip time and bytes as seen by the ES connection class
+
+The request level object is rendered as a `Server-Timing` header.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from elasticsearch import RequestsHttpConnection, Urllib3HttpConnection
+
+_current = ContextVar("timings", default=None)
+
+
+class Timings:
+    def __init__(self, label=None):
+        self.label = label
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.searches = []
+        self.network_ms = 0.0
+        self.response_bytes = 0
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, duration_ms):
+        self.phases[name] = self.phases.get(name, 0.0) + duration_ms
+
+    def add_network(self, duration_ms, nbytes):
+        self.network_ms += duration_ms
+        self.response_bytes += nbytes
+
+    def record_search(self, name, index, response, wall_ms, nbytes=0):
+        hits = response.get("hits", {})
+        self.searches.append(
+            {
+                "name": name,
+                "index": index,
+                "took_ms": response.get("took"),
+                "wall_ms": round(wall_ms, 2),
+                "bytes": nbytes,
+                "hits": len(hits.get("hits", [])),
+                "total_hits": (hits.get("total") or {}).get("value"),
+                "buckets": count_buckets(response.get("aggregations")),
+            }
+        )
+        self.add(name, wall_ms)
+        self.add("es_took", response.get("took") or 0)
+
+    def merge(self, other):
+        for name, duration_ms in other.phases.items():
+            self.add(name, duration_ms)
+        self.searches.extend(other.searches)
+        self.network_ms += other.network_ms
+        self.response_bytes += other.response_bytes
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "phases": {k: round(v, 2) for k, v in self.phases.items()},
+            "network_ms": round(self.network_ms, 2),
+            "response_bytes": self.response_bytes,
+            "searches": self.searches,
+        }
+
+    def server_timing(self):
+        """Render the collected phases as a `Server-Timing` header value."""
+        entries = [f"{name};dur={duration:.2f}" for name, duration in self.phases.items()]
+        if self.searches:
+            entries.append(
+                f'es_net;dur={self.network_ms:.2f};desc="{self.response_bytes} bytes"'
+            )
+        entries.append(f"total;dur={self.total_ms:.2f}")
+        return ", ".join(entries)
+
+
+def count_buckets(aggregations):
+    """Count buckets at every level of an aggregation response."""
+    if not isinstance(aggregations, dict):
+        return 0
+    total = 0
+    for value in aggregations.values():
+        if not isinstance(value, dict):
+            continue
+        buckets = value.get("buckets")
+        if isinstance(buckets, dict):
+            buckets = list(buckets.values())
+        if isinstance(buckets, list):
+            total += len(buckets)
+            for bucket in buckets:
+                total += count_buckets(bucket)
+        else:
+            total += count_buckets(value)
+    return total
+
+
+def current():
+    """Return the `Timings` bound to the running context, if any."""
+    return _current.get()
+
+
+def start(label=None):
+    """Bind a new `Timings` to the running context and return it."""
+    timings = Timings(label)
+    _current.set(timings)
+    return timings
+
+
+def stop():
+    """Unbind the current `Timings` from the running context."""
+    _current.set(None)
+
+
+@contextmanager
+def scope(label=None):
+    """
+    Time a nested unit of work (e.g. one visualizer) separately.
+    The child phases are merged into the enclosing `Timings` on exit.
+    """
+    parent = _current.get()
+    timings = Timings(label)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.merge(timings)
+
+
+@contextmanager
+def phase(name):
+    """Time a phase on the current `Timings`; no-op outside a timed context."""
+    timings = _current.get()
+    if timings is None:
+        yield None
+        return
+    with timings.phase(name):
+        yield timings
+
+
+class TimingConnectionMixin:
+    """
+    Records HTTP round-trip time and raw response size of every ES call
+    on the current `Timings`.
+    """
+
+    def perform_request(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return super().perform_request(*args, **kwargs)
+        start_time = time.perf_counter()
+        status, headers, raw_data = super().perform_request(*args, **kwargs)
+        timings.add_network(
+            (time.perf_counter() - start_time) * 1000, len(raw_data or "")
+        )
+        return status, headers, raw_data
+
+
+class TimedRequestsHttpConnection(TimingConnectionMixin, RequestsHttpConnection):
+    pass
+
+
+class TimedUrllib3HttpConnection(TimingConnectionMixin, Urllib3HttpConnection):
+    pass
@@ -0,0 +1,65 @@
+"""
+Bounded in-process cache with expiring entries.
+
+Once `max_size` entries are held the least recently used one is evicted,
+and an entry counts as missing `ttl` seconds after it was stored. Each
+worker process has its own cache, so the TTL bounds how long a change
+made elsewhere goes unseen. Values are shared between callers and must
+not be mutated.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# returned by `get` for keys that are not cached (None is a valid value)
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, max_size=1024, ttl=300, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self._clock() - entry[1] >= self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        self.update([(key, value)])
+
+    def update(self, items):
+        """Store several (key, value) pairs at once, e.g. when preloading."""
+        now = self._clock()
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate):
+        """Drop every entry whose key matches `predicate`; returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)